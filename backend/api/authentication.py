@@ -0,0 +1,110 @@
+"""
+Аутентификация по токену с кэшем.
+
+Токен с пользователем хранится в LRU процесса на AUTH_TOKEN_CACHE_TTL
+секунд, не более AUTH_TOKEN_CACHE_SIZE записей. Если задан
+AUTH_TOKEN_SHARED_CACHE, вторым уровнем служит общий кэш Django.
+Удаление токена (выход через djoser) и сохранение пользователя (смена
+пароля, блокировка) сбрасывают записи в этом процессе и в общем кэше,
+в остальных процессах записи живут не дольше TTL.
+"""
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+
+def cache_key(key):
+    """Ключ записи без самого токена."""
+    return 'auth:token:' + hashlib.sha256(key.encode()).hexdigest()
+
+
+class TokenCache:
+    """LRU с TTL в памяти процесса и необязательный общий кэш."""
+
+    def __init__(self, size, ttl, shared_alias=None):
+        self.size = size
+        self.ttl = ttl
+        self.shared = caches[shared_alias] if shared_alias else None
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        key = cache_key(key)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                expires, token = entry
+                if expires > time.monotonic():
+                    self.entries.move_to_end(key)
+                    return token
+                del self.entries[key]
+        if self.shared is None:
+            return None
+        token = self.shared.get(key)
+        if token is not None:
+            self.remember(key, token)
+        return token
+
+    def set(self, key, token):
+        key = cache_key(key)
+        self.remember(key, token)
+        if self.shared is not None:
+            self.shared.set(key, token, self.ttl)
+
+    def remember(self, key, token):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, token)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def delete(self, keys):
+        keys = [cache_key(key) for key in keys]
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+        if self.shared is not None:
+            self.shared.delete_many(keys)
+
+
+_token_cache = None
+
+
+def get_token_cache():
+    global _token_cache
+    if _token_cache is None:
+        _token_cache = TokenCache(
+            settings.AUTH_TOKEN_CACHE_SIZE,
+            settings.AUTH_TOKEN_CACHE_TTL,
+            settings.AUTH_TOKEN_SHARED_CACHE,
+        )
+    return _token_cache
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication без запроса к базе, пока токен в кэше.
+    Каждый запрос получает свою копию пользователя.
+    """
+
+    def authenticate_credentials(self, key):
+        cache = get_token_cache()
+        token = cache.get(key)
+        if token is None:
+            user, token = super().authenticate_credentials(key)
+            cache.set(key, token)
+        elif not token.user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.')
+            )
+        token = copy.copy(token)
+        token.user = copy.copy(token.user)
+        return token.user, token
@@ -0,0 +1,86 @@
+"""
+PostgreSQL с пулом соединений процесса.
+
+Соединение берётся из пула при первом обращении к базе в запросе
+и возвращается в пул вместо закрытия, поэтому CONN_MAX_AGE должен
+быть 0. Настройки пула - OPTIONS['POOL']: MAX_SIZE и TIMEOUT (секунды
+ожидания свободного соединения).
+"""
+from functools import partial
+
+from django.db.backends.postgresql import base, creation
+from psycopg2 import extensions
+
+from api.connections import clear_pools, get_pool, record_connect
+
+
+def reset(connection):
+    """Откат незавершённой транзакции перед возвратом в пул."""
+    if connection.closed:
+        return False
+    try:
+        status = connection.info.transaction_status
+        if status != extensions.TRANSACTION_STATUS_IDLE:
+            connection.rollback()
+    except base.Database.Error:
+        return False
+    return (
+        connection.info.transaction_status
+        == extensions.TRANSACTION_STATUS_IDLE
+    )
+
+
+def is_alive(connection):
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    except base.Database.Error:
+        return False
+    return True
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        """Свободные соединения пула не дают удалить тестовую базу."""
+        clear_pools(test_database_name)
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+    pool = None
+
+    def get_pool(self):
+        options = self.settings_dict['OPTIONS'].get('POOL', {})
+        return get_pool(
+            self.alias, self.settings_dict['NAME'],
+            options.get('MAX_SIZE', 10), options.get('TIMEOUT', 30),
+        )
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop('POOL', None)
+        return params
+
+    def connect_to_server(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        record_connect(self.alias)
+        return connection
+
+    def get_new_connection(self, conn_params):
+        check = None
+        if self.settings_dict.get('CONN_HEALTH_CHECKS'):
+            check = is_alive
+        self.pool = self.get_pool()
+        connection = self.pool.get(
+            partial(self.connect_to_server, conn_params), check
+        )
+        self.isolation_level = self.settings_dict['OPTIONS'].get(
+            'isolation_level', connection.isolation_level
+        )
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            self.pool.put(self.connection, discard=not reset(self.connection))
@@ -0,0 +1,11 @@
+"""
+PostgreSQL с настройкой CONN_HEALTH_CHECKS из Django 4.1: постоянное
+соединение проверяется при первом обращении к базе в новом запросе.
+"""
+from django.db.backends.postgresql import base
+
+from api.connections import HealthCheckMixin
+
+
+class DatabaseWrapper(HealthCheckMixin, base.DatabaseWrapper):
+    pass
@@ -0,0 +1,208 @@
+"""
+Версионированный кэш ответов ленты рецептов.
+
+Ключ страницы включает номера поколений: общего (`catalog`), ленты
+(`feed`), а при фильтрации - тегов или авторов. Изменение рецепта
+увеличивает поколения ленты, его автора и тегов, поэтому старые записи
+просто перестают читаться и вытесняются по таймауту.
+
+В кэше хранятся общие для всех данные с флагами анонимного пользователя,
+флаги текущего пользователя накладываются поверх при каждом запросе.
+"""
+import hashlib
+import json
+import re
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+CATALOG = 'catalog'
+FEED = 'feed'
+INGREDIENTS = 'ingredients'
+POPULAR = 'popular'
+RANKING = 'ranking'
+TAGS = 'tags'
+PAGE_PARAMS = ('page', 'limit', 'cursor')
+SAFE_SCOPE = re.compile(r'[\w:.-]{1,100}', re.ASCII)
+
+
+def get_cache():
+    return caches[settings.RECIPES_CACHE_ALIAS]
+
+
+def _scope_key_part(scope):
+    """
+    Область из параметров запроса (слаг тега, автор) может содержать
+    пробелы или быть длинной, а memcached такие ключи не принимает.
+    """
+    if SAFE_SCOPE.fullmatch(scope):
+        return scope
+    return hashlib.sha1(scope.encode()).hexdigest()
+
+
+def _generation_key(scope):
+    return f'recipes:gen:{_scope_key_part(scope)}'
+
+
+def _modified_key(scope):
+    return f'recipes:modified:{_scope_key_part(scope)}'
+
+
+def _seed():
+    """Начальное значение поколения, не повторяющееся после вытеснения."""
+    return time.time_ns() // 1000
+
+
+def _get_or_seed(keys, seed):
+    cache = get_cache()
+    values = cache.get_many(keys)
+    missing = [key for key in keys if key not in values]
+    if missing:
+        for key in missing:
+            cache.add(key, seed(), timeout=None)
+        values.update(cache.get_many(missing))
+    return [values.get(key) for key in keys]
+
+
+def get_generations(scopes):
+    """Текущие поколения для списка областей."""
+    return _get_or_seed([_generation_key(scope) for scope in scopes], _seed)
+
+
+def get_versions(scopes):
+    """
+    Поколения областей и время (timestamp) последнего изменения любой
+    из них. Если время вытеснено из кэша, им становится текущий момент.
+    """
+    modified = _get_or_seed(
+        [_modified_key(scope) for scope in scopes], time.time
+    )
+    return get_generations(scopes), max(modified)
+
+
+def bump(*scopes):
+    """Увеличение поколений, делающее устаревшими зависимые записи."""
+    cache = get_cache()
+    for scope in set(scopes):
+        key = _generation_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _seed(), timeout=None)
+    cache.set_many(
+        {_modified_key(scope): time.time() for scope in scopes},
+        timeout=None,
+    )
+
+
+def recipe_scopes(recipe, tag_slugs=()):
+    """Области кэша, которые затрагивает изменение рецепта."""
+    return [
+        FEED,
+        f'author:{recipe.author_id}',
+        f'recipe:{recipe.pk}',
+        *(f'tag:{slug}' for slug in tag_slugs),
+    ]
+
+
+def invalidate_recipe(recipe, tag_slugs=()):
+    """Сброс кэша рецепта после фиксации транзакции."""
+    scopes = recipe_scopes(recipe, tag_slugs)
+    transaction.on_commit(lambda: bump(*scopes))
+
+
+def normalize_params(query_params, names):
+    """Параметры запроса в каноническом виде для ключа кэша."""
+    return sorted(
+        (name, sorted(value for value in query_params.getlist(name) if value))
+        for name in names
+        if any(query_params.getlist(name))
+    )
+
+
+def _make_key(prefix, request, params, scopes):
+    payload = json.dumps(
+        [request.build_absolute_uri('/'), params, get_generations(scopes)]
+    )
+    return f'recipes:{prefix}:' + hashlib.sha1(payload.encode()).hexdigest()
+
+
+def recipe_page_scopes(request, filter_names):
+    """Параметры страницы ленты и области кэша, от которых она зависит."""
+    params = normalize_params(
+        request.query_params, (*filter_names, *PAGE_PARAMS)
+    )
+    filters = dict(params)
+    if 'cursor' in request.query_params:
+        params.append(('mode', ['cursor']))
+    if 'tags' in filters:
+        scopes = [f'tag:{slug}' for slug in filters['tags']]
+    elif 'author' in filters:
+        scopes = [f'author:{author}' for author in filters['author']]
+    else:
+        scopes = [FEED]
+    # popular зависит от счётчиков избранного и сбрасывается при каждом
+    # изменении избранного, trending - только командой refresh_trending.
+    ordering = filters.get('ordering', ())
+    if 'popular' in ordering:
+        scopes.append(POPULAR)
+    if 'trending' in ordering:
+        scopes.append(RANKING)
+    scopes.append(CATALOG)
+    return params, scopes
+
+
+def recipe_page_key(request, filter_names):
+    """Ключ страницы ленты рецептов для анонимного пользователя."""
+    return _make_key(
+        'page', request, *recipe_page_scopes(request, filter_names)
+    )
+
+
+def recipe_detail_scopes(pk):
+    return [f'recipe:{pk}', CATALOG]
+
+
+def recipe_detail_key(request, pk):
+    """Ключ рецепта для анонимного пользователя."""
+    return _make_key('detail', request, pk, recipe_detail_scopes(pk))
+
+
+def user_scope(user_id):
+    """Область избранного, списка покупок и подписок пользователя."""
+    return f'user:{user_id}'
+
+
+def overlay_user_flags(recipes, user):
+    """
+    Флаги пользователя поверх общих данных рецептов.
+    По одному запросу на избранное, список покупок и подписки.
+    """
+    recipe_ids = [recipe['id'] for recipe in recipes]
+    author_ids = {recipe['author']['id'] for recipe in recipes}
+    favorited = set(
+        user.favorites.filter(recipe_id__in=recipe_ids)
+        .values_list('recipe_id', flat=True)
+    )
+    in_shopping_cart = set(
+        user.list.filter(recipe_id__in=recipe_ids)
+        .values_list('recipe_id', flat=True)
+    )
+    subscribed = set(
+        user.follower.filter(author_id__in=author_ids)
+        .values_list('author_id', flat=True)
+    )
+    return [
+        {
+            **recipe,
+            'author': {
+                **recipe['author'],
+                'is_subscribed': recipe['author']['id'] in subscribed,
+            },
+            'is_favorited': recipe['id'] in favorited,
+            'is_in_shopping_cart': recipe['id'] in in_shopping_cart,
+        }
+        for recipe in recipes
+    ]
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Tags, Warning, register
+
+from .cache import get_cache
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Кэш в памяти процесса не видит поколений, увеличенных другими
+    воркерами и командами управления (load_ingredients, refresh_trending).
+    """
+    if settings.DEBUG or not isinstance(get_cache(), LocMemCache):
+        return []
+    return [Warning(
+        'Кэш рецептов хранится в памяти процесса: изменения из других '
+        'процессов не сбрасывают закэшированные ответы.',
+        hint='Укажите общий кэш в CACHE_BACKEND и CACHE_LOCATION, '
+             'например memcached.',
+        obj=settings.RECIPES_CACHE_ALIAS,
+        id='api.W001',
+    )]
@@ -0,0 +1,59 @@
+"""
+Условные GET-запросы.
+
+ETag и Last-Modified считаются по поколениям областей кэша, от которых
+зависит ответ, без сериализации и без хэширования тела ответа. Если
+версия клиента совпадает, возвращается 304 без обращения к обработчику.
+"""
+import hashlib
+import json
+from functools import wraps
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from .cache import get_versions, user_scope
+
+
+def get_validators(request, scopes, params, per_user=False):
+    """ETag и время изменения ответа."""
+    scopes = list(scopes)
+    user = request.user
+    if per_user and user.is_authenticated:
+        scopes.append(user_scope(user.pk))
+        params = [params, user.pk]
+    generations, modified = get_versions(scopes)
+    payload = json.dumps([
+        request.build_absolute_uri('/'),
+        request.accepted_renderer.format,
+        params,
+        generations,
+    ], default=str)
+    return quote_etag(hashlib.sha1(payload.encode()).hexdigest()), modified
+
+
+def versioned(method):
+    """
+    Декоратор list/retrieve. Вьюха возвращает из get_version(request,
+    **kwargs) области кэша, параметры ответа и признак зависимости
+    от пользователя.
+    """
+
+    @wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        scopes, params, per_user = self.get_version(request, **kwargs)
+        etag, modified = get_validators(request, scopes, params, per_user)
+        last_modified = int(modified)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = method(self, request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+            if per_user:
+                patch_vary_headers(response, ('Authorization',))
+        return response
+
+    return wrapper
@@ -0,0 +1,220 @@
+"""
+Жизненный цикл соединений с базой.
+
+Постоянные соединения живут CONN_MAX_AGE секунд. HealthCheckMixin
+переносит из Django 4.1 настройку CONN_HEALTH_CHECKS: соединение,
+оставшееся с прошлого запроса, проверяется при первом обращении к базе
+в новом запросе и заменяется, если сервер его уже оборвал. Базы, к которым
+запрос не обращается, не проверяются. Бэкенд api.backends.pooled_postgresql
+берёт соединения из пула ConnectionPool. Число подключений к серверу и
+состояние пулов выводятся в /metrics.
+"""
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+from django.db import DatabaseError
+
+from .metrics import registry
+
+
+class PoolTimeout(DatabaseError):
+    pass
+
+
+class ConnectionPool:
+    """
+    Пул соединений процесса: не больше max_size выданных соединений,
+    ожидание свободного - не дольше timeout секунд.
+    """
+
+    def __init__(self, max_size, timeout):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.slots = threading.BoundedSemaphore(max_size)
+        self.lock = threading.Lock()
+        self.idle = deque()
+        self.checked_out = 0
+        self.created = 0
+        self.acquired = 0
+        self.wait_duration = 0.0
+        self.timeouts = 0
+
+    def get(self, connect, check=None):
+        """
+        Свободное соединение или новое через connect(). Соединение
+        из пула, не прошедшее check(connection), заменяется новым.
+        """
+        started = time.monotonic()
+        if not self.slots.acquire(timeout=self.timeout):
+            with self.lock:
+                self.timeouts += 1
+            raise PoolTimeout(
+                f'Нет свободного соединения за {self.timeout} с.'
+            )
+        with self.lock:
+            self.checked_out += 1
+            self.acquired += 1
+            self.wait_duration += time.monotonic() - started
+            connection = self.idle.pop() if self.idle else None
+        try:
+            if connection is not None and check and not check(connection):
+                connection.close()
+                connection = None
+            if connection is None:
+                connection = connect()
+                with self.lock:
+                    self.created += 1
+        except BaseException:
+            self.release()
+            raise
+        return connection
+
+    def put(self, connection, discard=False):
+        """Возврат соединения; сломанное закрывается."""
+        if discard:
+            close_quietly(connection)
+        else:
+            with self.lock:
+                self.idle.append(connection)
+        self.release()
+
+    def clear(self):
+        """Закрытие свободных соединений."""
+        with self.lock:
+            idle, self.idle = self.idle, deque()
+        for connection in idle:
+            close_quietly(connection)
+
+    def release(self):
+        with self.lock:
+            self.checked_out -= 1
+        self.slots.release()
+
+
+def close_quietly(connection):
+    try:
+        connection.close()
+    except Exception:
+        pass
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+_pools_pid = None
+
+
+def get_pool(alias, name, max_size, timeout):
+    """
+    Пул базы name под псевдонимом alias: у тестовой базы свой пул.
+    После fork процесс создаёт свои пулы.
+    """
+    global _pools_pid
+    with _pools_lock:
+        if _pools_pid != os.getpid():
+            _pools.clear()
+            _pools_pid = os.getpid()
+        if (alias, name) not in _pools:
+            _pools[alias, name] = ConnectionPool(max_size, timeout)
+        return _pools[alias, name]
+
+
+def clear_pools(name):
+    """Закрытие свободных соединений с базой name во всех пулах."""
+    with _pools_lock:
+        pools = [
+            pool for (alias, pool_name), pool in _pools.items()
+            if pool_name == name
+        ]
+    for pool in pools:
+        pool.clear()
+
+
+_connects = defaultdict(int)
+
+
+def record_connect(alias):
+    """Новое соединение с сервером базы alias."""
+    _connects[alias] += 1
+
+
+def count_connect(sender, connection, **kwargs):
+    """
+    Сигнал connection_created. Для бэкенда с пулом он означает выдачу
+    соединения из пула, новые соединения считает сам пул.
+    """
+    if getattr(connection, 'pool', None) is None:
+        record_connect(connection.alias)
+
+
+class HealthCheckMixin:
+    """
+    CONN_HEALTH_CHECKS для DatabaseWrapper: проверка соединения
+    при первом обращении к базе после того, как оно пережило запрос.
+    """
+
+    health_check_done = False
+
+    def connect(self):
+        # Новое соединение исправно, а connect() сам вызывает
+        # ensure_connection(), настраивая соединение.
+        self.health_check_done = True
+        super().connect()
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        self.health_check_done = False
+
+    def ensure_connection(self):
+        if (
+            self.connection is not None
+            and not self.health_check_done
+            and self.settings_dict.get('CONN_HEALTH_CHECKS')
+            and not self.in_atomic_block
+        ):
+            if not self.is_usable():
+                self.close()
+            self.health_check_done = True
+        super().ensure_connection()
+
+
+def collect_metrics():
+    worker = f'worker="{os.getpid()}"'
+    lines = ['# TYPE foodgram_db_connects_total counter']
+    for alias, count in sorted(_connects.items()):
+        lines.append(
+            f'foodgram_db_connects_total{{alias="{alias}",{worker}}} {count}'
+        )
+    if not _pools:
+        return lines
+    lines += [
+        '# TYPE foodgram_db_pool_size gauge',
+        '# TYPE foodgram_db_pool_checked_out gauge',
+        '# TYPE foodgram_db_pool_idle gauge',
+        '# TYPE foodgram_db_pool_connections_created_total counter',
+        '# TYPE foodgram_db_pool_acquired_total counter',
+        '# TYPE foodgram_db_pool_wait_seconds_total counter',
+        '# TYPE foodgram_db_pool_timeouts_total counter',
+    ]
+    for (alias, name), pool in sorted(_pools.items()):
+        labels = f'alias="{alias}",database="{name}",{worker}'
+        with pool.lock:
+            lines += [
+                f'foodgram_db_pool_size{{{labels}}} {pool.max_size}',
+                f'foodgram_db_pool_checked_out{{{labels}}} '
+                f'{pool.checked_out}',
+                f'foodgram_db_pool_idle{{{labels}}} {len(pool.idle)}',
+                f'foodgram_db_pool_connections_created_total{{{labels}}} '
+                f'{pool.created}',
+                f'foodgram_db_pool_acquired_total{{{labels}}} '
+                f'{pool.acquired}',
+                f'foodgram_db_pool_wait_seconds_total{{{labels}}} '
+                f'{pool.wait_duration:.6f}',
+                f'foodgram_db_pool_timeouts_total{{{labels}}} '
+                f'{pool.timeouts}',
+            ]
+    return lines
+
+
+registry.register_collector(collect_metrics)
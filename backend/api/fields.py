@@ -0,0 +1,158 @@
+import base64
+import binascii
+import uuid
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from rest_framework import serializers
+from rest_framework.fields import SkipField
+from rest_framework.relations import MANY_RELATION_KWARGS
+
+from recipes.images import image_url, variant_url
+
+
+class BulkManyRelatedField(serializers.ManyRelatedField):
+    """Список связанных объектов, проверяемый одним запросом."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+        return self.child_relation.to_internal_value_bulk(data)
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField, который при many=True получает все объекты
+    одним запросом in_bulk вместо запроса на каждый id.
+    """
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BulkManyRelatedField(**list_kwargs)
+
+    def to_internal_value_bulk(self, data):
+        pks = []
+        for value in data:
+            if isinstance(value, bool):
+                self.fail('incorrect_type', data_type=type(value).__name__)
+            try:
+                pks.append(int(value))
+            except (TypeError, ValueError):
+                self.fail('incorrect_type', data_type=type(value).__name__)
+        pks = list(dict.fromkeys(pks))
+        found = self.get_queryset().in_bulk(pks)
+        missing = [pk for pk in pks if pk not in found]
+        if missing:
+            raise serializers.ValidationError([
+                self.error_messages['does_not_exist'].format(pk_value=pk)
+                for pk in missing
+            ])
+        return [found[pk] for pk in pks]
+
+
+class StreamingBase64ImageField(serializers.ImageField):
+    """
+    Картинка в base64 (`data:image/...;base64,...`), декодируемая частями
+    во временный файл без второй полной копии в памяти.
+    Ссылка (http...) принимается только при изменении рецепта и только
+    на его текущую картинку или её копию: картинка остаётся прежней.
+    """
+
+    default_error_messages = {
+        'too_large': 'Размер картинки больше {max_size} байт.',
+        'not_current': (
+            'Ссылка не указывает на текущую картинку рецепта, '
+            'загрузите картинку в base64.'
+        ),
+    }
+    chunk_size = 64 * 1024
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) and data.startswith(('http://', 'https://')):
+            if self.is_current_image(data):
+                raise SkipField()
+            self.fail('not_current')
+        if isinstance(data, str) and data.startswith('data:'):
+            data = self.decode(data)
+        return super().to_internal_value(data)
+
+    def is_current_image(self, url):
+        """Путь ссылки совпадает с путём картинки рецепта или её копии."""
+        recipe = getattr(self.parent, 'instance', None)
+        if recipe is None or not recipe.image:
+            return False
+        urls = {image_url(recipe.image.name, {}, None)}
+        urls.update(
+            variant_url(recipe, variant, file_format)
+            for variant in settings.RECIPE_IMAGE_VARIANTS
+            for file_format in settings.RECIPE_IMAGE_FORMATS
+        )
+        return urlsplit(url).path in {urlsplit(path).path for path in urls}
+
+    def decode(self, data):
+        header, _, payload = data.partition(';base64,')
+        if not payload:
+            self.fail('invalid')
+        max_size = settings.RECIPE_IMAGE_MAX_SIZE
+        if len(payload) // 4 * 3 > max_size:
+            self.fail('too_large', max_size=max_size)
+        content_type = header[len('data:'):]
+        extension = content_type.rpartition('/')[2].lower()
+        upload = TemporaryUploadedFile(
+            f'{uuid.uuid4().hex}.{extension}', content_type, 0, None
+        )
+        try:
+            for start in range(0, len(payload), self.chunk_size):
+                upload.write(base64.b64decode(
+                    payload[start:start + self.chunk_size], validate=True
+                ))
+        except binascii.Error:
+            upload.close()
+            self.fail('invalid_image')
+        upload.size = upload.tell()
+        upload.seek(0)
+        return upload
+
+
+class RecipeImageField(serializers.Field):
+    """
+    Адрес уменьшенной копии картинки рецепта в JPEG. Копия берётся
+    из аргумента variant или context['image_variant'], по умолчанию card.
+    """
+
+    def __init__(self, variant=None, **kwargs):
+        self.variant = variant
+        kwargs.update(source='*', read_only=True)
+        super().__init__(**kwargs)
+
+    def build_url(self, url):
+        request = self.context.get('request')
+        if url and request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
+    def to_representation(self, recipe):
+        variant = self.variant or self.context.get('image_variant', 'card')
+        return self.build_url(variant_url(recipe, variant))
+
+
+class RecipeImageVariantsField(RecipeImageField):
+    """Адреса всех копий картинки: {копия: {формат: адрес}}."""
+
+    def to_representation(self, recipe):
+        return {
+            variant: {
+                file_format: self.build_url(
+                    variant_url(recipe, variant, file_format)
+                )
+                for file_format in settings.RECIPE_IMAGE_FORMATS
+            }
+            for variant in settings.RECIPE_IMAGE_VARIANTS
+        }
@@ -1,33 +1,45 @@
-from django.core.exceptions import ValidationError
-
+from django.conf import settings
+from django.db.models import Exists, F, FloatField, OuterRef, Value
+from django.db.models.functions import Coalesce
 from django_filters.fields import MultipleChoiceField
 from django_filters.rest_framework import CharFilter, FilterSet, filters
 from django_filters.widgets import BooleanWidget
 
-from recipes.models import Ingredient, Recipe
+from recipes.models import Ingredient, Recipe, Tag
 
+from .cache import TAGS, get_cache, get_generations
+from .replicas import primary
 
-class TagsMultipleChoiceField(MultipleChoiceField):
-    """Класс для фильтрации обьектов Tags."""
 
-    def validate(self, value):
-        if self.required and not value:
-            raise ValidationError(
-                self.error_messages['required'], code='required'
-            )
-        for value in value:
-            if value in self.choices and not self.valid_value(value):
-                raise ValidationError(
-                    self.error_messages['invalid_choice'],
-                    code='invalid_choice',
-                    params={'value': value},
-                )
+def get_tag_ids():
+    """
+    Словарь {slug: id} тегов из кэша. Ключ включает поколение области
+    tags, поэтому изменение тегов сразу даёт новый словарь.
+    """
+    cache = get_cache()
+    key = f'recipes:tag_ids:{get_generations([TAGS])[0]}'
+    tag_ids = cache.get(key)
+    if tag_ids is None:
+        with primary():
+            tag_ids = dict(Tag.objects.values_list('slug', 'id'))
+        cache.set(key, tag_ids, settings.RECIPES_CACHE_TIMEOUT)
+    return tag_ids
+
+
+class MultipleValueField(MultipleChoiceField):
+    """
+    Несколько значений параметра без списка допустимых вариантов:
+    неизвестные значения отбрасывает метод фильтра.
+    """
+
+    def valid_value(self, value):
+        return True
 
 
-class TagsFilter(filters.AllValuesMultipleFilter):
-    """Класс для фильтрации обьектов Tags."""
+class MultipleValueFilter(filters.MultipleChoiceFilter):
+    """Класс для фильтрации по нескольким значениям без запроса choices."""
 
-    field_class = TagsMultipleChoiceField
+    field_class = MultipleValueField
 
 
 class IngredientSearchFilter(FilterSet):
@@ -43,17 +55,55 @@ class IngredientSearchFilter(FilterSet):
 class RecipeFilter(FilterSet):
     """Класс для фильтрации обьектов Recipes."""
 
-    author = filters.AllValuesMultipleFilter(
-        field_name='author__id', label='Автор'
-    )
+    author = MultipleValueFilter(method='filter_author', label='Автор')
     is_in_shopping_cart = filters.BooleanFilter(
         widget=BooleanWidget(), label='В списке покупок.'
     )
     is_favorited = filters.BooleanFilter(
         widget=BooleanWidget(), label='В избранном.'
     )
-    tags = TagsFilter(field_name='tags__slug')
+    tags = MultipleValueFilter(method='filter_tags', label='Теги')
+    ordering = filters.ChoiceFilter(
+        choices=(('popular', 'Популярные'), ('trending', 'В тренде')),
+        method='filter_ordering',
+        label='Сортировка',
+    )
 
     class Meta:
         model = Recipe
         fields = ('author', 'tags', 'is_in_shopping_cart', 'is_favorited')
+
+    def filter_author(self, queryset, name, value):
+        """Рецепты любого из авторов, без join с пользователями."""
+        author_ids = [pk for pk in value if pk.isdigit()]
+        if not author_ids:
+            return queryset.none()
+        return queryset.filter(author_id__in=author_ids)
+
+    def filter_tags(self, queryset, name, value):
+        """
+        Рецепты с любым из тегов через EXISTS по промежуточной таблице:
+        строки рецепта не размножаются и DISTINCT не нужен.
+        """
+        tag_ids = get_tag_ids()
+        tag_ids = [tag_ids[slug] for slug in value if slug in tag_ids]
+        if not tag_ids:
+            return queryset.none()
+        return queryset.filter(Exists(
+            Recipe.tags.through.objects.filter(
+                recipe_id=OuterRef('pk'), tag_id__in=tag_ids
+            )
+        ))
+
+    def filter_ordering(self, queryset, name, value):
+        """
+        popular - по счётчику избранного, trending - по рейтингу
+        из RecipeRank, обновляемому командой refresh_trending.
+        """
+        if value == 'popular':
+            return queryset.order_by('-favorites_count', '-id')
+        return queryset.annotate(
+            trending_score=Coalesce(
+                F('rank__score'), Value(0.0), output_field=FloatField()
+            )
+        ).order_by('-trending_score', '-created', '-id')
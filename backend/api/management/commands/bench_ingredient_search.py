@@ -0,0 +1,87 @@
+import csv
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.search import (DatabaseSearchBackend, IngredientIndex,
+                        pg_trgm_available)
+from recipes.models import Ingredient
+
+
+class Command(BaseCommand):
+    help = (
+        'Замер задержки автодополнения ингредиентов: повтор набора '
+        'префиксов названий посимвольно, как при вводе в форме рецепта.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--csv', help='Загрузить справочник из CSV на время замера.'
+        )
+        parser.add_argument('--words', type=int, default=200)
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options['csv']:
+                self.load_csv(options['csv'])
+            self.run(options)
+            transaction.set_rollback(True)
+
+    def load_csv(self, path):
+        with open(path, encoding='utf-8') as file:
+            Ingredient.objects.bulk_create(
+                Ingredient(name=name, measurement_unit=unit)
+                for name, unit in csv.reader(file)
+            )
+
+    def run(self, options):
+        names = list(Ingredient.objects.values_list('name', flat=True))
+        if not names:
+            self.stdout.write('Справочник ингредиентов пуст.')
+            return
+        random.seed(options['seed'])
+        words = random.sample(names, min(options['words'], len(names)))
+        queries = [
+            word[:length].lower()
+            for word in words
+            for length in range(1, len(word) + 1)
+        ]
+        limit = options['limit']
+        started = time.perf_counter()
+        index = IngredientIndex.build()
+        self.stdout.write(
+            f'Индекс из {len(names)} названий собран за '
+            f'{(time.perf_counter() - started) * 1000:.1f} мс, '
+            f'запросов: {len(queries)}'
+        )
+        backends = {
+            'memory': lambda query: index.search(query, limit),
+            'icontains': lambda query: list(
+                Ingredient.objects.filter(name__icontains=query)
+                .values('id', 'name', 'measurement_unit')
+            ),
+        }
+        if pg_trgm_available():
+            backends['pg_trgm'] = (
+                lambda query: DatabaseSearchBackend().search(query, limit)
+            )
+        for name, search in backends.items():
+            self.report(name, search, queries)
+
+    def report(self, name, search, queries):
+        timings = []
+        for query in queries:
+            started = time.perf_counter()
+            search(query)
+            timings.append((time.perf_counter() - started) * 1000)
+        percentiles = statistics.quantiles(timings, n=100)
+        self.stdout.write(
+            f'{name:>10}: p50 {percentiles[49]:.3f} мс, '
+            f'p95 {percentiles[94]:.3f} мс, p99 {percentiles[98]:.3f} мс, '
+            f'max {max(timings):.3f} мс'
+        )
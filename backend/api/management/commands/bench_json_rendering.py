@@ -0,0 +1,66 @@
+import statistics
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.renderers import FastJSONRenderer, orjson
+from api.rows import recipe_rows, recipe_values
+from api.serializers import IngredientsSerializer, ReadRecipesSerializer
+from recipes.models import Ingredient, Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        'Замер сборки и рендеринга JSON для страницы рецептов и всего '
+        'справочника ингредиентов: сериализаторы DRF с JSONRenderer '
+        'против строк values() с FastJSONRenderer.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        request = Request(APIRequestFactory().get('/api/recipes/'))
+        request.user = AnonymousUser()
+        limit = options['limit']
+        recipes = Recipe.objects.for_read(request.user)
+        ingredients = Ingredient.objects.all()
+        fields = IngredientsSerializer.Meta.fields
+        if orjson is None:
+            self.stdout.write('orjson не установлен, JSON - через json.')
+        cases = {
+            f'recipes[{limit}] serializer': lambda: JSONRenderer().render(
+                ReadRecipesSerializer(
+                    recipes[:limit], many=True, context={'request': request}
+                ).data
+            ),
+            f'recipes[{limit}] rows': lambda: FastJSONRenderer().render(
+                recipe_rows(list(recipe_values(recipes)[:limit]), request)
+            ),
+            'ingredients serializer': lambda: JSONRenderer().render(
+                IngredientsSerializer(ingredients, many=True).data
+            ),
+            'ingredients rows': lambda: FastJSONRenderer().render(
+                list(ingredients.values(*fields))
+            ),
+        }
+        for name, render in cases.items():
+            self.report(name, render, options['repeat'])
+
+    def report(self, name, render, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            content = render()
+            timings.append((time.perf_counter() - started) * 1000)
+        percentiles = statistics.quantiles(timings, n=100)
+        self.stdout.write(
+            f'{name:>26}: p50 {percentiles[49]:.3f} мс, '
+            f'p95 {percentiles[94]:.3f} мс, max {max(timings):.3f} мс, '
+            f'{len(content)} байт'
+        )
@@ -0,0 +1,111 @@
+import resource
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.views import RecipesViewSet
+from recipes.models import (Ingredient, IngredientInRecipe, Recipe,
+                            ShoppingBasket, ShoppingCartIngredient)
+from users.models import User
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = (
+        'Замер выгрузки списка покупок на синтетической корзине: '
+        'время до первого байта, общее время и пиковая память. '
+        'Данные создаются в транзакции и откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=5000)
+        parser.add_argument('--ingredients', type=int, default=2000)
+        parser.add_argument('--per-recipe', type=int, default=10)
+        parser.add_argument('--format', default='txt')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user = self.create_cart(
+                options['recipes'], options['ingredients'],
+                options['per_recipe'],
+            )
+            self.measure(user, options['format'])
+            transaction.set_rollback(True)
+
+    def create_cart(self, recipes_count, ingredients_count, per_recipe):
+        user = User.objects.create(
+            email='bench-shopping-cart@foodgram.local',
+            username='bench-shopping-cart',
+        )
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'bench-{number}', measurement_unit='г')
+            for number in range(ingredients_count)
+        )
+        ingredient_ids = list(
+            Ingredient.objects.filter(name__startswith='bench-')
+            .values_list('pk', flat=True)
+        )
+        for start in range(0, recipes_count, BATCH_SIZE):
+            Recipe.objects.bulk_create(
+                Recipe(author=user, name=f'bench-{number}', text='bench',
+                       cooking_time=1)
+                for number in range(
+                    start, min(start + BATCH_SIZE, recipes_count)
+                )
+            )
+            recipes = user.recipes.order_by('pk')[start:start + BATCH_SIZE]
+            IngredientInRecipe.objects.bulk_create(
+                IngredientInRecipe(
+                    recipe=recipe,
+                    ingredient_id=ingredient_ids[
+                        (recipe.pk + offset) % len(ingredient_ids)
+                    ],
+                    amount=offset + 1,
+                )
+                for recipe in recipes
+                for offset in range(per_recipe)
+            )
+            ShoppingBasket.objects.bulk_create(
+                ShoppingBasket(user=user, recipe=recipe) for recipe in recipes
+            )
+        ShoppingCartIngredient.objects.rebuild([user.id])
+        self.stdout.write(
+            f'Корзина: {recipes_count} рецептов, '
+            f'{recipes_count * per_recipe} строк ингредиентов.'
+        )
+        return user
+
+    def measure(self, user, file_format):
+        request = APIRequestFactory().get(
+            '/api/recipes/download_shopping_cart/', {'format': file_format}
+        )
+        force_authenticate(request, user=user)
+        view = RecipesViewSet.as_view(
+            {'get': 'download_shopping_cart'},
+            **RecipesViewSet.download_shopping_cart.kwargs,
+        )
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        tracemalloc.start()
+        started = time.perf_counter()
+        response = view(request)
+        first_byte = None
+        size = 0
+        for chunk in response.streaming_content:
+            if first_byte is None:
+                first_byte = time.perf_counter() - started
+            size += len(chunk)
+        total = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        self.stdout.write(
+            f'Формат: {file_format}, размер: {size} байт\n'
+            f'Время до первого байта: {first_byte * 1000:.1f} мс\n'
+            f'Общее время: {total * 1000:.1f} мс\n'
+            f'Пик выделений Python: {peak / 1024:.0f} КиБ\n'
+            f'Пиковый RSS процесса: {rss_before} -> {rss_after} КиБ'
+        )
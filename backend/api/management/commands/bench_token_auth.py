@@ -0,0 +1,68 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.authentication import CachedTokenAuthentication, get_token_cache
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Замер пропускной способности аутентификации по токену: '
+        'TokenAuthentication против CachedTokenAuthentication на наборе '
+        'пользователей, запросы идут по кругу.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--requests', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            keys = self.make_tokens(options['users'])
+            factory = APIRequestFactory()
+            requests = [
+                factory.get('/api/', HTTP_AUTHORIZATION=f'Token {key}')
+                for key in keys
+            ]
+            get_token_cache().delete(keys)
+            for authentication in (
+                TokenAuthentication(), CachedTokenAuthentication()
+            ):
+                self.report(authentication, requests, options['requests'])
+            get_token_cache().delete(keys)
+            transaction.set_rollback(True)
+
+    def make_tokens(self, count):
+        users = User.objects.bulk_create(
+            User(
+                email=f'bench-auth-{number}@example.com',
+                username=f'bench-auth-{number}',
+                first_name='bench', last_name='auth',
+            )
+            for number in range(count)
+        )
+        if users[0].pk is None:
+            users = User.objects.filter(username__startswith='bench-auth-')
+        return [Token.objects.create(user=user).key for user in users]
+
+    def report(self, authentication, requests, total):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            for number in range(total):
+                authentication.authenticate(
+                    Request(requests[number % len(requests)])
+                )
+            elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'{type(authentication).__name__:>26}: '
+            f'{total / elapsed:.0f} запросов/с, '
+            f'{elapsed / total * 1000:.3f} мс на запрос, '
+            f'запросов к базе: {len(queries)}'
+        )
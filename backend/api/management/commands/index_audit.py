@@ -0,0 +1,129 @@
+import re
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.http import QueryDict
+
+from api.filters import RecipeFilter
+from api.rows import recipe_values
+from recipes.models import (Favorite, Recipe, ShoppingBasket,
+                            ShoppingCartIngredient, Tag)
+from users.models import Follow, User
+
+SEQ_SCAN = {
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+    'sqlite': re.compile(
+        r'\bSCAN (?:TABLE )?(\w+)(?!\w| USING (?:COVERING )?INDEX)'
+    ),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Проверка индексов: EXPLAIN для запросов горячих путей API '
+        '(лента, фильтры, флаги пользователя, счётчики, подписки, список '
+        'покупок) и список таблиц, читаемых полным перебором.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verbose-plans', action='store_true',
+            help='Печатать планы запросов целиком.',
+        )
+        parser.add_argument(
+            '--no-seqscan', action='store_true',
+            help=(
+                'PostgreSQL: запретить планировщику полный перебор, чтобы '
+                'на маленькой базе увидеть, есть ли подходящий индекс.'
+            ),
+        )
+        parser.add_argument(
+            '--strict', action='store_true',
+            help='Завершиться с ошибкой, если найден полный перебор.',
+        )
+
+    def handle(self, *args, **options):
+        pattern = SEQ_SCAN.get(connection.vendor)
+        if pattern is None:
+            self.stdout.write(
+                f'Разбор планов для {connection.vendor} не поддерживается, '
+                f'планы выводятся целиком.'
+            )
+            options['verbose_plans'] = True
+        problems = 0
+        with transaction.atomic():
+            if options['no_seqscan'] and connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+            for name, queryset in self.query_shapes():
+                if queryset.query.is_empty():
+                    self.stdout.write(
+                        f'{name}: пропущен, нет данных для параметров '
+                        f'запроса'
+                    )
+                    continue
+                plan = queryset.explain()
+                scans = sorted(set(pattern.findall(plan))) if pattern else []
+                if scans:
+                    problems += 1
+                    self.stdout.write(self.style.WARNING(
+                        f'{name}: полный перебор {", ".join(scans)}'
+                    ))
+                else:
+                    self.stdout.write(f'{name}: ok')
+                if options['verbose_plans']:
+                    self.stdout.write(plan + '\n')
+            transaction.set_rollback(True)
+        if problems and options['strict']:
+            raise CommandError(f'Запросов с полным перебором: {problems}')
+
+    def query_shapes(self):
+        """Запросы в том виде, в каком их строят вьюхи и команды."""
+        user = User.objects.order_by('pk').first() or AnonymousUser()
+        user_id = user.pk or 0
+        tag = Tag.objects.values_list('slug', flat=True).first() or 'tag'
+        recipe_id = (
+            Recipe.objects.values_list('pk', flat=True).first() or 0
+        )
+        recipes = Recipe.objects.for_read(user)
+
+        def feed(query):
+            return RecipeFilter(
+                QueryDict(query), queryset=recipes
+            ).qs
+
+        yield 'лента', recipe_values(recipes)[:6]
+        yield 'лента по автору', recipe_values(feed(f'author={user_id}'))[:6]
+        yield 'лента по тегу', recipe_values(feed(f'tags={tag}'))[:6]
+        yield 'популярные', recipe_values(feed('ordering=popular'))[:6]
+        yield 'в тренде', recipe_values(feed('ordering=trending'))[:6]
+        yield 'избранное пользователя', recipe_values(
+            feed('is_favorited=1')
+        )[:6]
+        yield 'список покупок пользователя', recipe_values(
+            feed('is_in_shopping_cart=1')
+        )[:6]
+        yield 'избранное рецепта', Favorite.objects.filter(
+            recipe_id=recipe_id
+        ).values('user_id')
+        yield 'списки покупок с рецептом', ShoppingBasket.objects.filter(
+            recipe_id=recipe_id
+        ).values('user_id')
+        yield 'подписчики автора', Follow.objects.filter(
+            author_id=user_id
+        ).values('user_id')
+        yield 'подписки пользователя', Follow.objects.filter(
+            user_id=user_id
+        ).select_related('author').order_by('-id')[:6]
+        yield 'рецепты авторов подписок', Recipe.objects.filter(
+            author_id__in=[user_id]
+        ).order_by('-created', '-id').values('id')
+        yield 'выгрузка списка покупок', ShoppingCartIngredient.objects.filter(
+            user_id=user_id
+        ).values('ingredient__name', 'total_amount').order_by(
+            'ingredient__name'
+        )
+        yield 'пересборка списка покупок', (
+            ShoppingCartIngredient.objects.expected([user_id])
+        )
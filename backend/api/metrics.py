@@ -0,0 +1,100 @@
+"""
+Метрики запросов к API в памяти процесса и их вывод в формате Prometheus.
+
+Каждый процесс gunicorn хранит свои значения, поэтому в метках есть
+`worker` (pid процесса).
+"""
+import os
+import threading
+from collections import defaultdict
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class ViewMetrics:
+    """Накопленные значения по одной вьюхе и методу."""
+
+    def __init__(self):
+        self.statuses = defaultdict(int)
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.duration = 0.0
+        self.queries = 0
+        self.db_duration = 0.0
+        self.serializer_duration = 0.0
+
+    def observe(self, status, duration, queries, db_duration,
+                serializer_duration):
+        self.statuses[status] += 1
+        self.count += 1
+        self.duration += duration
+        self.queries += queries
+        self.db_duration += db_duration
+        self.serializer_duration += serializer_duration
+        for number, bound in enumerate(BUCKETS):
+            if duration <= bound:
+                self.buckets[number] += 1
+
+
+class MetricsRegistry:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = defaultdict(ViewMetrics)
+        self.collectors = []
+
+    def observe(self, view, method, status, duration, queries, db_duration,
+                serializer_duration):
+        with self.lock:
+            self.views[view, method].observe(
+                status, duration, queries, db_duration, serializer_duration
+            )
+
+    def register_collector(self, collector):
+        """
+        Дополнительный источник метрик: функция, возвращающая строки
+        в формате Prometheus.
+        """
+        self.collectors.append(collector)
+
+    def render(self):
+        worker = f'worker="{os.getpid()}"'
+        lines = [
+            '# TYPE foodgram_http_requests_total counter',
+            '# TYPE foodgram_http_request_duration_seconds histogram',
+            '# TYPE foodgram_db_queries_total counter',
+            '# TYPE foodgram_db_duration_seconds_total counter',
+            '# TYPE foodgram_serializer_duration_seconds_total counter',
+        ]
+        with self.lock:
+            for (view, method), metrics in sorted(self.views.items()):
+                labels = f'view="{view}",method="{method}",{worker}'
+                for status, count in sorted(metrics.statuses.items()):
+                    lines.append(
+                        f'foodgram_http_requests_total'
+                        f'{{{labels},status="{status}"}} {count}'
+                    )
+                for bound, count in zip(BUCKETS, metrics.buckets):
+                    lines.append(
+                        f'foodgram_http_request_duration_seconds_bucket'
+                        f'{{{labels},le="{bound}"}} {count}'
+                    )
+                lines += [
+                    f'foodgram_http_request_duration_seconds_bucket'
+                    f'{{{labels},le="+Inf"}} {metrics.count}',
+                    f'foodgram_http_request_duration_seconds_sum'
+                    f'{{{labels}}} {metrics.duration:.6f}',
+                    f'foodgram_http_request_duration_seconds_count'
+                    f'{{{labels}}} {metrics.count}',
+                    f'foodgram_db_queries_total{{{labels}}} {metrics.queries}',
+                    f'foodgram_db_duration_seconds_total'
+                    f'{{{labels}}} {metrics.db_duration:.6f}',
+                    f'foodgram_serializer_duration_seconds_total'
+                    f'{{{labels}}} {metrics.serializer_duration:.6f}',
+                ]
+        for collector in self.collectors:
+            lines.extend(collector())
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
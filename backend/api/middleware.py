@@ -0,0 +1,213 @@
+import logging
+import re
+import time
+import traceback
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import connections
+from django.utils.module_loading import import_string
+from rest_framework.permissions import SAFE_METHODS
+
+from .metrics import registry
+from .replicas import RoutingState, routing
+
+logger = logging.getLogger('foodgram.queries')
+
+current_stats = ContextVar('current_stats', default=None)
+
+SQL_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+
+
+def sql_shape(sql):
+    """SQL без литералов: одинаковый для запросов, отличающихся id."""
+    return SQL_LITERALS.sub('?', sql)
+
+
+def stack_sample():
+    """Кадры стека из кода проекта, без Django и библиотек."""
+    base_dir = str(settings.BASE_DIR)
+    frames = [
+        frame for frame in traceback.extract_stack()[:-2]
+        if frame.filename.startswith(base_dir)
+        and 'site-packages' not in frame.filename
+        and frame.filename != __file__
+    ]
+    return ''.join(
+        traceback.format_list(frames[-settings.SLOW_QUERY_STACK_DEPTH:])
+    )
+
+
+class RequestStats:
+    """Счётчики одного запроса."""
+
+    def __init__(self):
+        self.label = None
+        self.queries = 0
+        self.db_duration = 0.0
+        self.serializer_duration = 0.0
+        self.serializer_depth = 0
+        self.shapes = {}
+
+    def record_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.queries += 1
+            self.db_duration += duration
+            self.check_query(sql, duration)
+
+    def check_query(self, sql, duration):
+        if duration * 1000 >= settings.SLOW_QUERY_MS:
+            logger.warning(
+                'Медленный запрос %.1f мс в %s: %s\n%s',
+                duration * 1000, self.label, sql, stack_sample()
+            )
+        shape = sql_shape(sql)
+        repeats = self.shapes.get(shape, 0) + 1
+        self.shapes[shape] = repeats
+        if repeats == settings.REPEATED_QUERY_THRESHOLD:
+            logger.warning(
+                'Запрос повторён %d раз в %s, возможно N+1: %s\n%s',
+                repeats, self.label, shape, stack_sample()
+            )
+
+
+@contextmanager
+def timed_serialization():
+    """
+    Учёт времени сериализации в статистике текущего запроса. Запросы
+    к базе внутри неё учитываются только во времени базы.
+    """
+    stats = current_stats.get()
+    if stats is None:
+        yield
+        return
+    stats.serializer_depth += 1
+    started = time.perf_counter()
+    db_started = stats.db_duration
+    try:
+        yield
+    finally:
+        stats.serializer_depth -= 1
+        if not stats.serializer_depth:
+            stats.serializer_duration += (
+                time.perf_counter() - started
+                - (stats.db_duration - db_started)
+            )
+
+
+class TimedSerializationMixin:
+    """Миксин вьюсета: время to_representation() его сериализаторов."""
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        to_representation = serializer.to_representation
+
+        @wraps(to_representation)
+        def timed(instance):
+            with timed_serialization():
+                return to_representation(instance)
+
+        serializer.to_representation = timed
+        return serializer
+
+
+def get_view_label(view_func):
+    """Имя вьюсета и действия, например RecipesViewSet.list."""
+    view_class = getattr(view_func, 'cls', None)
+    if view_class is None:
+        return f'{view_func.__module__}.{view_func.__name__}'
+    return view_class.__name__
+
+
+class InstrumentationMiddleware:
+    """
+    Число SQL-запросов, время в базе, время сериализации и общая
+    длительность запроса. Значения попадают в заголовок Server-Timing
+    и в метрики вьюхи.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(stats.record_query)
+                    )
+                response = self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        duration = time.perf_counter() - started
+        response['Server-Timing'] = ', '.join((
+            f'db;dur={stats.db_duration * 1000:.1f};'
+            f'desc="{stats.queries} queries"',
+            f'serializer;dur={stats.serializer_duration * 1000:.1f}',
+            f'total;dur={duration * 1000:.1f}',
+        ))
+        if stats.label is not None:
+            registry.observe(
+                stats.label, request.method, response.status_code, duration,
+                stats.queries, stats.db_duration, stats.serializer_duration
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        stats = current_stats.get()
+        if stats is None:
+            return None
+        label = get_view_label(view_func)
+        actions = getattr(view_func, 'actions', None)
+        if actions:
+            action = actions.get(request.method.lower(), 'not_allowed')
+            label = f'{label}.{action}'
+        stats.label = label
+        return None
+
+
+class ReplicaMiddleware:
+    """
+    Чтение GET-запросов к REPLICA_VIEWS с реплик. Запрос с записью
+    ставит cookie REPLICA_PIN_COOKIE на REPLICA_PIN_SECONDS, пока она
+    есть, запросы клиента читают из default.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.views = {
+            import_string(path) for path in settings.REPLICA_VIEWS
+        }
+
+    def __call__(self, request):
+        state = RoutingState(
+            pinned=request.method not in SAFE_METHODS
+            or settings.REPLICA_PIN_COOKIE in request.COOKIES
+        )
+        token = routing.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            routing.reset(token)
+        if state.wrote:
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE, '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True, samesite='Lax',
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = routing.get()
+        if state is not None and getattr(view_func, 'cls', None) in self.views:
+            state.use_replica()
+        return None
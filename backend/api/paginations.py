@@ -1,8 +1,224 @@
+import base64
+import hashlib
+import json
+from datetime import date, datetime
+from functools import partial
+
 from django.conf import settings
-from rest_framework.pagination import PageNumberPagination
+from django.core.exceptions import (EmptyResultSet, FieldDoesNotExist,
+                                    ValidationError)
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .cache import get_cache, get_generations
+from .replicas import primary
+
+CURSOR_PARAM = 'cursor'
+
+
+class CachedCountPaginator(Paginator):
+    """
+    Paginator, который кэширует число объектов на
+    PAGINATION_COUNT_CACHE_TIMEOUT секунд, если известны области кэша
+    выдачи. Ключ - хэш SQL подсчёта и поколений областей, поэтому
+    изменение выдачи сразу сбрасывает подсчёт. Аннотации из подсчёта
+    исключаются.
+    """
+
+    def __init__(self, *args, scopes=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.scopes = scopes
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list.order_by().values('pk')
+        try:
+            sql = str(queryset.query)
+        except EmptyResultSet:
+            return 0
+        if self.scopes is None:
+            return queryset.count()
+        payload = json.dumps([sql, get_generations(self.scopes)])
+        key = (
+            'pagination:count:' + hashlib.sha1(payload.encode()).hexdigest()
+        )
+        cache = get_cache()
+        count = cache.get(key)
+        if count is None:
+            with primary():
+                count = queryset.count()
+            cache.set(key, count, settings.PAGINATION_COUNT_CACHE_TIMEOUT)
+        return count
+
+
+class KeysetPagination(BasePagination):
+    """
+    Пагинация по курсору без OFFSET и COUNT(*).
+    Курсор хранит значения полей сортировки последнего объекта страницы,
+    следующая страница выбирается условием по этим полям. Сортировка
+    берётся из queryset и дополняется полем id.
+    """
+
+    page_size = settings.PAGE_SIZE
+    max_page_size = 20
+    page_size_query_param = 'limit'
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+        values, reverse = self.decode_cursor(request, queryset.model)
+        ordering = self.ordering
+        if reverse:
+            ordering = [self.invert(name) for name in ordering]
+        if values is not None:
+            queryset = queryset.filter(self.after(ordering, values))
+        page = list(queryset.order_by(*ordering)[:self.page_size + 1])
+        has_more = len(page) > self.page_size
+        page = page[:self.page_size]
+        if reverse:
+            page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, values is not None
+        self.page = page
+        return page
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(size, self.max_page_size) if size > 0 else self.page_size
+
+    def get_ordering(self, queryset):
+        ordering = [
+            name for name in (
+                queryset.query.order_by or queryset.model._meta.ordering
+            )
+            if isinstance(name, str)
+        ] or ['-id']
+        if not {'id', '-id', 'pk', '-pk'} & set(ordering):
+            ordering.append('-id' if ordering[0].startswith('-') else 'id')
+        return ordering
+
+    @staticmethod
+    def invert(name):
+        return name[1:] if name.startswith('-') else f'-{name}'
+
+    @staticmethod
+    def after(ordering, values):
+        """Условие "после курсора" для составного ключа сортировки."""
+        condition = Q()
+        equal = {}
+        for name, value in zip(ordering, values):
+            field = name.lstrip('-')
+            lookup = 'lt' if name.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{field}__{lookup}': value})
+            equal[field] = value
+        return condition
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(CURSOR_PARAM)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            values, reverse = payload['v'], bool(payload['r'])
+            if len(values) != len(self.ordering):
+                raise ValueError
+            return [
+                self.to_python(model, name.lstrip('-'), value)
+                for name, value in zip(self.ordering, values)
+            ], reverse
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def to_python(model, name, value):
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return value
+        return field.to_python(value)
+
+    def encode_cursor(self, obj, reverse):
+        values = []
+        for name in self.ordering:
+            name = name.lstrip('-')
+            if isinstance(obj, dict):
+                value = obj[name]
+            else:
+                value = getattr(obj, name)
+            if isinstance(value, (date, datetime)):
+                value = value.isoformat()
+            values.append(value)
+        payload = json.dumps({'v': values, 'r': int(reverse)})
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def get_link(self, obj, reverse):
+        url = self.request.build_absolute_uri()
+        if obj is None:
+            return replace_query_param(
+                remove_query_param(url, CURSOR_PARAM), CURSOR_PARAM, ''
+            )
+        return replace_query_param(
+            url, CURSOR_PARAM, self.encode_cursor(obj, reverse)
+        )
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.get_link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return self.get_link(None, reverse=False)
+        return self.get_link(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
 
 
 class LimitPageNumberPagination(PageNumberPagination):
+    """
+    Постраничная выдача. Подсчёт кэшируется для вьюх с методом
+    get_count_scopes(request) - областями кэша, от которых зависит выдача.
+    С параметром ?cursor (для первой страницы - пустым) выдача идёт
+    по курсору, без count.
+    """
+
     page_size = settings.PAGE_SIZE
     max_page_size = 20
     page_size_query_param = 'limit'
+    django_paginator_class = CachedCountPaginator
+    keyset_class = KeysetPagination
+    keyset = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if CURSOR_PARAM in request.query_params:
+            self.keyset = self.keyset_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        get_scopes = getattr(view, 'get_count_scopes', None)
+        if get_scopes is not None:
+            self.django_paginator_class = partial(
+                type(self).django_paginator_class, scopes=get_scopes(request)
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
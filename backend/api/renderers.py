@@ -0,0 +1,196 @@
+"""Рендереры ответов API и выгрузки списка покупок."""
+import csv
+import io
+import json
+import os
+from itertools import chain
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+TITLE_SHOP_LIST = 'Список покупок с сайта Foodgram:\n\n'
+PDF_FONT_NAME = 'ShoppingListFont'
+
+
+def get_shopping_list_renderers():
+    """Рендереры из настройки SHOPPING_LIST_RENDERERS."""
+    return [import_string(path) for path in settings.SHOPPING_LIST_RENDERERS]
+
+
+def stream_shopping_list(renderer, rows):
+    """
+    Части файла из итератора строк. Ответ закрывает генератор и при
+    обрыве соединения, тогда курсор на сервере закрывается сразу.
+    """
+    try:
+        yield from renderer.stream(rows)
+    finally:
+        rows.close()
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSON через orjson, если он установлен. Типы, которых orjson не
+    знает (Decimal, даты, ленивые строки), кодируются как в DRF.
+    С отступами (?indent в Accept) и без orjson - обычный JSONRenderer.
+    """
+
+    options = (
+        orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if orjson else 0
+    )
+    default = JSONEncoder().default
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        if orjson is None or self.get_indent(
+            accepted_media_type, renderer_context
+        ):
+            return super().render(
+                data, accepted_media_type, renderer_context
+            )
+        content = orjson.dumps(data, default=self.default, option=self.options)
+        return content.replace(
+            '\u2028'.encode(), b'\\u2028'
+        ).replace('\u2029'.encode(), b'\\u2029')
+
+
+class ShoppingListRenderer(BaseRenderer):
+    """
+    Базовый рендерер списка покупок.
+    Файл отдаётся частями по мере чтения строк агрегата, строка содержит
+    `name`, `measurement_unit` и `total`.
+    """
+
+    charset = 'utf-8'
+    extension = None
+
+    def get_content_type(self):
+        if self.charset:
+            return f'{self.media_type}; charset={self.charset}'
+        return self.media_type
+
+    def stream(self, ingredients):
+        """Итератор частей файла."""
+        raise NotImplementedError('.stream() must be implemented')
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Ответы с ошибками, файл списка отдаётся через stream()."""
+        if data is None:
+            return b''
+        return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+
+class TextShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+    extension = 'txt'
+
+    def stream(self, ingredients):
+        yield TITLE_SHOP_LIST
+        for ingredient in ingredients:
+            yield (
+                f"{ingredient['name']} - {ingredient['total']}/"
+                f"{ingredient['measurement_unit']}\n"
+            )
+
+
+class CSVShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+    extension = 'csv'
+
+    def stream(self, ingredients):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(('name', 'measurement_unit', 'total'))
+        for ingredient in ingredients:
+            writer.writerow((
+                ingredient['name'],
+                ingredient['measurement_unit'],
+                ingredient['total'],
+            ))
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+
+
+class JSONShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'application/json'
+    format = 'json'
+    extension = 'json'
+
+    def stream(self, ingredients):
+        separator = '['
+        for ingredient in ingredients:
+            yield separator + json.dumps(ingredient, ensure_ascii=False)
+            separator = ','
+        yield '[]' if separator == '[' else ']'
+
+
+class PDFShoppingListRenderer(ShoppingListRenderer):
+    """
+    PDF собирается целиком в памяти: таблица ссылок в конце файла
+    не позволяет отдавать его по частям до окончания сборки.
+    """
+
+    media_type = 'application/pdf'
+    format = 'pdf'
+    extension = 'pdf'
+    charset = None
+    font_size = 12
+    margin = 50
+
+    def get_font(self):
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.pdfbase.ttfonts import TTFont
+
+        if PDF_FONT_NAME in pdfmetrics.getRegisteredFontNames():
+            return PDF_FONT_NAME
+        if not os.path.exists(settings.SHOPPING_LIST_PDF_FONT):
+            return 'Helvetica'
+        pdfmetrics.registerFont(
+            TTFont(PDF_FONT_NAME, settings.SHOPPING_LIST_PDF_FONT)
+        )
+        return PDF_FONT_NAME
+
+    def stream(self, ingredients):
+        from reportlab.lib.pagesizes import A4
+        from reportlab.pdfgen import canvas
+
+        content = io.BytesIO()
+        pdf = canvas.Canvas(content, pagesize=A4)
+        font = self.get_font()
+        _, height = A4
+        line_height = self.font_size * 1.5
+        lines = (
+            f"{ingredient['name']} - {ingredient['total']}/"
+            f"{ingredient['measurement_unit']}"
+            for ingredient in ingredients
+        )
+        text = None
+        for number, line in enumerate(
+            chain((TITLE_SHOP_LIST.strip(), ''), lines)
+        ):
+            if number % int((height - 2 * self.margin) // line_height) == 0:
+                if text is not None:
+                    pdf.drawText(text)
+                    pdf.showPage()
+                text = pdf.beginText(self.margin, height - self.margin)
+                text.setFont(font, self.font_size)
+                text.setLeading(line_height)
+            text.textLine(line)
+        pdf.drawText(text)
+        pdf.save()
+        content.seek(0)
+        yield from iter(lambda: content.read(64 * 1024), b'')
@@ -0,0 +1,89 @@
+"""
+Чтение с реплик базы.
+
+ReplicaMiddleware отмечает GET-запросы к вьюхам из REPLICA_VIEWS,
+ReplicaRouter направляет их чтение на одну из REPLICA_DATABASES,
+выбранную на весь запрос. Запись всегда идёт в default. После записи
+чтение до конца запроса и следующие REPLICA_PIN_SECONDS секунд (по cookie)
+идёт в default, чтобы клиент сразу видел свои изменения.
+
+Данные для общего кэша читаются из default (primary()): ключи кэша
+содержат поколения, и страница, собранная на отстающей реплике, иначе
+попала бы под новое поколение и досталась бы клиенту, который только
+что записал изменения.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+routing = ContextVar('replica_routing', default=None)
+
+# Только что выданный токен может ещё не дойти до реплики.
+PRIMARY_MODELS = {'authtoken.token'}
+
+
+class RoutingState:
+    """Куда читать в текущем запросе."""
+
+    def __init__(self, pinned):
+        self.pinned = pinned
+        self.replica = None
+        self.wrote = False
+
+    def use_replica(self):
+        if settings.REPLICA_DATABASES and not self.pinned:
+            self.replica = random.choice(settings.REPLICA_DATABASES)
+
+    def pin(self):
+        self.pinned = self.wrote = True
+        self.replica = None
+
+
+@contextmanager
+def primary():
+    """Чтение из default внутри блока, например для записи в общий кэш."""
+    state = routing.get()
+    if state is None or state.replica is None:
+        yield
+        return
+    replica, state.replica = state.replica, None
+    try:
+        yield
+    finally:
+        if not state.pinned:
+            state.replica = replica
+
+
+class ReplicaRouter:
+    """Роутер Django: чтение отмеченных запросов - с реплики."""
+
+    def db_for_read(self, model, **hints):
+        state = routing.get()
+        if state is None or state.replica is None:
+            return None
+        if model._meta.label_lower in PRIMARY_MODELS:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = routing.get()
+        if state is not None:
+            state.pin()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.REPLICA_DATABASES}
+        if {obj1._state.db, obj2._state.db} <= databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        """Схема реплик приходит с репликацией."""
+        if db in settings.REPLICA_DATABASES:
+            return False
+        return None
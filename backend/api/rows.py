@@ -0,0 +1,93 @@
+"""
+Быстрое чтение для горячих списков.
+
+Ответ собирается из строк `.values()` обычными словарями, без дерева
+сериализаторов. Формат совпадает с ReadRecipesSerializer,
+TagsSerializer и IngredientsSerializer.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+
+from recipes.images import image_url
+from recipes.models import IngredientInRecipe, Recipe
+
+RECIPE_FIELDS = (
+    'id', 'name', 'image', 'image_variants', 'text', 'cooking_time',
+    'created', 'favorites_count',
+)
+AUTHOR_FIELDS = ('email', 'id', 'username', 'first_name', 'last_name')
+
+
+def recipe_values(queryset):
+    """
+    Queryset строк рецептов с автором и аннотациями вместо объектов.
+    Пагинация применяется уже к нему.
+    """
+    return queryset.prefetch_related(None).values(
+        *RECIPE_FIELDS,
+        *(f'author__{field}' for field in AUTHOR_FIELDS),
+        *queryset.query.annotations,
+    )
+
+
+def build_url(request, url):
+    if url and request is not None:
+        return request.build_absolute_uri(url)
+    return url
+
+
+def recipe_rows(rows, request=None, image_variant='card'):
+    """Рецепты в формате ReadRecipesSerializer из строк recipe_values."""
+    ids = [row['id'] for row in rows]
+    tags = defaultdict(list)
+    for row in Recipe.tags.through.objects.filter(recipe_id__in=ids).values(
+        'recipe_id', 'tag__id', 'tag__name', 'tag__color', 'tag__slug'
+    ).order_by('id'):
+        tags[row['recipe_id']].append({
+            'id': row['tag__id'],
+            'name': row['tag__name'],
+            'color': row['tag__color'],
+            'slug': row['tag__slug'],
+        })
+    ingredients = defaultdict(list)
+    for row in IngredientInRecipe.objects.filter(recipe_id__in=ids).values(
+        'recipe_id', 'ingredient__id', 'ingredient__name',
+        'ingredient__measurement_unit', 'amount',
+    ).order_by('ingredient__name'):
+        ingredients[row['recipe_id']].append({
+            'id': row['ingredient__id'],
+            'name': row['ingredient__name'],
+            'measurement_unit': row['ingredient__measurement_unit'],
+            'amount': row['amount'],
+        })
+    return [
+        {
+            'id': row['id'],
+            'tags': tags[row['id']],
+            'author': {
+                **{field: row[f'author__{field}'] for field in AUTHOR_FIELDS},
+                'is_subscribed': bool(row.get('is_subscribed')),
+            },
+            'ingredients': ingredients[row['id']],
+            'is_favorited': bool(row.get('is_favorited')),
+            'is_in_shopping_cart': bool(row.get('is_in_shopping_cart')),
+            'name': row['name'],
+            'image': build_url(request, image_url(
+                row['image'], row['image_variants'], image_variant
+            )),
+            'images': {
+                variant: {
+                    file_format: build_url(request, image_url(
+                        row['image'], row['image_variants'],
+                        variant, file_format,
+                    ))
+                    for file_format in settings.RECIPE_IMAGE_FORMATS
+                }
+                for variant in settings.RECIPE_IMAGE_VARIANTS
+            },
+            'text': row['text'],
+            'cooking_time': row['cooking_time'],
+        }
+        for row in rows
+    ]
@@ -0,0 +1,164 @@
+"""
+Автодополнение ингредиентов.
+
+Сначала идут ингредиенты, название которых начинается с запроса, затем
+те, где запрос встречается внутри названия (раньше - выше). Результат
+ограничен INGREDIENT_SEARCH_LIMIT.
+
+Индекс в памяти процесса: отсортированные названия для поиска по
+префиксу и триграммы для поиска подстроки. Индекс пересобирается при
+смене поколения `ingredients` в кэше. На PostgreSQL с расширением
+pg_trgm поиск выполняется в базе по триграммному индексу.
+"""
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Value
+from django.db.models.functions import StrIndex, Upper
+
+from recipes.models import Ingredient
+
+from .cache import INGREDIENTS, get_generations
+from .replicas import primary
+
+FIELDS = ('id', 'name', 'measurement_unit')
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class IngredientIndex:
+    """Индекс названий ингредиентов в памяти."""
+
+    def __init__(self, ingredients):
+        self.ingredients = {
+            ingredient['id']: ingredient for ingredient in ingredients
+        }
+        self.names = sorted(
+            (ingredient['name'].lower(), ingredient['id'])
+            for ingredient in ingredients
+        )
+        self.trigrams = defaultdict(set)
+        for name, pk in self.names:
+            for trigram in trigrams(name):
+                self.trigrams[trigram].add(pk)
+
+    @classmethod
+    def build(cls):
+        return cls(list(Ingredient.objects.values(*FIELDS)))
+
+    def prefix_matches(self, query):
+        position = bisect_left(self.names, (query,))
+        while (
+            position < len(self.names)
+            and self.names[position][0].startswith(query)
+        ):
+            yield self.names[position][1]
+            position += 1
+
+    def substring_matches(self, query):
+        query_trigrams = trigrams(query)
+        if query_trigrams:
+            candidates = set.intersection(
+                *(self.trigrams.get(trigram, set())
+                  for trigram in query_trigrams)
+            )
+        else:
+            candidates = (pk for _, pk in self.names)
+        matches = []
+        for pk in candidates:
+            name = self.ingredients[pk]['name'].lower()
+            position = name.find(query)
+            if position > 0:
+                matches.append((position, name, pk))
+        return (pk for _, _, pk in sorted(matches))
+
+    def search(self, query, limit):
+        query = query.strip().lower()
+        found = []
+        for matches in (
+            self.prefix_matches(query), self.substring_matches(query)
+        ):
+            for pk in matches:
+                if len(found) == limit:
+                    return found
+                found.append(self.ingredients[pk])
+        return found
+
+
+class MemorySearchBackend:
+    """Поиск по индексу в памяти, общему для потоков процесса."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.index = None
+        self.generation = None
+
+    def get_index(self):
+        generation, = get_generations([INGREDIENTS])
+        if self.index is None or self.generation != generation:
+            with self.lock:
+                if self.index is None or self.generation != generation:
+                    with primary():
+                        self.index = IngredientIndex.build()
+                    self.generation = generation
+        return self.index
+
+    def search(self, query, limit):
+        return self.get_index().search(query, limit)
+
+
+class DatabaseSearchBackend:
+    """Поиск в PostgreSQL, ускоренный триграммным индексом pg_trgm."""
+
+    def search(self, query, limit):
+        query = query.strip()
+        prefix = list(
+            Ingredient.objects.filter(name__istartswith=query)
+            .order_by('name').values(*FIELDS)[:limit]
+        )
+        if len(prefix) == limit:
+            return prefix
+        return prefix + list(
+            Ingredient.objects.filter(name__icontains=query)
+            .exclude(name__istartswith=query)
+            .annotate(position=StrIndex(Upper('name'), Value(query.upper())))
+            .order_by('position', 'name')
+            .values(*FIELDS)[:limit - len(prefix)]
+        )
+
+
+def pg_trgm_available():
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        return cursor.fetchone() is not None
+
+
+_backend = None
+
+
+def get_search_backend():
+    """Бэкенд из INGREDIENT_SEARCH_BACKEND: memory, database или auto."""
+    global _backend
+    if _backend is None:
+        name = settings.INGREDIENT_SEARCH_BACKEND
+        if name == 'auto':
+            name = 'database' if pg_trgm_available() else 'memory'
+        _backend = (
+            DatabaseSearchBackend() if name == 'database'
+            else MemorySearchBackend()
+        )
+    return _backend
+
+
+def search_ingredients(query, limit=None):
+    """Ингредиенты для автодополнения по введённому тексту."""
+    return get_search_backend().search(
+        query, limit or settings.INGREDIENT_SEARCH_LIMIT
+    )
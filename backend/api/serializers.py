@@ -1,18 +1,28 @@
-from django.db.models import F
+from django.conf import settings
+from django.db.models import prefetch_related_objects
 from djoser.serializers import UserCreateSerializer, UserSerializer
-from drf_base64.fields import Base64ImageField
-from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
-                            ShoppingBasket, Tag)
 from rest_framework import serializers
-from rest_framework.generics import get_object_or_404
 from rest_framework.validators import UniqueValidator
+
+from recipes.images import store_image
+from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+                            ShoppingBasket, Tag, ingredients_prefetch)
+from recipes.signals import RecipeChanges, recipe_changed, reporting_changes
 from users.models import Follow, User
 
+from .fields import (BulkPrimaryKeyRelatedField, RecipeImageField,
+                     RecipeImageVariantsField, StreamingBase64ImageField)
+
+MAX_AMOUNT = 32767
+
 
 class GetIsSubscribedMixin:
     """Миксина отображения подписки на пользователя."""
 
     def get_is_subscribed(self, obj):
+        subscribed = getattr(obj, 'is_subscribed', None)
+        if subscribed is not None:
+            return subscribed
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
@@ -24,12 +34,16 @@ class GetIngredientsMixin:
 
     def get_ingredients(self, obj):
         """Получение ингредиентов."""
-        return obj.ingredients.values(
-            'id',
-            'name',
-            'measurement_unit',
-            amount=F('ingredients_amount__amount'),
-        )
+        prefetch_related_objects([obj], ingredients_prefetch())
+        return [
+            {
+                'id': item.ingredient.id,
+                'name': item.ingredient.name,
+                'measurement_unit': item.ingredient.measurement_unit,
+                'amount': item.amount,
+            }
+            for item in obj.ingredients_amount.all()
+        ]
 
 
 class CustomUserCreateSerializer(UserCreateSerializer):
@@ -98,23 +112,29 @@ class ReadRecipesSerializer(GetIngredientsMixin, serializers.ModelSerializer):
     ingredients = serializers.SerializerMethodField()
     is_favorited = serializers.BooleanField(default=False)
     is_in_shopping_cart = serializers.BooleanField(default=False)
+    image = RecipeImageField()
+    images = RecipeImageVariantsField()
 
     class Meta:
         model = Recipe
         fields = ('id', 'tags', 'author', 'ingredients',
                   'is_favorited', 'is_in_shopping_cart', 'name',
-                  'image', 'text', 'cooking_time'
+                  'image', 'images', 'text', 'cooking_time'
                   )
 
+    def to_representation(self, instance):
+        is_subscribed = getattr(instance, 'is_subscribed', None)
+        if is_subscribed is not None:
+            instance.author.is_subscribed = is_subscribed
+        return super().to_representation(instance)
+
 
 class CreateRecipeSerializer(GetIngredientsMixin, serializers.ModelSerializer):
     """Сериализация объектов типа Recipes. Запись рецептов."""
 
-    tags = serializers.PrimaryKeyRelatedField(
-        many=True, queryset=Tag.objects.all()
-    )
+    tags = BulkPrimaryKeyRelatedField(many=True, queryset=Tag.objects.all())
     ingredients = serializers.SerializerMethodField()
-    image = Base64ImageField()
+    image = StreamingBase64ImageField()
 
     class Meta:
         model = Recipe
@@ -122,25 +142,74 @@ class CreateRecipeSerializer(GetIngredientsMixin, serializers.ModelSerializer):
                   'image', 'text', 'cooking_time')
         read_only_fields = ('author',)
 
-    def validate(self, data):
-        """Валидация ингредиентов при заполнении рецепта."""
-        ingredients = self.initial_data['ingredients']
-        ingredient_list = []
-        if not ingredients:
+    def to_internal_value(self, data):
+        """Ошибки полей и строк ингредиентов собираются в один ответ."""
+        errors = {}
+        try:
+            value = super().to_internal_value(data)
+        except serializers.ValidationError as error:
+            errors.update(error.detail)
+        try:
+            ingredients = self.validate_ingredient_lines(
+                data.get('ingredients')
+            )
+        except serializers.ValidationError as error:
+            errors.update(error.detail)
+        if errors:
+            raise serializers.ValidationError(errors)
+        value['ingredients'] = ingredients
+        return value
+
+    def validate_ingredient_lines(self, ingredients):
+        """
+        Валидация ингредиентов при заполнении рецепта.
+        Все id проверяются одним запросом, ошибки возвращаются
+        списком по строкам ингредиентов.
+        """
+        if not ingredients or not isinstance(ingredients, list):
             raise serializers.ValidationError(
-                'Минимально должен быть 1 ингредиент.'
+                {'ingredients': ['Минимально должен быть 1 ингредиент.']}
             )
-        for item in ingredients:
-            ingredient = get_object_or_404(Ingredient, id=item['id'])
-            if ingredient in ingredient_list:
-                raise serializers.ValidationError(
-                    "Ингредиент не должен повторяться."
-                )
-            if int(item.get('amount')) < 1:
-                raise serializers.ValidationError('Минимальное количество = 1')
-            ingredient_list.append(ingredient)
-        data['ingredients'] = ingredients
-        return data
+        lines = [self.parse_ingredient(item) for item in ingredients]
+        existing = Ingredient.objects.in_bulk(
+            {pk for pk, _, _ in lines if pk is not None}
+        )
+        errors = []
+        seen = set()
+        for pk, _, error in lines:
+            if pk is None:
+                pass
+            elif pk not in existing:
+                error['id'] = [f'Ингредиент {pk} не найден.']
+            elif pk in seen:
+                error['id'] = ['Ингредиент не должен повторяться.']
+            seen.add(pk)
+            errors.append(error)
+        if any(errors):
+            raise serializers.ValidationError({'ingredients': errors})
+        return [{'id': pk, 'amount': amount} for pk, amount, _ in lines]
+
+    @staticmethod
+    def parse_ingredient(item):
+        """Разбор строки ингредиента: id, количество и ошибки строки."""
+        if not isinstance(item, dict):
+            return None, None, {'non_field_errors': ['Ожидается объект.']}
+        error = {}
+        pk = amount = None
+        try:
+            pk = int(item['id'])
+        except (KeyError, TypeError, ValueError):
+            error['id'] = ['Некорректный id ингредиента.']
+        try:
+            amount = int(item['amount'])
+        except (KeyError, TypeError, ValueError):
+            error['amount'] = ['Некорректное количество.']
+        else:
+            if amount < 1:
+                error['amount'] = ['Минимальное количество = 1']
+            elif amount > MAX_AMOUNT:
+                error['amount'] = [f'Максимальное количество = {MAX_AMOUNT}']
+        return pk, amount, error
 
     def validate_cooking_time(self, time):
         """Валидация времени приготовления."""
@@ -148,42 +217,103 @@ class CreateRecipeSerializer(GetIngredientsMixin, serializers.ModelSerializer):
             raise serializers.ValidationError("Минимальное время = 1")
         return time
 
-    def add_ingredients_and_tags(self, instance, **validate_data):
-        """Добавление ингредиентов тегов."""
-        ingredients = validate_data['ingredients']
-        tags = validate_data['tags']
-        for tag in tags:
-            instance.tags.add(tag)
-
+    def save_ingredients_and_tags(self, instance, ingredients, tags,
+                                  created=False):
+        """
+        Запись ингредиентов и тегов по разнице со старым состоянием:
+        только нужные вставки, обновления и удаления пакетами.
+        """
+        current = {} if created else {
+            row.ingredient_id: row
+            for row in IngredientInRecipe.objects.filter(recipe=instance)
+        }
+        amounts = {item['id']: item['amount'] for item in ingredients}
+        changed = {
+            pk: amount - current[pk].amount if pk in current else amount
+            for pk, amount in amounts.items()
+        }
+        changed.update(
+            (pk, -row.amount) for pk, row in current.items()
+            if pk not in amounts
+        )
+        changed = {pk: delta for pk, delta in changed.items() if delta}
+        removed = [pk for pk in current if pk not in amounts]
+        if removed:
+            IngredientInRecipe.objects.filter(
+                recipe=instance, ingredient_id__in=removed
+            ).delete()
+        updated = []
+        for pk, row in current.items():
+            if pk in amounts and row.amount != amounts[pk]:
+                row.amount = amounts[pk]
+                updated.append(row)
+        if updated:
+            IngredientInRecipe.objects.bulk_update(updated, ['amount'])
         IngredientInRecipe.objects.bulk_create(
-            [
-                IngredientInRecipe(
-                    recipe=instance,
-                    ingredient_id=ingredient.get('id'),
-                    amount=ingredient.get('amount'),
-                )
-                for ingredient in ingredients
-            ]
+            IngredientInRecipe(
+                recipe=instance, ingredient_id=pk, amount=amount
+            )
+            for pk, amount in amounts.items()
+            if pk not in current
+        )
+
+        old_tags = set() if created else set(
+            instance.tags.values_list('slug', flat=True)
+        )
+        if tags is None:
+            new_tags = old_tags
+        else:
+            new_tags = {tag.slug for tag in tags}
+            if created:
+                instance.tags.add(*tags)
+            elif new_tags != old_tags:
+                instance.tags.set(tags)
+        return RecipeChanges(
+            fields=set(),
+            ingredients=changed,
+            tags=new_tags,
+            tags_added=new_tags - old_tags,
+            tags_removed=old_tags - new_tags,
         )
-        return instance
 
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
-        recipe = super().create(validated_data)
-        return self.add_ingredients_and_tags(
-            recipe, ingredients=ingredients, tags=tags
+        image = validated_data.pop('image')
+        with reporting_changes():
+            recipe = super().create(validated_data)
+            store_image(recipe, image)
+            self.changes = self.save_ingredients_and_tags(
+                recipe, ingredients, tags, created=True
+            )._replace(fields=set(validated_data))
+        recipe_changed.send(
+            sender=Recipe, recipe=recipe, changes=self.changes, created=True
         )
+        return recipe
 
     def update(self, instance, validated_data):
-        instance.ingredients.clear()
-        instance.tags.clear()
         ingredients = validated_data.pop('ingredients')
-        tags = validated_data.pop('tags')
-        instance = self.add_ingredients_and_tags(
-            instance, ingredients=ingredients, tags=tags
-        )
-        return super().update(instance, validated_data)
+        tags = validated_data.pop('tags', None)
+        image = validated_data.pop('image', None)
+        if image is not None:
+            store_image(instance, image)
+        fields = {
+            name for name, value in validated_data.items()
+            if getattr(instance, name) != value
+        }
+        for name in fields:
+            setattr(instance, name, validated_data[name])
+        with reporting_changes():
+            if fields:
+                instance.save(update_fields=fields)
+            self.changes = self.save_ingredients_and_tags(
+                instance, ingredients, tags
+            )._replace(fields=fields)
+        if self.changes:
+            recipe_changed.send(
+                sender=Recipe, recipe=instance, changes=self.changes
+            )
+        return instance
 
 
 class AddingRecipesSerializer(serializers.ModelSerializer):
@@ -192,12 +322,24 @@ class AddingRecipesSerializer(serializers.ModelSerializer):
     Добавление в избранное/список покупок.
     """
 
+    image = RecipeImageField(variant='thumbnail')
+
     class Meta:
         model = Recipe
         fields = ('id', 'name', 'image', 'cooking_time')
         read_only_fields = ('id', 'name', 'image', 'cooking_time')
 
 
+def get_recipes_limit(request):
+    """recipes_limit из запроса, не больше SUBSCRIPTION_RECIPES_LIMIT."""
+    limit = settings.SUBSCRIPTION_RECIPES_LIMIT
+    try:
+        value = int(request.query_params.get('recipes_limit', limit))
+    except ValueError:
+        return limit
+    return max(0, min(value, limit))
+
+
 class FollowSerializer(GetIsSubscribedMixin, serializers.ModelSerializer):
     """Сериализация объектов типа Follow. Подписки."""
 
@@ -208,7 +350,7 @@ class FollowSerializer(GetIsSubscribedMixin, serializers.ModelSerializer):
     last_name = serializers.ReadOnlyField(source='author.last_name')
     is_subscribed = serializers.SerializerMethodField()
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.IntegerField(read_only=True)
+    recipes_count = serializers.ReadOnlyField(source='author.recipes_count')
 
     class Meta:
         model = Follow
@@ -223,14 +365,34 @@ class FollowSerializer(GetIsSubscribedMixin, serializers.ModelSerializer):
             'recipes_count',
         )
 
+    def get_is_subscribed(self, obj):
+        """Подписка текущего пользователя известна без запроса."""
+        return True
+
     def get_recipes(self, obj):
-        """Получение рецептов автора."""
-        request = self.context.get('request')
-        limit = request.GET.get('recipes_limit')
-        queryset = obj.author.recipes.all()
-        if limit:
-            queryset = queryset[: int(limit)]
-        return AddingRecipesSerializer(queryset, many=True).data
+        """
+        Последние рецепты автора из context['recipes'], загруженные
+        для всей страницы одним запросом.
+        """
+        recipes = self.context.get('recipes')
+        if recipes is None:
+            recipes = Recipe.objects.previews_by_author(
+                [obj.author_id],
+                get_recipes_limit(self.context.get('request')),
+            )
+        return AddingRecipesSerializer(
+            recipes.get(obj.author_id, []), many=True
+        ).data
+
+
+class BulkRecipesSerializer(serializers.Serializer):
+    """Список id рецептов для массового добавления и удаления."""
+
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BULK_RECIPES_LIMIT,
+    )
 
 
 class CheckFollowSerializer(serializers.ModelSerializer):
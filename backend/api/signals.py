@@ -0,0 +1,153 @@
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+                            ShoppingBasket, Tag)
+from recipes.signals import recipe_changed, reported_writes
+from users.models import Follow, User
+
+from .authentication import get_token_cache
+from .cache import (CATALOG, INGREDIENTS, POPULAR, TAGS, bump,
+                    invalidate_recipe, user_scope)
+from .connections import count_connect
+
+connection_created.connect(count_connect)
+
+
+@receiver(recipe_changed, sender=Recipe)
+def invalidate_changed_recipe(sender, recipe, changes, **kwargs):
+    """Сброс страниц с рецептом, его автором и старыми и новыми тегами."""
+    invalidate_recipe(recipe, changes.affected_tags)
+
+
+def invalidate_recipes(recipe_ids, tag_slugs=()):
+    """
+    Сброс кэша рецептов по id: авторы и текущие теги читаются одним
+    запросом, tag_slugs добавляются к тегам каждого рецепта.
+    """
+    recipes = {}
+    for pk, author_id, slug in Recipe.objects.filter(
+        pk__in=recipe_ids
+    ).values_list('pk', 'author_id', 'tags__slug'):
+        _, slugs = recipes.setdefault(
+            pk, (Recipe(pk=pk, author_id=author_id), set(tag_slugs))
+        )
+        if slug is not None:
+            slugs.add(slug)
+    for recipe, slugs in recipes.values():
+        invalidate_recipe(recipe, slugs)
+
+
+@receiver(post_save, sender=Recipe)
+def invalidate_saved_recipe(sender, instance, created=False, raw=False,
+                            **kwargs):
+    """Правка рецепта в админке или через ORM."""
+    if raw or reported_writes.get():
+        return
+    if created:
+        invalidate_recipe(instance)
+    else:
+        invalidate_recipes([instance.pk])
+
+
+@receiver(pre_delete, sender=Recipe)
+def invalidate_deleted_recipe(sender, instance, **kwargs):
+    """Теги читаются до удаления, после него связей уже нет."""
+    invalidate_recipes([instance.pk])
+
+
+@receiver(post_save, sender=IngredientInRecipe)
+@receiver(post_delete, sender=IngredientInRecipe)
+def invalidate_recipe_ingredients(sender, instance, raw=False, **kwargs):
+    if raw or reported_writes.get():
+        return
+    invalidate_recipes([instance.recipe_id])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipe_tags(sender, instance, action, reverse, pk_set,
+                           **kwargs):
+    """
+    Теги рецепта входят во все его страницы: сбрасываются и текущие
+    теги, и снятые. С обратной стороны (tag.recipes) instance - тег.
+    """
+    if reported_writes.get() or action not in (
+        'post_add', 'post_remove', 'pre_clear'
+    ):
+        return
+    if not reverse:
+        removed = ()
+        if action == 'post_remove':
+            removed = Tag.objects.filter(pk__in=pk_set).values_list(
+                'slug', flat=True
+            )
+        invalidate_recipes([instance.pk], removed)
+    elif action == 'pre_clear':
+        invalidate_recipes(instance.recipes.values_list('pk', flat=True))
+    else:
+        invalidate_recipes(pk_set, [instance.slug])
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_catalog(sender, **kwargs):
+    """Теги входят в каждую закэшированную страницу."""
+    bump(CATALOG, TAGS)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_ingredients(sender, **kwargs):
+    """Ингредиенты входят в страницы и в индекс автодополнения."""
+    bump(CATALOG, INGREDIENTS)
+
+
+@receiver(post_save, sender=User)
+def invalidate_author(sender, created=False, update_fields=None, **kwargs):
+    """Данные автора входят в страницы, регистрация и вход их не меняют."""
+    if created or update_fields and set(update_fields) <= {'last_login'}:
+        return
+    bump(CATALOG)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_save, sender=ShoppingBasket)
+@receiver(post_delete, sender=ShoppingBasket)
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_user_flags(sender, instance, **kwargs):
+    """Избранное, список покупок и подписки меняют ETag ответов."""
+    scope = user_scope(instance.user_id)
+    transaction.on_commit(lambda: bump(scope))
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+def invalidate_popular(sender, **kwargs):
+    """Сортировка popular идёт по счётчику избранного."""
+    transaction.on_commit(lambda: bump(POPULAR))
+
+
+@receiver(post_delete, sender=Token)
+def forget_token(sender, instance, **kwargs):
+    """Выход через djoser удаляет токен - он удаляется и из кэша."""
+    keys = [instance.key]
+    transaction.on_commit(lambda: get_token_cache().delete(keys))
+
+
+@receiver(post_save, sender=User)
+def forget_user_tokens(sender, instance, created=False, update_fields=None,
+                       **kwargs):
+    """Смена пароля, блокировка и правка профиля обновляют кэш токенов."""
+    if created or update_fields and set(update_fields) <= {'last_login'}:
+        return
+    keys = list(
+        Token.objects.filter(user=instance).values_list('key', flat=True)
+    )
+    if keys:
+        transaction.on_commit(lambda: get_token_cache().delete(keys))
@@ -0,0 +1,57 @@
+from django.core.cache import caches
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APITestCase
+
+from recipes.models import Ingredient, IngredientInRecipe, Recipe, Tag
+from users.models import User
+
+from ..authentication import get_token_cache
+
+
+class FoodgramTestCase(APITestCase):
+    """Тесты API с пустыми кэшами и небольшим набором рецептов."""
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        get_token_cache().entries.clear()
+
+    @staticmethod
+    def create_user(name):
+        return User.objects.create_user(
+            email=f'{name}@example.com', username=name,
+            first_name=name, last_name=name, password='Pa55word!x',
+        )
+
+    @staticmethod
+    def create_tag(slug):
+        return Tag.objects.create(
+            name=slug, slug=slug, color=f'#{Tag.objects.count():06d}'
+        )
+
+    @staticmethod
+    def create_ingredient(name, unit='г'):
+        return Ingredient.objects.create(name=name, measurement_unit=unit)
+
+    @staticmethod
+    def create_recipe(author, name, tags=(), ingredients=()):
+        """ingredients - пары (ингредиент, количество)."""
+        recipe = Recipe.objects.create(
+            author=author, name=name, text=name, cooking_time=10,
+            image='recipes/recipe.png',
+        )
+        recipe.tags.set(tags)
+        IngredientInRecipe.objects.bulk_create([
+            IngredientInRecipe(
+                recipe=recipe, ingredient=ingredient, amount=amount
+            )
+            for ingredient, amount in ingredients
+        ])
+        return recipe
+
+    @staticmethod
+    def client_for(user):
+        client = APIClient()
+        token, _ = Token.objects.get_or_create(user=user)
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        return client
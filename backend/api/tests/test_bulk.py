@@ -0,0 +1,119 @@
+from django.test import skipUnlessDBFeature
+
+from recipes.bulk import insert_rows
+from recipes.models import (Favorite, Recipe, ShoppingBasket,
+                            ShoppingCartIngredient)
+
+from .base import FoodgramTestCase
+
+FAVORITE_URL = '/api/recipes/favorite/'
+CART_URL = '/api/recipes/shopping_cart/'
+
+
+class BulkRecipesTest(FoodgramTestCase):
+    """Массовое изменение избранного и списка покупок."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = cls.create_user('reader')
+        author = cls.create_user('author')
+        flour = cls.create_ingredient('flour')
+        milk = cls.create_ingredient('milk', 'мл')
+        cls.recipes = [
+            cls.create_recipe(
+                author, f'recipe{number}',
+                ingredients=[(flour, 100), (milk, 10 * (number + 1))],
+            )
+            for number in range(5)
+        ]
+        cls.ids = [recipe.id for recipe in cls.recipes]
+        cls.flour, cls.milk = flour, milk
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.client_for(self.user)
+
+    def change(self, method, url, ids=None):
+        data = None if ids is None else {'recipes': ids}
+        response = getattr(self.client, method)(url, data, format='json')
+        self.assertEqual(response.status_code, 200)
+        return {
+            item['id']: item['status'] for item in response.data['recipes']
+        }
+
+    def counters(self, field):
+        return dict(
+            Recipe.objects.filter(id__in=self.ids).values_list('id', field)
+        )
+
+    def cart(self):
+        return dict(
+            ShoppingCartIngredient.objects.filter(user=self.user)
+            .values_list('ingredient__name', 'total_amount')
+        )
+
+    def test_favorite(self):
+        Favorite.objects.create(user=self.user, recipe=self.recipes[0])
+        statuses = self.change('post', FAVORITE_URL, [*self.ids[:2], 999])
+        self.assertEqual(statuses, {
+            self.ids[0]: 'exists', self.ids[1]: 'created', 999: 'not_found',
+        })
+        favorites = self.counters('favorites_count')
+        self.assertEqual(favorites[self.ids[0]], 1)
+        self.assertEqual(favorites[self.ids[1]], 1)
+        statuses = self.change('delete', FAVORITE_URL, self.ids[1:3])
+        self.assertEqual(statuses, {
+            self.ids[1]: 'deleted', self.ids[2]: 'not_found',
+        })
+        self.assertEqual(self.counters('favorites_count'), {
+            self.ids[0]: 1, **{pk: 0 for pk in self.ids[1:]},
+        })
+
+    def test_shopping_cart(self):
+        self.change('post', CART_URL, self.ids[:3])
+        self.change('post', CART_URL, self.ids[:3])
+        self.assertEqual(self.cart(), {'flour': 300, 'milk': 60})
+        self.assertEqual(
+            self.counters('in_carts_count'),
+            {pk: int(pk in self.ids[:3]) for pk in self.ids},
+        )
+        self.change('delete', CART_URL, [self.ids[2]])
+        self.assertEqual(self.cart(), {'flour': 200, 'milk': 30})
+        statuses = self.change('delete', CART_URL)
+        self.assertEqual(statuses, {
+            self.ids[0]: 'deleted', self.ids[1]: 'deleted',
+        })
+        self.assertEqual(self.cart(), {})
+        self.assertEqual(
+            set(self.counters('in_carts_count').values()), {0}
+        )
+
+    def test_queries_do_not_grow_with_recipes(self):
+        self.client.get('/api/users/me/')
+        with self.assertNumQueries(10):
+            self.change('post', CART_URL, self.ids[:1])
+        with self.assertNumQueries(10):
+            self.change('post', CART_URL, self.ids[1:])
+        with self.assertNumQueries(9):
+            self.change('delete', CART_URL, self.ids[:1])
+        with self.assertNumQueries(9):
+            self.change('delete', CART_URL, self.ids[1:])
+
+    def test_invalid(self):
+        response = self.client.post(
+            FAVORITE_URL, {'recipes': []}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        response = self.client_class().post(
+            FAVORITE_URL, {'recipes': self.ids}, format='json'
+        )
+        self.assertEqual(response.status_code, 401)
+
+    @skipUnlessDBFeature('can_return_rows_from_bulk_insert')
+    def test_concurrent_insert_is_not_counted(self):
+        """Запись, вставленная между проверкой и вставкой, пропускается."""
+        ShoppingBasket.objects.create(user=self.user, recipe=self.recipes[0])
+        self.assertEqual(
+            insert_rows(ShoppingBasket, self.user, self.ids[:2]),
+            self.ids[1:2],
+        )
@@ -0,0 +1,197 @@
+from unittest import mock
+
+from django.core.cache.backends.base import memcache_key_warnings
+from django.test import SimpleTestCase, override_settings
+
+from api.cache import _generation_key, _modified_key
+from api.checks import check_shared_cache
+from recipes.models import IngredientInRecipe
+
+from .base import FoodgramTestCase
+
+URL = '/api/recipes/'
+
+
+class RecipeCacheInvalidationTest(FoodgramTestCase):
+    """Изменения рецептов, тегов и авторов сбрасывают кэш ленты."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = cls.create_user('author')
+        cls.other = cls.create_user('other')
+        cls.tag = cls.create_tag('breakfast')
+        cls.ingredient = cls.create_ingredient('flour')
+        cls.recipe = cls.create_recipe(
+            cls.author, 'pancakes', tags=[cls.tag],
+            ingredients=[(cls.ingredient, 100)],
+        )
+        cls.other_recipe = cls.create_recipe(cls.other, 'soup')
+
+    def names(self, params=None):
+        response = self.client.get(URL, params)
+        return [recipe['name'] for recipe in response.data['results']]
+
+    def test_update_recipe(self):
+        self.assertEqual(self.names(), ['soup', 'pancakes'])
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client_for(self.author).patch(
+                f'{URL}{self.recipe.id}/',
+                {
+                    'name': 'crepes',
+                    'ingredients': [{'id': self.ingredient.id, 'amount': 50}],
+                },
+                format='json',
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.names(), ['soup', 'crepes'])
+        detail = self.client.get(f'{URL}{self.recipe.id}/').data
+        self.assertEqual(detail['ingredients'][0]['amount'], 50)
+
+    def test_delete_recipe(self):
+        self.assertEqual(self.names({'tags': 'breakfast'}), ['pancakes'])
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client_for(self.author).delete(
+                f'{URL}{self.recipe.id}/'
+            )
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.names({'tags': 'breakfast'}), [])
+        self.assertEqual(self.names(), ['soup'])
+
+    def test_change_tag(self):
+        self.names()
+        self.tag.name = 'brunch'
+        self.tag.save()
+        response = self.client.get(URL)
+        tags = response.data['results'][1]['tags']
+        self.assertEqual([tag['name'] for tag in tags], ['brunch'])
+
+    def test_change_author(self):
+        self.names()
+        self.author.first_name = 'chef'
+        self.author.save()
+        response = self.client.get(URL)
+        self.assertEqual(response.data['results'][1]['author']['first_name'],
+                         'chef')
+
+    def test_other_pages_stay_cached(self):
+        self.names({'author': self.other.id})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client_for(self.author).delete(f'{URL}{self.recipe.id}/')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.names({'author': self.other.id}), ['soup'])
+
+
+class RecipeOrmInvalidationTest(FoodgramTestCase):
+    """Правки рецептов мимо API (админка, ORM) тоже сбрасывают кэш."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = cls.create_user('author')
+        cls.tag = cls.create_tag('breakfast')
+        cls.other_tag = cls.create_tag('dinner')
+        cls.ingredient = cls.create_ingredient('flour')
+        cls.recipe = cls.create_recipe(
+            cls.author, 'pancakes', tags=[cls.tag],
+            ingredients=[(cls.ingredient, 100)],
+        )
+
+    def names(self, params=None):
+        response = self.client.get(URL, params)
+        return [recipe['name'] for recipe in response.data['results']]
+
+    def detail(self):
+        return self.client.get(f'{URL}{self.recipe.id}/').data
+
+    def test_save(self):
+        self.assertEqual(self.names({'tags': 'breakfast'}), ['pancakes'])
+        self.detail()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.name = 'crepes'
+            self.recipe.save()
+        self.assertEqual(self.names({'tags': 'breakfast'}), ['crepes'])
+        self.assertEqual(self.names({'author': self.author.id}), ['crepes'])
+        self.assertEqual(self.detail()['name'], 'crepes')
+
+    def test_create(self):
+        self.assertEqual(self.names(), ['pancakes'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_recipe(self.author, 'soup')
+        self.assertEqual(self.names(), ['soup', 'pancakes'])
+
+    def test_delete(self):
+        self.assertEqual(self.names({'tags': 'breakfast'}), ['pancakes'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.delete()
+        self.assertEqual(self.names({'tags': 'breakfast'}), [])
+        self.assertEqual(self.names(), [])
+
+    def test_ingredient_lines(self):
+        self.assertEqual(self.detail()['ingredients'][0]['amount'], 100)
+        line = IngredientInRecipe.objects.get(recipe=self.recipe)
+        with self.captureOnCommitCallbacks(execute=True):
+            line.amount = 50
+            line.save()
+        self.assertEqual(self.detail()['ingredients'][0]['amount'], 50)
+        self.names({'tags': 'breakfast'})
+        with self.captureOnCommitCallbacks(execute=True):
+            line.delete()
+        response = self.client.get(URL, {'tags': 'breakfast'})
+        self.assertEqual(response.data['results'][0]['ingredients'], [])
+
+    def test_tags(self):
+        self.assertEqual(self.names({'tags': 'breakfast'}), ['pancakes'])
+        self.assertEqual(self.names({'tags': 'dinner'}), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.tags.add(self.other_tag)
+        self.assertEqual(self.names({'tags': 'dinner'}), ['pancakes'])
+        response = self.client.get(URL, {'tags': 'breakfast'})
+        self.assertEqual(len(response.data['results'][0]['tags']), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.tags.remove(self.tag)
+        self.assertEqual(self.names({'tags': 'breakfast'}), [])
+
+    def test_tags_cleared_from_tag(self):
+        self.assertEqual(self.names({'tags': 'breakfast'}), ['pancakes'])
+        self.detail()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tag.recipes.clear()
+        self.assertEqual(self.names({'tags': 'breakfast'}), [])
+        self.assertEqual(self.detail()['tags'], [])
+
+    def test_api_write_bumps_once(self):
+        with mock.patch('api.signals.invalidate_recipe') as invalidate:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client_for(self.author).patch(
+                    f'{URL}{self.recipe.id}/',
+                    {
+                        'name': 'crepes',
+                        'tags': [self.other_tag.id],
+                        'ingredients': [
+                            {'id': self.ingredient.id, 'amount': 50}
+                        ],
+                    },
+                    format='json',
+                )
+        invalidate.assert_called_once()
+
+
+class SharedCacheTest(SimpleTestCase):
+    """Ключи поколений для memcached, кэш процесса - предупреждение."""
+
+    def test_scope_keys_valid_for_memcached(self):
+        for scope in ('feed', 'tag:breakfast', 'tag:завтрак', 'tag:a b',
+                      'author:' + '1' * 300):
+            for key in (_generation_key(scope), _modified_key(scope)):
+                with self.subTest(key=key):
+                    self.assertEqual(list(memcache_key_warnings(key)), [])
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }})
+    def test_process_cache_warning(self):
+        self.assertEqual(
+            [warning.id for warning in check_shared_cache(None)],
+            ['api.W001'],
+        )
+        with self.settings(DEBUG=True):
+            self.assertEqual(check_shared_cache(None), [])
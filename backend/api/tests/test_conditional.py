@@ -0,0 +1,80 @@
+import json
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+
+from .base import FoodgramTestCase
+
+
+class ConditionalGetTest(FoodgramTestCase):
+    """ETag и 304 для тегов, ингредиентов и рецептов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = cls.create_user('reader')
+        cls.tag = cls.create_tag('breakfast')
+        cls.ingredient = cls.create_ingredient('flour')
+        cls.recipe = cls.create_recipe(cls.user, 'pancakes', tags=[cls.tag])
+
+    def assert_not_modified(self, client, url):
+        response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        return etag
+
+    def test_not_modified(self):
+        for url in ('/api/tags/', f'/api/tags/{self.tag.id}/',
+                    '/api/ingredients/?name=fl', '/api/recipes/',
+                    f'/api/recipes/{self.recipe.id}/'):
+            with self.subTest(url=url):
+                self.assert_not_modified(self.client, url)
+
+    def test_tag_change(self):
+        etag = self.assert_not_modified(self.client, '/api/tags/')
+        self.tag.name = 'brunch'
+        self.tag.save()
+        response = self.client.get('/api/tags/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['name'], 'brunch')
+
+    def test_recipe_edited_outside_api(self):
+        for url in ('/api/recipes/', f'/api/recipes/{self.recipe.id}/'):
+            with self.subTest(url=url):
+                etag = self.assert_not_modified(self.client, url)
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.recipe.cooking_time += 1
+                    self.recipe.save()
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
+
+    def test_tags_loaded_by_command(self):
+        etag = self.assert_not_modified(self.client, '/api/tags/')
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl') as file:
+            json.dump({'name': 'lunch', 'color': '#00ff00', 'slug': 'lunch'},
+                      file)
+            file.flush()
+            with self.captureOnCommitCallbacks(execute=True):
+                call_command(
+                    'load_ingredients', file.name, model='tags',
+                    stdout=StringIO(),
+                )
+        response = self.client.get('/api/tags/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 2)
+
+    def test_etag_per_user(self):
+        client = self.client_for(self.user)
+        url = f'/api/recipes/{self.recipe.id}/'
+        etag = self.assert_not_modified(client, url)
+        self.assertNotEqual(self.client.get(url)['ETag'], etag)
+        with self.captureOnCommitCallbacks(execute=True):
+            client.post(f'{url}favorite/')
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['is_favorited'])
@@ -0,0 +1,143 @@
+from unittest import mock, skipUnless
+
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.test import SimpleTestCase, TestCase
+
+from api import connections as db_connections
+from api.connections import HealthCheckMixin, PoolTimeout, clear_pools
+
+
+def make_wrapper(wrapper_class, alias, **settings):
+    settings_dict = {**connection.settings_dict, **settings}
+    settings_dict['OPTIONS'] = {
+        **connection.settings_dict['OPTIONS'], **settings.get('OPTIONS', {})
+    }
+    return wrapper_class(settings_dict, alias=alias)
+
+
+class HealthCheckTest(SimpleTestCase):
+    """CONN_HEALTH_CHECKS: проверка при первом обращении после запроса."""
+
+    def make_db(self, enabled=True):
+        wrapper_class = type(connections[DEFAULT_DB_ALIAS])
+        if not issubclass(wrapper_class, HealthCheckMixin):
+            wrapper_class = type(
+                'DatabaseWrapper', (HealthCheckMixin, wrapper_class), {}
+            )
+        db = make_wrapper(
+            wrapper_class, 'health', CONN_MAX_AGE=None,
+            CONN_HEALTH_CHECKS=enabled,
+        )
+        self.addCleanup(db.close)
+        return db
+
+    def query(self, db):
+        with db.cursor() as cursor:
+            cursor.execute('SELECT 1')
+
+    def test_checked_once_per_request(self):
+        db = self.make_db()
+        with mock.patch.object(db, 'is_usable', return_value=True) as check:
+            self.query(db)
+            self.query(db)
+            self.assertEqual(check.call_count, 0)
+            db.close_if_unusable_or_obsolete()
+            self.assertEqual(check.call_count, 0)
+            self.query(db)
+            self.query(db)
+        self.assertEqual(check.call_count, 1)
+
+    def test_broken_connection_replaced(self):
+        db = self.make_db()
+        self.query(db)
+        db.close_if_unusable_or_obsolete()
+        with mock.patch.object(db, 'is_usable', return_value=False), \
+                mock.patch.object(db, 'close', wraps=db.close) as close:
+            self.query(db)
+        close.assert_called_once()
+        self.assertIsNotNone(db.connection)
+
+    def test_connects_counted(self):
+        db = self.make_db()
+        db_connections._connects.pop(db.alias, None)
+        self.query(db)
+        db.close_if_unusable_or_obsolete()
+        self.query(db)
+        self.assertEqual(db_connections._connects[db.alias], 1)
+
+    def test_disabled(self):
+        db = self.make_db(enabled=False)
+        self.query(db)
+        db.close_if_unusable_or_obsolete()
+        with mock.patch.object(db, 'is_usable') as check:
+            self.query(db)
+        check.assert_not_called()
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Пул только для PostgreSQL')
+class PooledBackendTest(TestCase):
+    """Бэкенд api.backends.pooled_postgresql на настоящем PostgreSQL."""
+
+    def make_db(self, max_size=1, timeout=1, **settings):
+        from api.backends.pooled_postgresql.base import DatabaseWrapper
+
+        alias = f'pool_{self._testMethodName}'
+        db = make_wrapper(
+            DatabaseWrapper, alias, CONN_MAX_AGE=0,
+            OPTIONS={'POOL': {'MAX_SIZE': max_size, 'TIMEOUT': timeout}},
+            **settings,
+        )
+        self.addCleanup(clear_pools, db.settings_dict['NAME'])
+        self.addCleanup(db.close)
+        return db
+
+    def backend_pid(self, db):
+        with db.cursor() as cursor:
+            cursor.execute('SELECT pg_backend_pid()')
+            return cursor.fetchone()[0]
+
+    def test_connection_reused(self):
+        db = self.make_db()
+        pid = self.backend_pid(db)
+        db.close()
+        self.assertEqual(len(db.pool.idle), 1)
+        self.assertEqual(self.backend_pid(db), pid)
+        self.assertEqual(db.pool.created, 1)
+
+    def test_only_new_connections_counted(self):
+        """Выдача соединения из пула - не подключение к серверу."""
+        db = self.make_db()
+        db_connections._connects.pop(db.alias, None)
+        for _ in range(3):
+            self.backend_pid(db)
+            db.close()
+        self.assertEqual(db.pool.acquired, 3)
+        self.assertEqual(db_connections._connects[db.alias], 1)
+
+    def test_open_transaction_rolled_back(self):
+        db = self.make_db()
+        with db.cursor() as cursor:
+            cursor.execute('BEGIN')
+            cursor.execute('CREATE TEMPORARY TABLE pooled (id int)')
+        db.close()
+        with db.cursor() as cursor:
+            cursor.execute("SELECT to_regclass('pg_temp.pooled')")
+            self.assertIsNone(cursor.fetchone()[0])
+
+    def test_dead_connection_replaced(self):
+        db = self.make_db(CONN_HEALTH_CHECKS=True)
+        pid = self.backend_pid(db)
+        db.close()
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_terminate_backend(%s)', [pid])
+        self.assertNotEqual(self.backend_pid(db), pid)
+        self.assertEqual(db.pool.created, 2)
+
+    def test_timeout(self):
+        db = self.make_db(timeout=0)
+        self.backend_pid(db)
+        other = self.make_db(timeout=0)
+        with self.assertRaises(PoolTimeout):
+            other.ensure_connection()
+        db.close()
+        self.backend_pid(other)
@@ -0,0 +1,114 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from recipes.models import Favorite, Recipe
+from users.models import User
+
+from .base import FoodgramTestCase
+
+URL = '/api/recipes/'
+
+
+class CountersTest(FoodgramTestCase):
+    """Денормализованные счётчики рецептов и пользователей."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = cls.create_user('author')
+        cls.reader = cls.create_user('reader')
+        cls.other = cls.create_user('other')
+        cls.recipe = cls.create_recipe(cls.author, 'pancakes')
+
+    def recipe_counters(self):
+        return Recipe.objects.values(
+            'favorites_count', 'in_carts_count'
+        ).get(pk=self.recipe.pk)
+
+    def user_counters(self, user):
+        return User.objects.values(
+            'followers_count', 'recipes_count'
+        ).get(pk=user.pk)
+
+    def test_favorite_and_cart(self):
+        for action, field in (
+            ('favorite', 'favorites_count'),
+            ('shopping_cart', 'in_carts_count'),
+        ):
+            with self.subTest(action=action):
+                url = f'{URL}{self.recipe.id}/{action}/'
+                for user in (self.reader, self.other):
+                    response = self.client_for(user).post(url)
+                    self.assertEqual(response.status_code, 201)
+                self.assertEqual(self.recipe_counters()[field], 2)
+                response = self.client_for(self.reader).delete(url)
+                self.assertEqual(response.status_code, 204)
+                self.assertEqual(self.recipe_counters()[field], 1)
+
+    def test_follow(self):
+        url = f'/api/users/{self.author.id}/subscribe/'
+        for user in (self.reader, self.other):
+            response = self.client_for(user).post(url)
+            self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.user_counters(self.author)['followers_count'], 2)
+        response = self.client_for(self.other).delete(url)
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.user_counters(self.author)['followers_count'], 1)
+
+    def test_recipes(self):
+        self.assertEqual(self.user_counters(self.author)['recipes_count'], 1)
+        recipe = self.create_recipe(self.author, 'soup')
+        self.assertEqual(self.user_counters(self.author)['recipes_count'], 2)
+        recipe.delete()
+        self.assertEqual(self.user_counters(self.author)['recipes_count'], 1)
+
+    def test_update_in_database(self):
+        """Счётчик меняется выражением в UPDATE, без чтения значения."""
+        with CaptureQueriesContext(connection) as queries:
+            Favorite.objects.create(user=self.reader, recipe=self.recipe)
+        updates = [
+            query['sql'] for query in queries
+            if query['sql'].startswith('UPDATE')
+        ]
+        self.assertEqual(len(updates), 1)
+        set_clause = updates[0].split(' SET ')[1].split(' WHERE ')[0]
+        self.assertEqual(set_clause.count('favorites_count'), 2)
+        self.assertEqual(self.recipe_counters()['favorites_count'], 1)
+
+    def test_not_negative(self):
+        favorite = Favorite.objects.create(
+            user=self.reader, recipe=self.recipe
+        )
+        Recipe.objects.filter(pk=self.recipe.pk).update(favorites_count=0)
+        favorite.delete()
+        self.assertEqual(self.recipe_counters()['favorites_count'], 0)
+
+    def test_reconcile(self):
+        Favorite.objects.create(user=self.reader, recipe=self.recipe)
+        Recipe.objects.filter(pk=self.recipe.pk).update(
+            favorites_count=5, in_carts_count=3
+        )
+        User.objects.filter(pk=self.author.pk).update(
+            followers_count=7, recipes_count=0
+        )
+        out = StringIO()
+        call_command('reconcile_counters', dry_run=True, stdout=out)
+        self.assertIn('Расхождений: 4.', out.getvalue())
+        self.assertEqual(self.recipe_counters()['favorites_count'], 5)
+
+        out = StringIO()
+        call_command('reconcile_counters', stdout=out)
+        self.assertIn('Исправлено: 4.', out.getvalue())
+        self.assertEqual(
+            self.recipe_counters(),
+            {'favorites_count': 1, 'in_carts_count': 0},
+        )
+        self.assertEqual(
+            self.user_counters(self.author),
+            {'followers_count': 0, 'recipes_count': 1},
+        )
+        out = StringIO()
+        call_command('reconcile_counters', stdout=out)
+        self.assertIn('Расхождений нет.', out.getvalue())
@@ -0,0 +1,73 @@
+import re
+import time
+from unittest import mock
+
+from django.db import connection
+
+from api import views
+
+from .base import FoodgramTestCase
+
+URL = '/api/recipes/'
+
+
+def slow(function, seconds=0.02):
+    def wrapper(*args, **kwargs):
+        time.sleep(seconds)
+        return function(*args, **kwargs)
+    return wrapper
+
+
+class ServerTimingTest(FoodgramTestCase):
+    """Время сериализации в Server-Timing для ответов из строк values()."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = cls.create_user('reader')
+        cls.recipe = cls.create_recipe(
+            cls.user, 'pancakes', tags=[cls.create_tag('breakfast')],
+            ingredients=[(cls.create_ingredient('flour'), 100)],
+        )
+
+    def timing(self, response):
+        header = response['Server-Timing']
+        return {
+            name: float(duration) for name, duration in re.findall(
+                r'(\w+);dur=([\d.]+)', header
+            )
+        }
+
+    def test_recipe_rows(self):
+        with mock.patch.object(
+            views, 'recipe_rows', slow(views.recipe_rows)
+        ):
+            timing = self.timing(self.client.get(URL))
+        self.assertGreaterEqual(timing['serializer'], 20)
+        self.assertLessEqual(timing['serializer'], timing['total'])
+
+    def test_user_flags(self):
+        client = self.client_for(self.user)
+        for url in (URL, f'{URL}{self.recipe.id}/'):
+            with self.subTest(url=url):
+                client.get(url)
+                with mock.patch.object(
+                    views, 'overlay_user_flags',
+                    slow(views.overlay_user_flags),
+                ):
+                    timing = self.timing(client.get(url))
+                self.assertGreaterEqual(timing['serializer'], 20)
+
+    def test_queries_not_counted_twice(self):
+        def slow_query(execute, sql, params, many, context):
+            time.sleep(0.02)
+            return execute(sql, params, many, context)
+
+        def rows(*args, **kwargs):
+            with connection.execute_wrapper(slow_query):
+                return recipe_rows(*args, **kwargs)
+
+        recipe_rows = views.recipe_rows
+        with mock.patch.object(views, 'recipe_rows', rows):
+            timing = self.timing(self.client.get(URL))
+        self.assertGreaterEqual(timing['db'], 40)
+        self.assertLess(timing['serializer'], 20)
@@ -0,0 +1,99 @@
+from recipes.models import Recipe
+
+from ..cache import invalidate_recipe
+from .base import FoodgramTestCase
+
+URL = '/api/recipes/'
+
+
+class PageCountTest(FoodgramTestCase):
+    """Кэшированный подсчёт сбрасывается вместе с лентой."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = cls.create_user('author')
+        cls.ingredient = cls.create_ingredient('flour')
+        cls.breakfast = cls.create_tag('breakfast')
+        cls.lunch = cls.create_tag('lunch')
+        cls.recipes = [
+            cls.create_recipe(
+                cls.author, f'recipe{number}', tags=[cls.breakfast],
+                ingredients=[(cls.ingredient, 1)],
+            )
+            for number in range(8)
+        ]
+
+    def test_count_after_retag(self):
+        response = self.client.get(URL, {'tags': 'lunch'})
+        self.assertEqual(response.data['count'], 0)
+        recipe = self.recipes[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client_for(self.author).patch(
+                f'{URL}{recipe.id}/',
+                {
+                    'tags': [self.lunch.id],
+                    'ingredients': [{'id': self.ingredient.id, 'amount': 1}],
+                },
+                format='json',
+            )
+        response = self.client.get(URL, {'tags': 'lunch'})
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(response.data['results'][0]['id'], recipe.id)
+
+    def test_count_after_create(self):
+        response = self.client.get(URL, {'page': 2})
+        self.assertEqual(response.data['count'], 8)
+        self.assertEqual(len(response.data['results']), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = self.create_recipe(self.author, 'new')
+            invalidate_recipe(recipe)
+        response = self.client.get(URL, {'page': 2})
+        self.assertEqual(response.data['count'], 9)
+        self.assertEqual(
+            [item['id'] for item in response.data['results']],
+            [recipe.id for recipe in self.recipes[2::-1]],
+        )
+
+
+class KeysetPaginationTest(FoodgramTestCase):
+    """Выдача по курсору обходит ленту без пропусков и повторов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = cls.create_user('author')
+        cls.ids = [
+            cls.create_recipe(author, f'recipe{number}').id
+            for number in range(7)
+        ]
+        # одинаковое время публикации различается только по id
+        Recipe.objects.filter(id__in=cls.ids[2:5]).update(
+            created=Recipe.objects.get(id=cls.ids[2]).created
+        )
+        cls.expected = sorted(
+            Recipe.objects.values_list('created', 'id'), reverse=True
+        )
+
+    def pages(self, url, link):
+        ids = []
+        while url:
+            data = self.client.get(url).data
+            self.assertNotIn('count', data)
+            ids.append([recipe['id'] for recipe in data['results']])
+            url = data[link]
+        return ids
+
+    def test_forward_and_back(self):
+        forward = self.pages(f'{URL}?cursor=&limit=3', 'next')
+        self.assertEqual(
+            [pk for page in forward for pk in page],
+            [pk for _, pk in self.expected],
+        )
+        self.assertEqual([len(page) for page in forward], [3, 3, 1])
+        last = self.client.get(f'{URL}?cursor=&limit=3').data['next']
+        last = self.client.get(last).data['next']
+        backward = self.pages(last, 'previous')
+        self.assertEqual(backward[1:], forward[1::-1])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(URL, {'cursor': 'broken'})
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,135 @@
+import math
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+
+from recipes.models import Favorite, RankingState, RecipeRank, ShoppingBasket
+from recipes.ranking import refresh_trending
+
+from .base import FoodgramTestCase
+
+URL = '/api/recipes/'
+HOUR = timedelta(hours=1)
+
+
+@override_settings(TRENDING_HALF_LIFE_HOURS=1, TRENDING_WINDOW_DAYS=100)
+class TrendingScoreTest(FoodgramTestCase):
+    """Затухающий рейтинг в масштабе момента отсчёта."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = cls.create_user('author')
+        cls.users = [cls.create_user(f'user{number}') for number in range(3)]
+        cls.first = cls.create_recipe(author, 'first')
+        cls.second = cls.create_recipe(author, 'second')
+        cls.epoch = timezone.now() - 50 * 24 * HOUR
+
+    def setUp(self):
+        super().setUp()
+        RankingState.objects.create(epoch=self.epoch)
+
+    def event(self, model, user, recipe, at):
+        row = model.objects.create(user=user, recipe=recipe)
+        model.objects.filter(pk=row.pk).update(created=at)
+
+    def scores(self):
+        return dict(RecipeRank.objects.values_list('recipe_id', 'score'))
+
+    def test_decay(self):
+        """Событие на период полураспада позже весит вдвое больше."""
+        self.event(Favorite, self.users[0], self.first, self.epoch)
+        self.event(ShoppingBasket, self.users[0], self.first,
+                   self.epoch + HOUR)
+        self.event(Favorite, self.users[1], self.second,
+                   self.epoch + 2 * HOUR)
+        self.assertEqual(refresh_trending(now=self.epoch + 3 * HOUR), 2)
+        scores = self.scores()
+        self.assertAlmostEqual(scores[self.first.id], 1.0 + 0.5 * 2)
+        self.assertAlmostEqual(scores[self.second.id], 4.0)
+
+        self.assertEqual(refresh_trending(now=self.epoch + 3 * HOUR), 0)
+        self.assertEqual(self.scores(), scores)
+        self.event(Favorite, self.users[2], self.first,
+                   self.epoch + 3 * HOUR)
+        self.assertEqual(refresh_trending(now=self.epoch + 4 * HOUR), 1)
+        self.assertAlmostEqual(self.scores()[self.first.id], 2.0 + 8.0)
+
+    def test_rebase(self):
+        """При большом показателе рейтинги переводятся к новому моменту."""
+        self.event(Favorite, self.users[0], self.first, self.epoch)
+        refresh_trending(now=self.epoch + HOUR)
+        now = self.epoch + 40 * 24 * HOUR
+        self.event(Favorite, self.users[0], self.second, now - HOUR)
+        refresh_trending(now=now)
+        self.assertEqual(RankingState.objects.get().epoch, now)
+        scores = self.scores()
+        self.assertAlmostEqual(scores[self.second.id], 0.5)
+        self.assertLess(scores[self.first.id], 1e-100)
+        self.assertTrue(all(math.isfinite(score) for score in scores.values()))
+
+    @override_settings(TRENDING_WINDOW_DAYS=1)
+    def test_window(self):
+        self.event(Favorite, self.users[0], self.first, self.epoch)
+        self.event(Favorite, self.users[0], self.second, self.epoch + HOUR)
+        refresh_trending(now=self.epoch + 2 * HOUR)
+        self.assertEqual(len(self.scores()), 2)
+        refresh_trending(now=self.epoch + 24 * HOUR + HOUR / 2)
+        self.assertEqual(list(self.scores()), [self.second.id])
+
+
+class RankingOrderingTest(FoodgramTestCase):
+    """Сортировки popular и trending в ленте и их сброс в кэше."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = cls.create_user('author')
+        cls.users = [cls.create_user(f'user{number}') for number in range(3)]
+        cls.recipes = {
+            name: cls.create_recipe(author, name)
+            for name in ('soup', 'salad', 'pie')
+        }
+
+    def names(self, ordering):
+        response = self.client.get(URL, {'ordering': ordering})
+        self.assertEqual(response.status_code, 200)
+        return [recipe['name'] for recipe in response.data['results']]
+
+    def favorite(self, name, users):
+        with self.captureOnCommitCallbacks(execute=True):
+            for user in users:
+                response = self.client_for(user).post(
+                    f'{URL}{self.recipes[name].id}/favorite/'
+                )
+                self.assertEqual(response.status_code, 201)
+
+    def refresh(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('refresh_trending', stdout=StringIO())
+
+    def test_trending(self):
+        self.favorite('soup', self.users[:2])
+        self.favorite('salad', self.users[:1])
+        self.refresh()
+        self.assertEqual(self.names('trending'), ['soup', 'salad', 'pie'])
+        self.favorite('pie', self.users)
+        self.assertEqual(self.names('trending'), ['soup', 'salad', 'pie'])
+        self.refresh()
+        self.assertEqual(self.names('trending'), ['pie', 'soup', 'salad'])
+
+    def test_popular_follows_favorites(self):
+        self.favorite('soup', self.users[:2])
+        self.favorite('salad', self.users[:1])
+        self.assertEqual(self.names('popular'), ['soup', 'salad', 'pie'])
+        self.favorite('pie', self.users)
+        self.assertEqual(self.names('popular'), ['pie', 'soup', 'salad'])
+        with self.captureOnCommitCallbacks(execute=True):
+            for user in self.users[:2]:
+                response = self.client_for(user).delete(
+                    f'{URL}favorite/', {'recipes': [self.recipes['pie'].id]},
+                    format='json',
+                )
+                self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.names('popular'), ['soup', 'pie', 'salad'])
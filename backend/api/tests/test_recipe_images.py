@@ -0,0 +1,74 @@
+from recipes.models import Recipe
+
+from .base import FoodgramTestCase
+
+URL = '/api/recipes/'
+IMAGE_URL = 'http://testserver/media/recipes/recipe.png'
+
+
+class RecipeImageTest(FoodgramTestCase):
+    """Ссылка на текущую картинку рецепта вместо base64."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = cls.create_user('author')
+        cls.tag = cls.create_tag('breakfast')
+        cls.ingredient = cls.create_ingredient('flour')
+        cls.recipe = cls.create_recipe(cls.author, 'pancakes')
+
+    def payload(self, **fields):
+        return {
+            'name': 'crepes',
+            'text': 'crepes',
+            'cooking_time': 10,
+            'tags': [self.tag.id],
+            'ingredients': [{'id': self.ingredient.id, 'amount': 100}],
+            'image': IMAGE_URL,
+            **fields,
+        }
+
+    def update(self, **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client_for(self.author).patch(
+                f'{URL}{self.recipe.id}/', self.payload(**fields),
+                format='json',
+            )
+
+    def test_create_with_image_url_rejected(self):
+        response = self.client_for(self.author).post(
+            URL, self.payload(), format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('image', response.data)
+        self.assertFalse(Recipe.objects.filter(name='crepes').exists())
+
+    def test_update_with_current_image_url_keeps_image(self):
+        response = self.update()
+        self.assertEqual(response.status_code, 200)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image.name, 'recipes/recipe.png')
+        self.assertEqual(self.recipe.name, 'crepes')
+
+    def test_update_with_variant_url_keeps_image(self):
+        Recipe.objects.filter(pk=self.recipe.pk).update(image_variants={
+            'card': {'jpeg': 'recipes/variants/recipe_card.jpeg'},
+        })
+        response = self.update(
+            image='https://example.com/media/recipes/variants/'
+                  'recipe_card.jpeg'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image.name, 'recipes/recipe.png')
+
+    def test_update_with_other_url_rejected(self):
+        for url in (
+            'http://testserver/media/recipes/other.png',
+            'http://attacker.example/image.png',
+        ):
+            with self.subTest(url=url):
+                response = self.update(image=url)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('image', response.data)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.name, 'pancakes')
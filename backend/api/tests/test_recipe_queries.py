@@ -0,0 +1,83 @@
+from recipes.models import Favorite, ShoppingBasket
+from users.models import Follow
+
+from .base import FoodgramTestCase
+
+URL = '/api/recipes/'
+
+
+class RecipeListQueriesTest(FoodgramTestCase):
+    """Число запросов страницы рецептов не зависит от её размера."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = cls.create_user('author')
+        cls.reader = cls.create_user('reader')
+        tags = [cls.create_tag('breakfast'), cls.create_tag('lunch')]
+        ingredients = [
+            cls.create_ingredient(f'ingredient{number}')
+            for number in range(4)
+        ]
+        cls.recipes = [
+            cls.create_recipe(
+                cls.author, f'recipe{number}', tags=tags[:number % 2 + 1],
+                ingredients=[(ingredient, number + 1)
+                             for ingredient in ingredients[:3]],
+            )
+            for number in range(12)
+        ]
+        for recipe in cls.recipes[:3]:
+            Favorite.objects.create(user=cls.reader, recipe=recipe)
+        ShoppingBasket.objects.create(user=cls.reader, recipe=cls.recipes[1])
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def assert_page_queries(self, client, params, queries):
+        """Одинаковое число запросов для страниц из 1 и 3 рецептов."""
+        for limit in (1, 3):
+            self.setUp()
+            with self.assertNumQueries(queries):
+                response = client.get(URL, {**params, 'limit': limit})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data['results']), limit)
+
+    def test_anonymous(self):
+        # count, страница, теги, ингредиенты
+        self.assert_page_queries(self.client, {}, 4)
+
+    def test_anonymous_cache_hit(self):
+        self.client.get(URL)
+        with self.assertNumQueries(0):
+            response = self.client.get(URL)
+        self.assertEqual(len(response.data['results']), 6)
+
+    def test_authenticated(self):
+        # токен и флаги пользователя: избранное, покупки, подписки
+        client = self.client_for(self.reader)
+        self.assert_page_queries(client, {}, 4 + 4)
+        # страница из общего кэша, флаги пользователя - всегда из базы
+        with self.assertNumQueries(3):
+            client.get(URL, {'limit': 3})
+
+    def test_authenticated_flags(self):
+        response = self.client_for(self.reader).get(URL, {'limit': 12})
+        flags = {
+            recipe['id']: (
+                recipe['is_favorited'], recipe['is_in_shopping_cart'],
+                recipe['author']['is_subscribed'],
+            )
+            for recipe in response.data['results']
+        }
+        self.assertEqual(flags[self.recipes[0].id], (True, False, True))
+        self.assertEqual(flags[self.recipes[1].id], (True, True, True))
+        self.assertEqual(flags[self.recipes[5].id], (False, False, True))
+
+    def test_filtered(self):
+        client = self.client_for(self.reader)
+        # и соответствие слагов тегов их id
+        self.assert_page_queries(
+            client, {'tags': 'breakfast', 'author': self.author.id}, 5 + 4
+        )
+        # фильтр по флагам пользователя идёт мимо общего кэша
+        self.assert_page_queries(
+            client, {'is_favorited': 1, 'tags': 'breakfast'}, 1 + 5
+        )
@@ -0,0 +1,113 @@
+from unittest import mock
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api.serializers import CreateRecipeSerializer
+from recipes.models import IngredientInRecipe
+
+from .base import FoodgramTestCase
+
+WRITES = ('INSERT', 'UPDATE', 'DELETE')
+
+
+class SaveIngredientsAndTagsTest(FoodgramTestCase):
+    """Запись ингредиентов и тегов рецепта по разнице со старыми."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = cls.create_user('author')
+        cls.breakfast = cls.create_tag('breakfast')
+        cls.dinner = cls.create_tag('dinner')
+        cls.flour = cls.create_ingredient('flour')
+        cls.milk = cls.create_ingredient('milk', 'мл')
+        cls.eggs = cls.create_ingredient('eggs', 'шт')
+        cls.recipe = cls.create_recipe(
+            cls.author, 'pancakes', tags=[cls.breakfast],
+            ingredients=[(cls.flour, 100), (cls.milk, 200)],
+        )
+
+    def save(self, ingredients, tags=None):
+        return CreateRecipeSerializer().save_ingredients_and_tags(
+            self.recipe,
+            [
+                {'id': ingredient.id, 'amount': amount}
+                for ingredient, amount in ingredients
+            ],
+            tags,
+        )
+
+    def lines(self):
+        return dict(
+            IngredientInRecipe.objects.filter(recipe=self.recipe)
+            .values_list('ingredient__name', 'amount')
+        )
+
+    def slugs(self):
+        return set(self.recipe.tags.values_list('slug', flat=True))
+
+    def test_ingredients(self):
+        changes = self.save([(self.flour, 150), (self.eggs, 2)])
+        self.assertEqual(changes.ingredients, {
+            self.flour.id: 50, self.milk.id: -200, self.eggs.id: 2,
+        })
+        self.assertEqual(self.lines(), {'flour': 150, 'eggs': 2})
+        self.assertEqual(changes.tags, {'breakfast'})
+        self.assertFalse(changes.tags_added | changes.tags_removed)
+
+    def writes(self, queries):
+        return [
+            query['sql'] for query in queries
+            if query['sql'].lstrip().startswith(WRITES)
+        ]
+
+    def test_changed_amount_only(self):
+        with CaptureQueriesContext(connection) as queries:
+            changes = self.save([(self.flour, 100), (self.milk, 250)])
+        self.assertEqual(changes.ingredients, {self.milk.id: 50})
+        writes = self.writes(queries)
+        self.assertEqual(len(writes), 1)
+        self.assertTrue(writes[0].startswith('UPDATE'))
+        self.assertEqual(self.lines(), {'flour': 100, 'milk': 250})
+
+    def test_tags(self):
+        changes = self.save(
+            [(self.flour, 100), (self.milk, 200)], [self.dinner]
+        )
+        self.assertFalse(changes.ingredients)
+        self.assertEqual(changes.tags, {'dinner'})
+        self.assertEqual(changes.tags_added, {'dinner'})
+        self.assertEqual(changes.tags_removed, {'breakfast'})
+        self.assertEqual(changes.affected_tags, {'breakfast', 'dinner'})
+        self.assertEqual(self.slugs(), {'dinner'})
+
+    def test_no_changes(self):
+        with CaptureQueriesContext(connection) as queries:
+            changes = self.save(
+                [(self.milk, 200), (self.flour, 100)], [self.breakfast]
+            )
+        self.assertFalse(changes)
+        self.assertEqual(self.writes(queries), [])
+
+    def test_no_changes_through_api(self):
+        """Тот же рецепт повторно: ни записей, ни сброса кэша."""
+        data = {
+            'name': 'pancakes',
+            'tags': [self.breakfast.id],
+            'ingredients': [
+                {'id': self.flour.id, 'amount': 100},
+                {'id': self.milk.id, 'amount': 200},
+            ],
+        }
+        client = self.client_for(self.author)
+        with mock.patch('api.cache.bump') as bump, \
+                mock.patch('api.signals.bump') as signals_bump, \
+                self.captureOnCommitCallbacks(execute=True), \
+                CaptureQueriesContext(connection) as queries:
+            response = client.patch(
+                f'/api/recipes/{self.recipe.id}/', data, format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.writes(queries), [])
+        bump.assert_not_called()
+        signals_bump.assert_not_called()
@@ -0,0 +1,67 @@
+from api.serializers import CreateRecipeSerializer
+
+from .base import FoodgramTestCase
+
+
+class RecipeValidationTest(FoodgramTestCase):
+    """Проверка тегов и ингредиентов рецепта пакетными запросами."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = cls.create_user('author')
+        cls.tags = [cls.create_tag(f'tag{number}') for number in range(3)]
+        cls.ingredients = [
+            cls.create_ingredient(f'ingredient{number}')
+            for number in range(10)
+        ]
+        cls.recipe = cls.create_recipe(cls.author, 'pancakes')
+
+    def serializer(self, **data):
+        return CreateRecipeSerializer(self.recipe, data=data, partial=True)
+
+    def test_one_query_per_relation(self):
+        serializer = self.serializer(
+            tags=[tag.id for tag in self.tags],
+            ingredients=[
+                {'id': ingredient.id, 'amount': 10}
+                for ingredient in self.ingredients
+            ],
+        )
+        with self.assertNumQueries(2):
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+        self.assertEqual(serializer.validated_data['tags'], self.tags)
+        self.assertEqual(len(serializer.validated_data['ingredients']), 10)
+
+    def test_errors_by_line(self):
+        flour = self.ingredients[0]
+        serializer = self.serializer(
+            cooking_time=0,
+            tags=[self.tags[0].id, 999],
+            ingredients=[
+                {'id': flour.id, 'amount': 10},
+                {'id': 999, 'amount': 10},
+                {'id': self.ingredients[1].id, 'amount': 0},
+                {'id': flour.id, 'amount': 5},
+                'flour',
+                {'amount': 'many'},
+            ],
+        )
+        with self.assertNumQueries(2):
+            self.assertFalse(serializer.is_valid())
+        errors = serializer.errors
+        self.assertEqual(set(errors), {'cooking_time', 'tags', 'ingredients'})
+        self.assertEqual(len(errors['tags']), 1)
+        lines = errors['ingredients']
+        self.assertEqual(len(lines), 6)
+        self.assertEqual(lines[0], {})
+        self.assertEqual(set(lines[1]), {'id'})
+        self.assertIn('999', str(lines[1]['id'][0]))
+        self.assertEqual(set(lines[2]), {'amount'})
+        self.assertEqual(set(lines[3]), {'id'})
+        self.assertEqual(set(lines[4]), {'non_field_errors'})
+        self.assertEqual(set(lines[5]), {'id', 'amount'})
+
+    def test_no_ingredients(self):
+        serializer = self.serializer(ingredients=[])
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('ingredients', serializer.errors)
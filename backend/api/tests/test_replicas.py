@@ -0,0 +1,61 @@
+from unittest import mock
+
+from django.test import override_settings
+
+from api.replicas import ReplicaRouter, RoutingState, primary, routing
+
+from .base import FoodgramTestCase
+
+
+@override_settings(REPLICA_DATABASES=['replica0'])
+class ReplicaCacheTest(FoodgramTestCase):
+    """Общий кэш заполняется только данными из default."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = cls.create_user('reader')
+        cls.tag = cls.create_tag('breakfast')
+        cls.create_recipe(cls.user, 'pancakes', tags=[cls.tag])
+
+    def setUp(self):
+        super().setUp()
+        self.reads = []
+        db_for_read = ReplicaRouter.db_for_read
+
+        def record(router, model, **hints):
+            state = routing.get()
+            self.reads.append(state.replica if state else None)
+            db_for_read(router, model, **hints)
+            # Внутри транзакции теста реплики нет, читаем из default.
+            return None
+
+        patcher = mock.patch.object(
+            ReplicaRouter, 'db_for_read', autospec=True, side_effect=record
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_cache_miss_reads_primary(self):
+        url = f'/api/recipes/?tags={self.tag.slug}&limit=3'
+        self.client.get(url)
+        self.assertTrue(self.reads)
+        self.assertEqual(set(self.reads), {None})
+
+    def test_user_flags_read_replica(self):
+        url = '/api/recipes/?limit=3'
+        self.client.get(url)
+        self.reads.clear()
+        self.client_for(self.user).get(url)
+        self.assertIn('replica0', self.reads)
+
+    def test_primary(self):
+        state = RoutingState(pinned=False)
+        state.use_replica()
+        token = routing.set(state)
+        self.addCleanup(routing.reset, token)
+        with primary():
+            self.assertIsNone(state.replica)
+        self.assertEqual(state.replica, 'replica0')
+        with primary():
+            state.pin()
+        self.assertIsNone(state.replica)
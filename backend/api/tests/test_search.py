@@ -0,0 +1,150 @@
+from unittest import mock, skipUnless
+
+from django.db import connection
+from django.test import SimpleTestCase, override_settings
+
+from api import search
+from api.search import (DatabaseSearchBackend, IngredientIndex,
+                        MemorySearchBackend)
+from recipes.models import Ingredient
+
+from .base import FoodgramTestCase
+
+NAMES = (
+    'Sugar', 'sugar powder', 'cane sugar', 'vanilla', 'vanilla sugar',
+    'salt', 'sea salt',
+)
+
+
+def ingredient_rows():
+    return [
+        {'id': pk, 'name': name, 'measurement_unit': 'г'}
+        for pk, name in enumerate(NAMES, start=1)
+    ]
+
+
+def names(results):
+    return [ingredient['name'] for ingredient in results]
+
+
+class IngredientIndexTest(SimpleTestCase):
+    """Индекс в памяти: сначала префикс, затем подстрока по позиции."""
+
+    def setUp(self):
+        self.index = IngredientIndex(ingredient_rows())
+
+    def test_prefix_then_substring(self):
+        self.assertEqual(
+            names(self.index.search('Sug', 20)),
+            ['Sugar', 'sugar powder', 'cane sugar', 'vanilla sugar'],
+        )
+
+    def test_limit(self):
+        self.assertEqual(
+            names(self.index.search('sugar', 3)),
+            ['Sugar', 'sugar powder', 'cane sugar'],
+        )
+
+    def test_short_query(self):
+        """Запрос короче триграммы ищется перебором названий."""
+        self.assertEqual(
+            names(self.index.search(' sa ', 20)),
+            ['salt', 'sea salt'],
+        )
+        self.assertEqual(
+            names(self.index.search('a', 3)),
+            ['cane sugar', 'salt', 'vanilla'],
+        )
+
+    def test_no_matches(self):
+        self.assertEqual(self.index.search('pepper', 20), [])
+        self.assertEqual(self.index.search('zuga', 20), [])
+
+
+class SearchBackendTest(FoodgramTestCase):
+    """Бэкенды поиска дают одинаковый результат и видят новые записи."""
+
+    @classmethod
+    def setUpTestData(cls):
+        Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit='г') for name in NAMES
+        )
+
+    def test_backends_agree(self):
+        memory, database = MemorySearchBackend(), DatabaseSearchBackend()
+        for query in ('sug', 'sugar', 'salt', 'van', 'pepper'):
+            with self.subTest(query=query):
+                self.assertEqual(
+                    names(memory.search(query, 3)),
+                    names(database.search(query, 3)),
+                )
+
+    def test_index_rebuilt_on_generation_change(self):
+        backend = MemorySearchBackend()
+        self.assertEqual(
+            names(backend.search('sea', 20)), ['sea salt']
+        )
+        index = backend.index
+        with self.assertNumQueries(0):
+            backend.search('sea', 20)
+        self.assertIs(backend.index, index)
+        Ingredient.objects.create(name='seaweed', measurement_unit='г')
+        self.assertEqual(
+            names(backend.search('sea', 20)), ['sea salt', 'seaweed']
+        )
+        self.assertIsNot(backend.index, index)
+
+
+class BackendSelectionTest(FoodgramTestCase):
+    """INGREDIENT_SEARCH_BACKEND и выбор auto по наличию pg_trgm."""
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(search, '_backend', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def backend(self, name, trgm=None):
+        search._backend = None
+        with override_settings(INGREDIENT_SEARCH_BACKEND=name):
+            if trgm is None:
+                return search.get_search_backend()
+            with mock.patch.object(
+                search, 'pg_trgm_available', return_value=trgm
+            ):
+                return search.get_search_backend()
+
+    def test_explicit(self):
+        self.assertIsInstance(self.backend('memory'), MemorySearchBackend)
+        self.assertIsInstance(self.backend('database'), DatabaseSearchBackend)
+
+    def test_auto(self):
+        self.assertIsInstance(
+            self.backend('auto', trgm=True), DatabaseSearchBackend
+        )
+        self.assertIsInstance(
+            self.backend('auto', trgm=False), MemorySearchBackend
+        )
+
+    def test_backend_cached(self):
+        backend = self.backend('memory')
+        with override_settings(INGREDIENT_SEARCH_BACKEND='database'):
+            self.assertIs(search.get_search_backend(), backend)
+
+    @skipUnless(connection.vendor == 'postgresql', 'pg_trgm - PostgreSQL')
+    def test_pg_trgm_detected(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'"
+            )
+            installed = cursor.fetchone() is not None
+        self.assertEqual(search.pg_trgm_available(), installed)
+        self.assertIsInstance(
+            self.backend('auto'),
+            DatabaseSearchBackend if installed else MemorySearchBackend,
+        )
+
+    @skipUnless(connection.vendor != 'postgresql', 'Без PostgreSQL')
+    def test_memory_without_postgresql(self):
+        self.assertFalse(search.pg_trgm_available())
+        self.assertIsInstance(self.backend('auto'), MemorySearchBackend)
@@ -0,0 +1,157 @@
+from recipes.models import (Ingredient, IngredientInRecipe, Recipe,
+                            ShoppingBasket, ShoppingCartIngredient)
+from users.models import User
+
+from .base import FoodgramTestCase
+
+URL = '/api/recipes/'
+
+
+class ShoppingCartAggregateTest(FoodgramTestCase):
+    """
+    Агрегат списков покупок совпадает с пересчётом заново после любых
+    изменений: через API, админку и ORM, в том числе каскадных.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = cls.create_user('reader')
+        cls.other = cls.create_user('other')
+        cls.author = cls.create_user('author')
+        cls.flour = cls.create_ingredient('flour')
+        cls.milk = cls.create_ingredient('milk', 'мл')
+        cls.eggs = cls.create_ingredient('eggs', 'шт')
+        cls.pancakes = cls.create_recipe(
+            cls.author, 'pancakes',
+            ingredients=[(cls.flour, 200), (cls.milk, 300)],
+        )
+        cls.bread = cls.create_recipe(
+            cls.author, 'bread', ingredients=[(cls.flour, 500)],
+        )
+
+    def cart(self, user):
+        return dict(
+            ShoppingCartIngredient.objects.filter(user=user)
+            .values_list('ingredient__name', 'total_amount')
+        )
+
+    def assert_consistent(self):
+        actual = {
+            (row.user_id, row.ingredient_id): row.total_amount
+            for row in ShoppingCartIngredient.objects.all()
+        }
+        expected = {
+            (row['user'], row['ingredient']): row['total']
+            for row in ShoppingCartIngredient.objects.expected()
+        }
+        self.assertEqual(actual, expected)
+
+    def fill_carts(self):
+        for user in (self.reader, self.other):
+            for recipe in (self.pancakes, self.bread):
+                ShoppingBasket.objects.create(user=user, recipe=recipe)
+
+    def test_create(self):
+        response = self.client_for(self.reader).post(
+            f'{URL}{self.pancakes.id}/shopping_cart/'
+        )
+        self.assertEqual(response.status_code, 201)
+        ShoppingBasket.objects.create(user=self.reader, recipe=self.bread)
+        self.assertEqual(self.cart(self.reader), {'flour': 700, 'milk': 300})
+        self.assert_consistent()
+
+    def test_edit_through_api(self):
+        self.fill_carts()
+        response = self.client_for(self.author).patch(
+            f'{URL}{self.pancakes.id}/',
+            {'ingredients': [
+                {'id': self.flour.id, 'amount': 250},
+                {'id': self.eggs.id, 'amount': 2},
+            ]},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.cart(self.reader), {'flour': 750, 'eggs': 2})
+        self.assert_consistent()
+
+    def test_edit_outside_api(self):
+        self.fill_carts()
+        line = IngredientInRecipe.objects.get(
+            recipe=self.pancakes, ingredient=self.flour
+        )
+        line.amount = 150
+        line.save()
+        line = IngredientInRecipe.objects.get(
+            recipe=self.pancakes, ingredient=self.milk
+        )
+        line.ingredient = self.eggs
+        line.amount = 3
+        line.save()
+        IngredientInRecipe.objects.create(
+            recipe=self.bread, ingredient=self.milk, amount=100
+        )
+        self.assertEqual(
+            self.cart(self.reader), {'flour': 650, 'milk': 100, 'eggs': 3}
+        )
+        self.assert_consistent()
+
+    def test_edit_basket(self):
+        basket = ShoppingBasket.objects.create(
+            user=self.reader, recipe=self.pancakes
+        )
+        basket.recipe = self.bread
+        basket.save()
+        basket.user = self.other
+        basket.save()
+        self.assertEqual(self.cart(self.reader), {})
+        self.assertEqual(self.cart(self.other), {'flour': 500})
+        self.assert_consistent()
+
+    def test_delete(self):
+        self.fill_carts()
+        response = self.client_for(self.reader).delete(
+            f'{URL}{self.pancakes.id}/shopping_cart/'
+        )
+        self.assertEqual(response.status_code, 204)
+        ShoppingBasket.objects.filter(
+            user=self.other, recipe=self.bread
+        ).delete()
+        IngredientInRecipe.objects.filter(
+            recipe=self.pancakes, ingredient=self.milk
+        ).delete()
+        self.assertEqual(self.cart(self.reader), {'flour': 500})
+        self.assertEqual(self.cart(self.other), {'flour': 200})
+        self.assert_consistent()
+
+    def test_cascade(self):
+        self.fill_carts()
+        response = self.client_for(self.author).delete(
+            f'{URL}{self.pancakes.id}/'
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.cart(self.reader), {'flour': 500})
+        self.assert_consistent()
+        Ingredient.objects.filter(pk=self.flour.pk).delete()
+        self.assertEqual(self.cart(self.reader), {})
+        self.assert_consistent()
+
+    def test_cascade_from_users(self):
+        self.fill_carts()
+        User.objects.filter(pk=self.other.pk).delete()
+        self.assert_consistent()
+        self.author.delete()
+        self.assertFalse(Recipe.objects.exists())
+        self.assertEqual(self.cart(self.reader), {})
+        self.assert_consistent()
+
+    def test_rebuild(self):
+        self.fill_carts()
+        ShoppingCartIngredient.objects.filter(user=self.reader).update(
+            total_amount=1
+        )
+        ShoppingCartIngredient.objects.filter(user=self.other).delete()
+        ShoppingCartIngredient.objects.rebuild([self.reader.id])
+        self.assertEqual(self.cart(self.other), {})
+        ShoppingCartIngredient.objects.rebuild(batch_size=1)
+        self.assertEqual(self.cart(self.reader), {'flour': 700, 'milk': 300})
+        self.assert_consistent()
@@ -0,0 +1,45 @@
+from api.renderers import TextShoppingListRenderer, stream_shopping_list
+from recipes.models import ShoppingBasket, ShoppingCartIngredient
+
+from .base import FoodgramTestCase
+
+DOWNLOAD_URL = '/api/recipes/download_shopping_cart/'
+
+
+class ShoppingListDownloadTest(FoodgramTestCase):
+    """Выгрузка списка покупок."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = cls.create_user('reader')
+        recipe = cls.create_recipe(
+            cls.user, 'pancakes',
+            ingredients=[(cls.create_ingredient('flour'), 200)],
+        )
+        ShoppingBasket.objects.create(user=cls.user, recipe=recipe)
+        ShoppingCartIngredient.objects.rebuild([cls.user.id])
+
+    def test_download(self):
+        response = self.client_for(self.user).get(DOWNLOAD_URL)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('flour - 200/г', b''.join(response).decode())
+
+    def test_rows_closed_when_response_closed(self):
+        """Курсор закрывается, даже если клиент не дочитал файл."""
+        closed = []
+
+        def rows():
+            try:
+                for number in range(3):
+                    yield {
+                        'name': f'item{number}', 'measurement_unit': 'г',
+                        'total': number,
+                    }
+            finally:
+                closed.append(True)
+
+        chunks = stream_shopping_list(TextShoppingListRenderer(), rows())
+        next(chunks)
+        next(chunks)
+        chunks.close()
+        self.assertEqual(closed, [True])
@@ -0,0 +1,58 @@
+from users.models import Follow
+
+from .base import FoodgramTestCase
+
+URL = '/api/users/subscriptions/'
+
+
+class SubscriptionPreviewsTest(FoodgramTestCase):
+    """Превью рецептов подписок: последние рецепты каждого автора."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = cls.create_user('reader')
+        cls.authors = [
+            cls.create_user(f'author{number}') for number in range(3)
+        ]
+        cls.recipes = {
+            author.id: [
+                cls.create_recipe(author, f'{author.username}-{number}').id
+                for number in range(4)
+            ]
+            for author in cls.authors
+        }
+
+    def test_no_subscriptions(self):
+        response = self.client_for(self.reader).get(URL)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 0)
+        self.assertEqual(response.data['results'], [])
+
+    def test_previews(self):
+        for author in self.authors:
+            Follow.objects.create(user=self.reader, author=author)
+        response = self.client_for(self.reader).get(
+            URL, {'recipes_limit': 2}
+        )
+        self.assertEqual(response.status_code, 200)
+        previews = {
+            item['id']: [recipe['id'] for recipe in item['recipes']]
+            for item in response.data['results']
+        }
+        self.assertEqual(previews, {
+            author_id: recipe_ids[:-3:-1]
+            for author_id, recipe_ids in self.recipes.items()
+        })
+
+    def test_queries_do_not_grow_with_authors(self):
+        client = self.client_for(self.reader)
+        client.get(URL)
+        Follow.objects.create(user=self.reader, author=self.authors[0])
+        # count, подписки с авторами, превью
+        with self.assertNumQueries(3):
+            client.get(URL)
+        for author in self.authors[1:]:
+            Follow.objects.create(user=self.reader, author=author)
+        with self.assertNumQueries(3):
+            response = client.get(URL)
+        self.assertEqual(len(response.data['results']), 3)
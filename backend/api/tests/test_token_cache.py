@@ -0,0 +1,98 @@
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.authentication import TokenCache, get_token_cache
+
+from .base import FoodgramTestCase
+
+ME_URL = '/api/users/me/'
+PASSWORD = 'Pa55word!x'
+
+
+class TokenCacheTest(FoodgramTestCase):
+    """Кэш токенов не пропускает отозванный токен."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = cls.create_user('reader')
+
+    def setUp(self):
+        super().setUp()
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def assert_accepted(self):
+        with self.assertNumQueries(0):
+            self.assertIsNotNone(get_token_cache().get(self.token.key))
+        self.assertEqual(self.client.get(ME_URL).status_code, 200)
+
+    def assert_rejected(self):
+        self.assertEqual(self.client.get(ME_URL).status_code, 401)
+
+    def test_cached(self):
+        self.client.get(ME_URL)
+        self.assert_accepted()
+
+    def test_logout(self):
+        self.client.get(ME_URL)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/auth/token/logout/')
+        self.assertEqual(response.status_code, 204)
+        self.assertIsNone(get_token_cache().get(self.token.key))
+        self.assert_rejected()
+
+    def test_password_change(self):
+        self.client.get(ME_URL)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/users/set_password/', {
+                'current_password': PASSWORD,
+                'new_password': 'N3wPa55word!x',
+            })
+        self.assertEqual(response.status_code, 204)
+        self.assert_rejected()
+
+    def test_deactivated(self):
+        self.client.get(ME_URL)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertIsNone(get_token_cache().get(self.token.key))
+        self.assert_rejected()
+
+    def test_ttl(self):
+        """Изменение мимо сигналов видно не позже чем через TTL."""
+        self.client.get(ME_URL)
+        type(self.user).objects.filter(pk=self.user.pk).update(
+            is_active=False
+        )
+        self.assert_accepted()
+        expired = time.monotonic() + get_token_cache().ttl + 1
+        with mock.patch(
+            'api.authentication.time.monotonic', return_value=expired
+        ):
+            self.assertIsNone(get_token_cache().get(self.token.key))
+            self.assert_rejected()
+
+
+class TokenCacheLRUTest(SimpleTestCase):
+    """Размер и TTL записей в памяти процесса."""
+
+    def test_expiry_and_eviction(self):
+        cache = TokenCache(size=2, ttl=30)
+        for key in ('a', 'b'):
+            cache.set(key, key)
+        self.assertEqual(cache.get('a'), 'a')
+        cache.set('c', 'c')
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 'a')
+        with mock.patch(
+            'api.authentication.time.monotonic',
+            return_value=time.monotonic() + 31,
+        ):
+            self.assertIsNone(cache.get('a'))
+            self.assertIsNone(cache.get('c'))
@@ -2,7 +2,7 @@ from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
 from .views import (FollowViewSet, IngredientsViewSet, RecipesViewSet,
-                    TagsViewSet)
+                    TagsViewSet, metrics)
 
 app_name = 'api'
 
@@ -13,6 +13,7 @@ router_v1.register('ingredients', IngredientsViewSet)
 router_v1.register('tags', TagsViewSet)
 
 urlpatterns = [
+    path('metrics/', metrics, name='metrics'),
     path('', include(router_v1.urls)),
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
@@ -1,35 +1,76 @@
+import hmac
+from functools import partial
 from http import HTTPStatus
-from io import BytesIO
 
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
 from django.db import transaction
-from django.db.models import BooleanField, Count, Exists, OuterRef, Sum, Value
-from django.http import HttpResponse
+from django.db.models import F
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from djoser.views import UserViewSet
-from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
-                            ShoppingBasket, Tag)
 from rest_framework import mixins, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import SAFE_METHODS, IsAuthenticated
 from rest_framework.response import Response
+
+from recipes.bulk import add_recipes, remove_recipes
+from recipes.models import Favorite, Ingredient, Recipe, ShoppingBasket, Tag
 from users.models import Follow, User
 
+from .cache import (INGREDIENTS, POPULAR, TAGS, bump, get_cache,
+                    overlay_user_flags, recipe_detail_key,
+                    recipe_detail_scopes, recipe_page_key, recipe_page_scopes,
+                    user_scope)
+from .conditional import versioned
 from .filters import IngredientSearchFilter, RecipeFilter
+from .metrics import registry
+from .middleware import TimedSerializationMixin, timed_serialization
 from .permissions import IsAdminAuthorOrReadOnly, IsAdminOrReadOnly
-from .serializers import (AddingRecipesSerializer, CheckFollowSerializer,
-                          CreateRecipeSerializer, FavoritesSerializer,
-                          FollowSerializer, IngredientsSerializer,
-                          ReadRecipesSerializer, ShoppingBasketsSerializer,
-                          TagsSerializer)
+from .renderers import get_shopping_list_renderers, stream_shopping_list
+from .replicas import primary
+from .rows import recipe_rows, recipe_values
+from .search import search_ingredients
+from .serializers import (AddingRecipesSerializer, BulkRecipesSerializer,
+                          CheckFollowSerializer, CreateRecipeSerializer,
+                          FavoritesSerializer, FollowSerializer,
+                          IngredientsSerializer, ReadRecipesSerializer,
+                          ShoppingBasketsSerializer, TagsSerializer,
+                          get_recipes_limit)
 
-FILE_NAME = 'shopping-list.txt'
-TITLE_SHOP_LIST = 'Список покупок с сайта Foodgram:\n\n'
+FILE_NAME = 'shopping-list'
+USER_FILTERS = {'is_favorited', 'is_in_shopping_cart'}
 
 
 class ListRetrieveViewSet(
-    viewsets.GenericViewSet, mixins.ListModelMixin, mixins.RetrieveModelMixin
+    TimedSerializationMixin, viewsets.GenericViewSet,
+    mixins.ListModelMixin, mixins.RetrieveModelMixin
 ):
     permission_classes = (IsAdminOrReadOnly,)
+    version_scopes = ()
+    row_fields = ()
+
+    def get_version(self, request, **kwargs):
+        """Области кэша и параметры ответа для ETag."""
+        params = [
+            kwargs.get(self.lookup_field), sorted(request.query_params.lists())
+        ]
+        return self.version_scopes, params, False
+
+    def list_rows(self, request, *args, **kwargs):
+        """Список из строк values() без сериализатора."""
+        if not self.row_fields:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(list(queryset.values(*self.row_fields)))
+
+    @versioned
+    def list(self, request, *args, **kwargs):
+        return self.list_rows(request, *args, **kwargs)
+
+    @versioned
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
 
 
 class TagsViewSet(ListRetrieveViewSet):
@@ -38,6 +79,8 @@ class TagsViewSet(ListRetrieveViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagsSerializer
     pagination_class = None
+    version_scopes = (TAGS,)
+    row_fields = TagsSerializer.Meta.fields
 
 
 class IngredientsViewSet(ListRetrieveViewSet):
@@ -47,13 +90,24 @@ class IngredientsViewSet(ListRetrieveViewSet):
     serializer_class = IngredientsSerializer
     pagination_class = None
     filter_class = IngredientSearchFilter
+    version_scopes = (INGREDIENTS,)
+    row_fields = IngredientsSerializer.Meta.fields
 
+    @versioned
+    def list(self, request, *args, **kwargs):
+        """Автодополнение по ?name=, без него - весь справочник."""
+        name = request.query_params.get('name')
+        if not name:
+            return self.list_rows(request, *args, **kwargs)
+        return Response(search_ingredients(name))
 
-class RecipesViewSet(viewsets.ModelViewSet):
+
+class RecipesViewSet(TimedSerializationMixin, viewsets.ModelViewSet):
     """Класс взаимодействия с моделью Recipes. Вьюсет для рецептов."""
 
     permission_classes = (IsAdminAuthorOrReadOnly,)
     filter_class = RecipeFilter
+    shared_payload = False
 
     def get_serializer_class(self):
         """Сериализаторы для рецептов."""
@@ -61,30 +115,98 @@ class RecipesViewSet(viewsets.ModelViewSet):
             return ReadRecipesSerializer
         return CreateRecipeSerializer
 
+    def get_serializer_context(self):
+        """На странице рецепта - крупная копия картинки."""
+        context = super().get_serializer_context()
+        if self.action == 'retrieve':
+            context['image_variant'] = 'full'
+        return context
+
     def get_queryset(self):
         """Резюме по объектам с помощью annotate()."""
-        if self.request.user.is_authenticated:
-            return Recipe.objects.annotate(
-                is_favorited=Exists(
-                    Favorite.objects.filter(
-                        user=self.request.user, recipe__pk=OuterRef('pk')
-                    )
-                ),
-                is_in_shopping_cart=Exists(
-                    ShoppingBasket.objects.filter(
-                        user=self.request.user, recipe__pk=OuterRef('pk')
-                    )
-                ),
-            )
-        return Recipe.objects.annotate(
-            is_favorited=Value(False, output_field=BooleanField()),
-            is_in_shopping_cart=Value(False, output_field=BooleanField()),
+        if self.request.method in SAFE_METHODS:
+            if self.shared_payload:
+                return Recipe.objects.for_read(AnonymousUser())
+            return Recipe.objects.for_read(self.request.user)
+        return Recipe.objects.all()
+
+    def get_shared_payload(self, key, build):
+        """Общие для всех пользователей данные из кэша."""
+        cache = get_cache()
+        data = cache.get(key)
+        if data is None:
+            self.shared_payload = True
+            with primary():
+                data = build().data
+            cache.set(key, data, settings.RECIPES_CACHE_TIMEOUT)
+        return data
+
+    def get_version(self, request, **kwargs):
+        """Версия страницы ленты или рецепта с флагами пользователя."""
+        if self.action == 'retrieve':
+            pk = kwargs[self.lookup_field]
+            return recipe_detail_scopes(pk), [pk, self.action], True
+        params, scopes = recipe_page_scopes(request, RecipeFilter.base_filters)
+        return scopes, params, True
+
+    def get_count_scopes(self, request):
+        """Области кэша, от которых зависит число рецептов в ленте."""
+        _, scopes = recipe_page_scopes(request, RecipeFilter.base_filters)
+        user = request.user
+        if user.is_authenticated and USER_FILTERS & set(request.query_params):
+            scopes.append(user_scope(user.id))
+        return scopes
+
+    @versioned
+    def list(self, request, *args, **kwargs):
+        """Лента рецептов из кэша с флагами текущего пользователя."""
+        user = request.user
+        if user.is_authenticated and USER_FILTERS & set(request.query_params):
+            return self.list_rows(request)
+        data = self.get_shared_payload(
+            recipe_page_key(request, RecipeFilter.base_filters),
+            partial(self.list_rows, request),
         )
+        if user.is_authenticated:
+            with timed_serialization():
+                data['results'] = overlay_user_flags(data['results'], user)
+        return Response(data)
+
+    def list_rows(self, request):
+        """Страница ленты из строк values() без дерева сериализаторов."""
+        queryset = recipe_values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        with timed_serialization():
+            results = recipe_rows(page, request)
+        return self.get_paginated_response(results)
+
+    @versioned
+    def retrieve(self, request, *args, **kwargs):
+        """Рецепт из кэша с флагами текущего пользователя."""
+        pk = kwargs[self.lookup_field]
+        if not pk.isdigit():
+            return super().retrieve(request, *args, **kwargs)
+        data = self.get_shared_payload(
+            recipe_detail_key(request, int(pk)),
+            partial(super().retrieve, request, *args, **kwargs),
+        )
+        if request.user.is_authenticated:
+            with timed_serialization():
+                data = overlay_user_flags([data], request.user)[0]
+        return Response(data)
 
     @transaction.atomic()
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    @transaction.atomic()
+    def perform_update(self, serializer):
+        serializer.save()
+
+    @transaction.atomic()
+    def perform_destroy(self, instance):
+        instance.delete()
+
     @action(
         detail=True, methods=['POST'], permission_classes=(IsAuthenticated,)
     )
@@ -126,6 +248,7 @@ class RecipesViewSet(viewsets.ModelViewSet):
         return self.add_object(ShoppingBasket, request.user, pk)
 
     @shopping_cart.mapping.delete
+    @transaction.atomic()
     def del_shopping_cart(self, request, pk=None):
         """Убрать из листа покупок."""
         deleted_count, _ = ShoppingBasket.objects.filter(
@@ -149,43 +272,91 @@ class RecipesViewSet(viewsets.ModelViewSet):
         model.objects.filter(user=user, recipe__id=pk).delete()
         return Response(status=HTTPStatus.NO_CONTENT)
 
-    def generate_shopping_cart_content(self, ingredients):
-        """Генерация содержимого файла листа покупок."""
-        content = BytesIO()
-        content.write(TITLE_SHOP_LIST.encode('utf-8'))
-        content.write(
-            '\n'.join(
-                [
-                    f"{ingredient['ingredient__name']} - "
-                    f"{ingredient['total']}/"
-                    f"{ingredient['ingredient__measurement_unit']}"
-                    for ingredient in ingredients
-                ]
-            ).encode('utf-8')
+    @action(
+        detail=False, methods=['POST'], url_path='favorite',
+        permission_classes=(IsAuthenticated,),
+    )
+    def bulk_favorite(self, request):
+        """Добавить в избранное список рецептов."""
+        return self.bulk_change(add_recipes, Favorite, request)
+
+    @bulk_favorite.mapping.delete
+    def bulk_del_favorite(self, request):
+        """Убрать из избранного список рецептов."""
+        return self.bulk_change(remove_recipes, Favorite, request)
+
+    @action(
+        detail=False, methods=['POST'], url_path='shopping_cart',
+        permission_classes=(IsAuthenticated,),
+    )
+    def bulk_shopping_cart(self, request):
+        """Добавить в лист покупок список рецептов."""
+        return self.bulk_change(add_recipes, ShoppingBasket, request)
+
+    @bulk_shopping_cart.mapping.delete
+    def bulk_del_shopping_cart(self, request):
+        """
+        Убрать из листа покупок список рецептов,
+        без тела запроса - очистить лист.
+        """
+        return self.bulk_change(
+            remove_recipes, ShoppingBasket, request, clear=not request.data
         )
-        content.seek(0)
-        return content
+
+    @transaction.atomic()
+    def bulk_change(self, change, model, request, clear=False):
+        """
+        Массовое изменение избранного/списка покупок одной транзакцией.
+        Ответ - результат по каждому id: created, exists, deleted
+        или not_found.
+        """
+        user = request.user
+        recipe_ids = None
+        if not clear:
+            serializer = BulkRecipesSerializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            recipe_ids = serializer.validated_data['recipes']
+        results = change(model, user, recipe_ids)
+        scopes = [user_scope(user.id)]
+        if model is Favorite:
+            scopes.append(POPULAR)
+        transaction.on_commit(lambda: bump(*scopes))
+        return Response({
+            'recipes': [
+                {'id': pk, 'status': status} for pk, status in results.items()
+            ]
+        })
 
     @action(
-        methods=["GET"], detail=False, permission_classes=(IsAuthenticated,)
+        methods=["GET"], detail=False, permission_classes=(IsAuthenticated,),
+        renderer_classes=get_shopping_list_renderers(),
     )
     def download_shopping_cart(self, request):
-        """Скачать файл листа покупок."""
+        """Скачать файл листа покупок в формате из ?format=."""
         ingredients = (
-            IngredientInRecipe.objects.filter(recipe__list__user=request.user)
-            .values('ingredient__name', 'ingredient__measurement_unit')
-            .order_by('ingredient__name')
-            .annotate(total=Sum('amount'))
+            request.user.shopping_cart_ingredients
+            .values(
+                name=F('ingredient__name'),
+                measurement_unit=F('ingredient__measurement_unit'),
+                total=F('total_amount'),
+            )
+            .order_by('name')
+        )
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            stream_shopping_list(
+                renderer,
+                ingredients.iterator(settings.SHOPPING_LIST_CHUNK_SIZE),
+            ),
+            content_type=renderer.get_content_type(),
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename={FILE_NAME}.{renderer.extension}'
         )
-
-        content = self.generate_shopping_cart_content(ingredients)
-
-        response = HttpResponse(content, content_type='text/plain')
-        response['Content-Disposition'] = f'attachment; filename={FILE_NAME}'
         return response
 
 
-class FollowViewSet(UserViewSet):
+class FollowViewSet(TimedSerializationMixin, UserViewSet):
     """Класс взаимодействия с моделью Follow. Вьюсет подписок."""
 
     @action(methods=['POST'], detail=True,
@@ -224,10 +395,34 @@ class FollowViewSet(UserViewSet):
     def subscriptions(self, request):
         """Подписки."""
         user = request.user
-        queryset = user.follower.annotate(
-            recipes_count=Count('author__recipes'))
+        queryset = user.follower.select_related('author').order_by('-id')
         pages = self.paginate_queryset(queryset)
+        recipes = Recipe.objects.previews_by_author(
+            [follow.author_id for follow in pages],
+            get_recipes_limit(request),
+        )
         serializer = FollowSerializer(
-            pages, many=True, context={'request': request}
+            pages, many=True,
+            context={'request': request, 'recipes': recipes},
+        )
+        with timed_serialization():
+            data = serializer.data
+        return self.get_paginated_response(data)
+
+
+def metrics(request):
+    """
+    Метрики API в текстовом формате Prometheus. Доступны по заголовку
+    `Authorization: Bearer <METRICS_TOKEN>` или администратору.
+    """
+    token = request.headers.get('Authorization', '')
+    allowed = request.user.is_staff or (
+        settings.METRICS_TOKEN and hmac.compare_digest(
+            token, f'Bearer {settings.METRICS_TOKEN}'
         )
-        return self.get_paginated_response(serializer.data)
+    )
+    if not allowed:
+        return HttpResponse(status=HTTPStatus.FORBIDDEN)
+    return HttpResponse(
+        registry.render(), content_type='text/plain; version=0.0.4'
+    )
@@ -1,3 +1,4 @@
+import json
 import os
 from pathlib import Path
 
@@ -34,11 +35,12 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api.middleware.InstrumentationMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.middleware.common.CommonMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'api.middleware.ReplicaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -63,15 +65,138 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'foodgram.wsgi.application'
 
+# CONN_HEALTH_CHECKS - как в Django 4.1: постоянное соединение проверяется
+# при первом обращении к базе в новом запросе, DB_CONN_HEALTH_CHECKS=true.
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'api.backends.postgresql',
         'NAME': os.getenv('POSTGRES_DB', 'postgres'),
         'USER': os.getenv('POSTGRES_USER', 'darwin'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', 'Darwin228'),
         'HOST': os.getenv('DB_HOST', 'db'),
         'PORT': os.getenv('DB_PORT', 5432),
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': (
+            os.getenv('DB_CONN_HEALTH_CHECKS', 'false').lower() == 'true'
+        ),
+    }
+}
+
+# Пул соединений процесса вместо постоянных соединений: DB_POOL_SIZE=10
+if os.getenv('DB_POOL_SIZE'):
+    DATABASES['default'].update({
+        'ENGINE': 'api.backends.pooled_postgresql',
+        'CONN_MAX_AGE': 0,
+        'OPTIONS': {'POOL': {
+            'MAX_SIZE': int(os.getenv('DB_POOL_SIZE')),
+            'TIMEOUT': int(os.getenv('DB_POOL_TIMEOUT', 30)),
+        }},
+    })
+
+# Реплики для чтения - отдельные базы, JSON-список их настроек:
+# DB_REPLICAS='[{"HOST": "replica1", "NAME": "foodgram"}]', для разработки
+# на SQLite: '[{"ENGINE": "django.db.backends.sqlite3", "NAME": "r.sqlite3"}]'.
+# Не заданные USER, PASSWORD, PORT, CONN_MAX_AGE и CONN_HEALTH_CHECKS
+# берутся из default.
+REPLICA_DATABASES = []
+for number, replica in enumerate(json.loads(os.getenv('DB_REPLICAS', '[]'))):
+    alias = f'replica{number}'
+    DATABASES[alias] = {
+        'ENGINE': 'api.backends.postgresql',
+        **{
+            key: DATABASES['default'][key]
+            for key in (
+                'USER', 'PASSWORD', 'PORT', 'CONN_MAX_AGE',
+                'CONN_HEALTH_CHECKS',
+            )
+        },
+        **replica,
+        'TEST': {'MIRROR': 'default'},
     }
+    REPLICA_DATABASES.append(alias)
+
+DATABASE_ROUTERS = ['api.replicas.ReplicaRouter']
+REPLICA_VIEWS = (
+    'api.views.RecipesViewSet',
+    'api.views.TagsViewSet',
+    'api.views.IngredientsViewSet',
+    'api.views.FollowViewSet',
+)
+REPLICA_PIN_COOKIE = 'primary_pin'
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', 5))
+
+# Общий кэш воркеров и команд управления: поколения кэша, увеличенные
+# в одном процессе, должны видеть все. LocMemCache подходит только для
+# разработки в одном процессе:
+# CACHE_BACKEND=django.core.cache.backends.locmem.LocMemCache
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.memcached.PyMemcacheCache',
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'memcached:11211'),
+    }
+}
+
+RECIPES_CACHE_ALIAS = 'default'
+RECIPES_CACHE_TIMEOUT = int(os.getenv('RECIPES_CACHE_TIMEOUT', 300))
+PAGINATION_COUNT_CACHE_TIMEOUT = 30
+SUBSCRIPTION_RECIPES_LIMIT = 10
+BULK_RECIPES_LIMIT = 100
+
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv('AUTH_TOKEN_CACHE_SIZE', 10000))
+AUTH_TOKEN_CACHE_TTL = int(os.getenv('AUTH_TOKEN_CACHE_TTL', 30))
+AUTH_TOKEN_SHARED_CACHE = os.getenv('AUTH_TOKEN_SHARED_CACHE') or None
+
+RECIPE_IMAGE_EXECUTOR = os.getenv(
+    'RECIPE_IMAGE_EXECUTOR', 'recipes.images.ThreadExecutor'
+)
+RECIPE_IMAGE_WORKERS = int(os.getenv('RECIPE_IMAGE_WORKERS', 2))
+RECIPE_IMAGE_MAX_SIZE = 10 * 1024 * 1024
+RECIPE_IMAGE_VARIANTS = {
+    'thumbnail': (160, 160),
+    'card': (480, 480),
+    'full': (1280, 1280),
+}
+RECIPE_IMAGE_FORMATS = ('webp', 'jpeg')
+RECIPE_IMAGE_QUALITY = 82
+
+TRENDING_HALF_LIFE_HOURS = float(os.getenv('TRENDING_HALF_LIFE_HOURS', 72))
+TRENDING_WINDOW_DAYS = int(os.getenv('TRENDING_WINDOW_DAYS', 14))
+TRENDING_FAVORITE_WEIGHT = 1.0
+TRENDING_CART_WEIGHT = 0.5
+
+SHOPPING_LIST_RENDERERS = [
+    'api.renderers.TextShoppingListRenderer',
+    'api.renderers.CSVShoppingListRenderer',
+    'api.renderers.JSONShoppingListRenderer',
+    'api.renderers.PDFShoppingListRenderer',
+]
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    'SHOPPING_LIST_PDF_FONT',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+)
+SHOPPING_LIST_CHUNK_SIZE = 2000
+
+INGREDIENT_SEARCH_BACKEND = os.getenv('INGREDIENT_SEARCH_BACKEND', 'auto')
+INGREDIENT_SEARCH_LIMIT = 20
+
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', 200))
+REPEATED_QUERY_THRESHOLD = int(os.getenv('REPEATED_QUERY_THRESHOLD', 20))
+SLOW_QUERY_STACK_DEPTH = 8
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'foodgram.queries': {'handlers': ['console'], 'level': 'WARNING'},
+        'foodgram.images': {'handlers': ['console'], 'level': 'WARNING'},
+    },
 }
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -115,7 +240,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ),
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
@@ -124,6 +249,10 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
     'DEFAULT_PAGINATION_CLASS': 'api.paginations.LimitPageNumberPagination',
+    'DEFAULT_RENDERER_CLASSES': (
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
     'PAGE_SIZE': 6,
 }
 
@@ -131,6 +260,7 @@ DJOSER = {
     'LOGIN_FIELD': 'email',
     'HIDE_USERS': False,
     'PASSWORD_CHANGED_EMAIL_CONFIRMATION': False,
+    'LOGOUT_ON_PASSWORD_CHANGE': True,
     'TOKEN_MODEL': 'rest_framework.authtoken.models.Token',
     'SERIALIZERS': {
         'user_create': 'api.serializers.CustomUserCreateSerializer',
@@ -1,8 +1,7 @@
 from django.contrib import admin
-from django.db.models import Count
 
 from .models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
-                     ShoppingBasket, Tag)
+                     ShoppingBasket, ShoppingCartIngredient, Tag)
 
 
 @admin.register(Ingredient)
@@ -13,10 +12,12 @@ class IngredientAdmin(admin.ModelAdmin):
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('name', 'pk', 'author', 'number_of_favorites', 'created')
+    list_display = ('name', 'pk', 'author', 'number_of_favorites',
+                    'in_carts_count', 'created')
     list_filter = ('author', 'tags')
     search_fields = ('name',)
 
+    @admin.display(ordering='favorites_count')
     def number_of_favorites(self, obj):
         return obj.favorites_count
 
@@ -25,7 +26,6 @@ class RecipeAdmin(admin.ModelAdmin):
             super().get_queryset(request)
             .select_related('author')
             .prefetch_related('tags', 'ingredients')
-            .annotate(favorites_count=Count('favorites'))
         )
 
 
@@ -65,3 +65,16 @@ class FavoriteAdmin(admin.ModelAdmin):
         queryset = super().get_queryset(request)
         queryset = queryset.select_related('user', 'recipe')
         return queryset
+
+
+@admin.register(ShoppingCartIngredient)
+class ShoppingCartIngredientAdmin(admin.ModelAdmin):
+    list_display = ('user', 'pk', 'ingredient', 'total_amount')
+    list_display_links = ['user', 'ingredient']
+    search_fields = ('user__username', 'ingredient__name')
+
+    def get_queryset(self, request):
+        return (
+            super().get_queryset(request)
+            .select_related('user', 'ingredient')
+        )
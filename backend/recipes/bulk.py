@@ -0,0 +1,139 @@
+"""
+Добавление и удаление набора рецептов в избранном и списке покупок.
+
+Записи создаются одной вставкой без сигналов на каждую запись,
+а удаляются с отложенными счётчиками, поэтому счётчики рецептов
+и агрегат списка покупок обновляются здесь же, одним запросом на весь
+набор.
+"""
+from django.db import connections, router
+from django.db.models import Sum
+from django.utils import timezone
+
+from .counters import COUNTERS, adjust
+from .models import (IngredientInRecipe, Recipe, ShoppingBasket,
+                     ShoppingCartIngredient)
+from .signals import deferred_counters
+
+CREATED = 'created'
+EXISTS = 'exists'
+DELETED = 'deleted'
+NOT_FOUND = 'not_found'
+
+
+def recipes_amounts(recipe_ids):
+    """Суммарное количество каждого ингредиента в наборе рецептов."""
+    return dict(
+        IngredientInRecipe.objects.filter(recipe_id__in=recipe_ids)
+        .values('ingredient_id')
+        .annotate(total=Sum('amount'))
+        .order_by()
+        .values_list('ingredient_id', 'total')
+    )
+
+
+def adjust_counters(model, recipe_ids, delta):
+    """Счётчик избранного или списков покупок у рецептов."""
+    for counter in COUNTERS:
+        if counter.related_model is model and recipe_ids:
+            adjust(Recipe, recipe_ids, counter.field, delta)
+
+
+def update_cart(user, recipe_ids, delta):
+    """Агрегат ингредиентов списка покупок пользователя."""
+    if recipe_ids:
+        ShoppingCartIngredient.objects.apply(
+            [user.id],
+            {
+                pk: amount * delta
+                for pk, amount in recipes_amounts(recipe_ids).items()
+            },
+        )
+
+
+def insert_rows(model, user, recipe_ids):
+    """
+    Вставка записей пользователя с пропуском существующих. Возвращает
+    id рецептов, записи которых вставлены этим запросом: запись,
+    добавленную параллельным запросом, не учитывают ни счётчики, ни
+    агрегат. Без RETURNING (SQLite) - все переданные id.
+    """
+    if not recipe_ids:
+        return []
+    connection = connections[router.db_for_write(model)]
+    if not connection.features.can_return_rows_from_bulk_insert:
+        model.objects.bulk_create(
+            [model(user=user, recipe_id=pk) for pk in recipe_ids],
+            ignore_conflicts=True,
+        )
+        return recipe_ids
+    opts = model._meta
+    columns = [
+        opts.get_field(name).column for name in ('user', 'recipe', 'created')
+    ]
+    quote = connection.ops.quote_name
+    now = timezone.now()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote(opts.db_table)} '
+            f'({", ".join(map(quote, columns))}) '
+            f'VALUES {", ".join(["(%s, %s, %s)"] * len(recipe_ids))} '
+            f'ON CONFLICT ({quote(columns[0])}, {quote(columns[1])}) '
+            f'DO NOTHING RETURNING {quote(columns[1])}',
+            [value for pk in recipe_ids for value in (user.pk, pk, now)],
+        )
+        inserted = {pk for pk, in cursor.fetchall()}
+    return [pk for pk in recipe_ids if pk in inserted]
+
+
+def add_recipes(model, user, recipe_ids):
+    """
+    Добавление рецептов в избранное или список покупок пользователя.
+    Вызывается в транзакции, возвращает {id рецепта: результат}.
+    """
+    recipe_ids = list(dict.fromkeys(recipe_ids))
+    found = set(
+        Recipe.objects.filter(pk__in=recipe_ids).values_list('pk', flat=True)
+    )
+    existing = set(
+        model.objects.filter(user=user, recipe_id__in=found)
+        .values_list('recipe_id', flat=True)
+    )
+    added = insert_rows(
+        model, user, [pk for pk in recipe_ids if pk in found - existing]
+    )
+    new = set(added)
+    adjust_counters(model, added, 1)
+    if model is ShoppingBasket:
+        update_cart(user, added, 1)
+    return {
+        pk: CREATED if pk in new else EXISTS if pk in found else NOT_FOUND
+        for pk in recipe_ids
+    }
+
+
+def remove_recipes(model, user, recipe_ids=None):
+    """
+    Удаление рецептов из избранного или списка покупок пользователя,
+    без recipe_ids - всех. Вызывается в транзакции, возвращает
+    {id рецепта: результат}.
+    """
+    rows = model.objects.filter(user=user)
+    if recipe_ids is not None:
+        recipe_ids = list(dict.fromkeys(recipe_ids))
+        rows = rows.filter(recipe_id__in=recipe_ids)
+    removed = set(
+        rows.select_for_update().values_list('recipe_id', flat=True)
+    )
+    with deferred_counters():
+        rows.delete()
+    adjust_counters(model, list(removed), -1)
+    if model is ShoppingBasket and recipe_ids is None:
+        ShoppingCartIngredient.objects.filter(user=user).delete()
+    elif model is ShoppingBasket:
+        update_cart(user, list(removed), -1)
+    if recipe_ids is None:
+        recipe_ids = sorted(removed)
+    return {
+        pk: DELETED if pk in removed else NOT_FOUND for pk in recipe_ids
+    }
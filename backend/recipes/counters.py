@@ -0,0 +1,48 @@
+"""
+Денормализованные счётчики: избранное и списки покупок у рецепта,
+подписчики и рецепты у пользователя. Обновляются атомарно через F()
+при создании и удалении связанных записей, расхождения исправляет
+команда reconcile_counters.
+"""
+from collections import namedtuple
+
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from users.models import Follow, User
+
+from .models import Favorite, Recipe, ShoppingBasket
+
+Counter = namedtuple(
+    'Counter', ('model', 'field', 'related_model', 'related_field')
+)
+
+COUNTERS = (
+    Counter(Recipe, 'favorites_count', Favorite, 'recipe'),
+    Counter(Recipe, 'in_carts_count', ShoppingBasket, 'recipe'),
+    Counter(User, 'followers_count', Follow, 'author'),
+    Counter(User, 'recipes_count', Recipe, 'author'),
+)
+
+
+def adjust(model, pks, field, delta):
+    """Изменение счётчика на delta у объектов с заданными pk."""
+    return model.objects.filter(pk__in=pks).update(
+        **{field: Greatest(F(field) + delta, Value(0))}
+    )
+
+
+def actual_count(counter):
+    """Подзапрос с фактическим значением счётчика."""
+    related = counter.related_field
+    return Coalesce(
+        Subquery(
+            counter.related_model.objects
+            .filter(**{related: OuterRef('pk')})
+            .order_by()
+            .values(related)
+            .annotate(total=Count('pk'))
+            .values('total')
+        ),
+        Value(0),
+    )
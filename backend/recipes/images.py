@@ -0,0 +1,168 @@
+"""
+Обработка картинок рецептов вне запроса.
+
+Загруженный файл записывается в хранилище после фиксации транзакции,
+затем исполнитель из RECIPE_IMAGE_EXECUTOR строит уменьшенные копии
+из RECIPE_IMAGE_VARIANTS во всех RECIPE_IMAGE_FORMATS без метаданных.
+Пути копий сохраняются в Recipe.image_variants:
+{'card': {'webp': 'recipes/variants/...', 'jpeg': ...}, ...}.
+"""
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.utils.module_loading import import_string
+from PIL import Image, ImageOps
+
+from .models import Recipe
+from .signals import RecipeChanges, recipe_changed
+
+logger = logging.getLogger('foodgram.images')
+
+FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG'}
+
+
+class SyncExecutor:
+    """Обработка сразу в текущем потоке: для тестов и разработки."""
+
+    def submit(self, function, *args):
+        function(*args)
+
+
+class ThreadExecutor:
+    """Пул потоков процесса, размер - RECIPE_IMAGE_WORKERS."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pool = None
+
+    def submit(self, function, *args):
+        with self.lock:
+            if self.pool is None:
+                self.pool = ThreadPoolExecutor(
+                    max_workers=settings.RECIPE_IMAGE_WORKERS,
+                    thread_name_prefix='recipe-images',
+                )
+        self.pool.submit(self.run, function, *args)
+
+    @staticmethod
+    def run(function, *args):
+        close_old_connections()
+        try:
+            function(*args)
+        except Exception:
+            logger.exception('Ошибка обработки картинки рецепта %s', args)
+        finally:
+            close_old_connections()
+
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = import_string(settings.RECIPE_IMAGE_EXECUTOR)()
+    return _executor
+
+
+def render_variant(image, size, file_format):
+    """Уменьшенная копия без EXIF и других метаданных."""
+    variant = image.copy()
+    variant.thumbnail(size, Image.LANCZOS)
+    content = io.BytesIO()
+    variant.save(
+        content, FORMATS[file_format],
+        quality=settings.RECIPE_IMAGE_QUALITY, optimize=True,
+    )
+    return content.getvalue()
+
+
+def render_variants(source):
+    storage = Recipe._meta.get_field('image').storage
+    with storage.open(source) as file:
+        image = ImageOps.exif_transpose(Image.open(file))
+        image = image.convert('RGB')
+    variants = {}
+    for name, size in settings.RECIPE_IMAGE_VARIANTS.items():
+        variants[name] = {}
+        for file_format in settings.RECIPE_IMAGE_FORMATS:
+            variants[name][file_format] = storage.save(
+                f'recipes/variants/{name}.{file_format}',
+                ContentFile(render_variant(image, size, file_format)),
+            )
+    return variants
+
+
+def generate_variants(recipe_pk, source):
+    """
+    Копии картинки source рецепта. Копии той же картинки у другого
+    рецепта используются повторно. Если картинку успели заменить,
+    результат не записывается.
+    """
+    variants = (
+        Recipe.objects.filter(image=source)
+        .exclude(image_variants={})
+        .values_list('image_variants', flat=True)
+        .first()
+    ) or render_variants(source)
+    updated = Recipe.objects.filter(pk=recipe_pk, image=source).update(
+        image_variants=variants
+    )
+    if updated:
+        notify_image_changed(recipe_pk, 'image_variants')
+
+
+def notify_image_changed(recipe_pk, field):
+    recipe = Recipe.objects.get(pk=recipe_pk)
+    tags = set(recipe.tags.values_list('slug', flat=True))
+    recipe_changed.send(
+        sender=Recipe, recipe=recipe,
+        changes=RecipeChanges(
+            fields={field}, ingredients={}, tags=tags,
+            tags_added=set(), tags_removed=set(),
+        ),
+    )
+
+
+def store_image(recipe, upload):
+    """
+    Запись загруженной картинки после фиксации транзакции и постановка
+    построения копий в очередь.
+    """
+
+    def store():
+        previous = recipe.image.name
+        recipe.image.save(upload.name, upload, save=False)
+        upload.close()
+        if recipe.image.name == previous and recipe.image_variants:
+            return
+        recipe.image_variants = {}
+        Recipe.objects.filter(pk=recipe.pk).update(
+            image=recipe.image.name, image_variants={}
+        )
+        notify_image_changed(recipe.pk, 'image')
+        get_executor().submit(generate_variants, recipe.pk, recipe.image.name)
+
+    transaction.on_commit(store)
+
+
+def image_url(image, variants, variant, file_format='jpeg'):
+    """Путь к копии картинки, пока копий нет - к исходной картинке."""
+    storage = Recipe._meta.get_field('image').storage
+    path = variants.get(variant, {}).get(file_format)
+    if path:
+        return storage.url(path)
+    if image:
+        return storage.url(image)
+    return None
+
+
+def variant_url(recipe, variant, file_format='jpeg'):
+    return image_url(
+        recipe.image.name, recipe.image_variants, variant, file_format
+    )
@@ -0,0 +1,58 @@
+import posixpath
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаление файлов картинок рецептов, на которые не ссылается ни '
+        'один рецепт (ни как на картинку, ни как на её копию).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать файлы, которые будут удалены.',
+        )
+        parser.add_argument(
+            '--min-age', type=int, default=60,
+            help='Не трогать файлы моложе стольких минут (по умолчанию 60).',
+        )
+
+    def handle(self, *args, **options):
+        storage = Recipe._meta.get_field('image').storage
+        referenced = set()
+        for image, variants in Recipe.objects.values_list(
+            'image', 'image_variants'
+        ).iterator():
+            referenced.add(image)
+            for formats in variants.values():
+                referenced.update(formats.values())
+        deadline = time.time() - options['min_age'] * 60
+        removed = size = 0
+        for name in self.walk(storage, 'recipes'):
+            if name in referenced:
+                continue
+            if storage.get_modified_time(name).timestamp() > deadline:
+                continue
+            size += storage.size(name)
+            removed += 1
+            self.stdout.write(name)
+            if not options['dry_run']:
+                storage.delete(name)
+        action = 'Будет удалено' if options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} файлов: {removed}, {size / 1024 / 1024:.1f} МБ'
+        ))
+
+    def walk(self, storage, directory):
+        if not storage.exists(directory):
+            return
+        directories, files = storage.listdir(directory)
+        for name in files:
+            yield posixpath.join(directory, name)
+        for name in directories:
+            yield from self.walk(storage, posixpath.join(directory, name))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from recipes.images import generate_variants
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        'Построение уменьшенных копий картинок рецептов, например для '
+        'рецептов, загруженных до появления копий.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Пересобрать копии и у рецептов, где они уже есть.',
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='')
+        if not options['all']:
+            recipes = recipes.filter(image_variants={})
+        done = 0
+        for pk, image in recipes.values_list('pk', 'image').iterator():
+            try:
+                generate_variants(pk, image)
+            except (OSError, ValueError) as error:
+                self.stderr.write(f'Рецепт {pk}: {error}')
+                continue
+            done += 1
+        self.stdout.write(self.style.SUCCESS(f'Обработано рецептов: {done}'))
@@ -0,0 +1,215 @@
+import csv
+import io
+import json
+import time
+from collections import namedtuple
+from itertools import islice
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from api.cache import CATALOG, INGREDIENTS, TAGS, bump
+from recipes.models import Ingredient, Tag
+
+Catalog = namedtuple('Catalog', ('model', 'fields', 'key', 'scopes'))
+
+CATALOGS = {
+    'ingredients': Catalog(
+        Ingredient, ('name', 'measurement_unit'), ('name', 'measurement_unit'),
+        (CATALOG, INGREDIENTS),
+    ),
+    'tags': Catalog(
+        Tag, ('name', 'color', 'slug'), ('slug',), (CATALOG, TAGS)
+    ),
+}
+JSON_CHUNK_SIZE = 64 * 1024
+
+
+def read_csv(file, fields):
+    for row in csv.reader(file):
+        if [value.strip() for value in row] == list(fields):
+            continue
+        yield dict(zip(fields, row))
+
+
+def read_jsonl(file, fields):
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+def read_json(file, fields):
+    """Потоковое чтение JSON-массива объектов без загрузки файла целиком."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    started = False
+    for chunk in iter(lambda: file.read(JSON_CHUNK_SIZE), ''):
+        buffer += chunk
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if not started and buffer[position:position + 1] == '[':
+                started = True
+                position += 1
+                continue
+            if buffer[position:position + 1] == ']':
+                return
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                break
+            yield item
+        buffer = buffer[position:]
+    if buffer.strip():
+        raise CommandError('Некорректный JSON: файл оборван.')
+
+
+READERS = {'csv': read_csv, 'json': read_json, 'jsonl': read_jsonl}
+
+
+class Command(BaseCommand):
+    help = (
+        'Загрузка справочника ингредиентов (или тегов) из CSV, JSON или '
+        'JSONL пакетами с пропуском дубликатов. На PostgreSQL '
+        'ингредиенты загружаются через COPY.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?',
+            help='Файл справочника, по умолчанию data/ingredients.csv.',
+        )
+        parser.add_argument(
+            '--model', choices=CATALOGS, default='ingredients'
+        )
+        parser.add_argument(
+            '--format', choices=READERS,
+            help='Формат файла, по умолчанию - по расширению.',
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Выполнить загрузку и откатить транзакцию.',
+        )
+        parser.add_argument(
+            '--no-copy', action='store_true',
+            help='Не использовать COPY даже на PostgreSQL.',
+        )
+
+    def handle(self, *args, **options):
+        catalog = CATALOGS[options['model']]
+        path = self.get_path(options['path'])
+        file_format = options['format'] or path.suffix.lstrip('.').lower()
+        if file_format not in READERS:
+            raise CommandError(f'Неизвестный формат файла: {file_format}')
+        use_copy = (
+            not options['no_copy']
+            and connection.vendor == 'postgresql'
+            and catalog.fields == catalog.key
+        )
+        started = time.perf_counter()
+        model = catalog.model
+        with open(path, encoding='utf-8') as file, transaction.atomic():
+            before = model.objects.count()
+            rows = self.unique_rows(
+                READERS[file_format](file, catalog.fields), catalog
+            )
+            read = 0
+            while True:
+                batch = list(islice(rows, options['batch_size']))
+                if not batch:
+                    break
+                read += len(batch)
+                if use_copy:
+                    self.copy_batch(catalog, batch)
+                else:
+                    self.save_batch(catalog, batch)
+                self.stdout.write(
+                    f'Обработано {read}, '
+                    f'{time.perf_counter() - started:.1f} с'
+                )
+            created = model.objects.count() - before
+            if options['dry_run']:
+                transaction.set_rollback(True)
+            else:
+                transaction.on_commit(lambda: bump(*catalog.scopes))
+        self.stdout.write(self.style.SUCCESS(
+            f'{"Проверено" if options["dry_run"] else "Загружено"}: '
+            f'{read} уникальных записей, новых {created}, '
+            f'за {time.perf_counter() - started:.1f} с'
+        ))
+
+    def get_path(self, path):
+        if path:
+            return Path(path)
+        for directory in (settings.BASE_DIR, settings.BASE_DIR.parent):
+            default = directory / 'data' / 'ingredients.csv'
+            if default.exists():
+                return default
+        raise CommandError('Файл data/ingredients.csv не найден.')
+
+    def unique_rows(self, items, catalog):
+        """Очистка значений и пропуск повторов по ключу справочника."""
+        seen = set()
+        for number, item in enumerate(items, start=1):
+            try:
+                row = tuple(str(item[field]).strip()
+                            for field in catalog.fields)
+            except (KeyError, TypeError):
+                raise CommandError(f'Запись {number}: ожидаются поля '
+                                   f'{", ".join(catalog.fields)}.')
+            key = tuple(
+                value for field, value in zip(catalog.fields, row)
+                if field in catalog.key
+            )
+            if all(row) and key not in seen:
+                seen.add(key)
+                yield row
+
+    def save_batch(self, catalog, batch):
+        model = catalog.model
+        objects = [model(**dict(zip(catalog.fields, row))) for row in batch]
+        if catalog.fields == catalog.key:
+            model.objects.bulk_create(objects, ignore_conflicts=True)
+            return
+        key, = catalog.key
+        existing = model.objects.in_bulk(
+            [getattr(obj, key) for obj in objects], field_name=key
+        )
+        updated = []
+        for obj in objects:
+            current = existing.get(getattr(obj, key))
+            if current is not None:
+                for field in catalog.fields:
+                    setattr(current, field, getattr(obj, field))
+                updated.append(current)
+        model.objects.bulk_update(updated, catalog.fields)
+        created = [
+            obj for obj in objects if getattr(obj, key) not in existing
+        ]
+        model.objects.bulk_create(created)
+
+    def copy_batch(self, catalog, batch):
+        """Пакет через COPY во временную таблицу и INSERT ON CONFLICT."""
+        table = catalog.model._meta.db_table
+        columns = ', '.join(catalog.fields)
+        content = io.StringIO()
+        csv.writer(content).writerows(batch)
+        content.seek(0)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMPORARY TABLE IF NOT EXISTS load_{table} '
+                f'ON COMMIT DROP AS SELECT {columns} FROM {table} WITH NO DATA'
+            )
+            cursor.execute(f'TRUNCATE load_{table}')
+            cursor.cursor.copy_expert(
+                f'COPY load_{table} ({columns}) FROM STDIN WITH CSV', content
+            )
+            cursor.execute(
+                f'INSERT INTO {table} ({columns}) '
+                f'SELECT {columns} FROM load_{table} '
+                f'ON CONFLICT ({", ".join(catalog.key)}) DO NOTHING'
+            )
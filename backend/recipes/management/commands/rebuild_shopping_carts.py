@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.models import ShoppingCartIngredient
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересборка агрегата ингредиентов списков покупок с нуля '
+        'или проверка его расхождений с рецептами в корзинах.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Только сравнить агрегат с пересчётом, ничего не меняя.',
+        )
+        parser.add_argument(
+            '--user', type=int, action='append', dest='users',
+            help='id пользователя, можно указать несколько раз.',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        users = options['users']
+        if options['verify']:
+            return self.verify(users)
+        with transaction.atomic():
+            ShoppingCartIngredient.objects.rebuild(
+                users, batch_size=options['batch_size']
+            )
+        self.stdout.write(self.style.SUCCESS('Агрегат пересобран.'))
+
+    def verify(self, users):
+        expected = {
+            (row['user'], row['ingredient']): row['total']
+            for row in ShoppingCartIngredient.objects.expected(users)
+        }
+        actual = ShoppingCartIngredient.objects.all()
+        if users is not None:
+            actual = actual.filter(user__in=users)
+        actual = {
+            (user, ingredient): total
+            for user, ingredient, total in actual.values_list(
+                'user', 'ingredient', 'total_amount'
+            )
+        }
+        mismatches = sorted(
+            key for key in expected.keys() | actual.keys()
+            if expected.get(key) != actual.get(key)
+        )
+        for user, ingredient in mismatches:
+            self.stdout.write(
+                f'user={user} ingredient={ingredient}: '
+                f'ожидается {expected.get((user, ingredient), 0)}, '
+                f'в агрегате {actual.get((user, ingredient), 0)}'
+            )
+        if mismatches:
+            raise CommandError(f'Расхождений: {len(mismatches)}.')
+        self.stdout.write(self.style.SUCCESS('Расхождений нет.'))
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+
+from recipes.counters import COUNTERS, actual_count
+
+
+class Command(BaseCommand):
+    help = (
+        'Проверка денормализованных счётчиков рецептов и пользователей '
+        'и исправление расхождений.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать расхождения, ничего не меняя.',
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        for counter in COUNTERS:
+            with transaction.atomic():
+                drift = list(
+                    counter.model.objects
+                    .annotate(actual=actual_count(counter))
+                    .exclude(**{counter.field: F('actual')})
+                    .values_list('pk', counter.field, 'actual')
+                )
+                for pk, stored, actual in drift:
+                    self.stdout.write(
+                        f'{counter.model.__name__}({pk}).{counter.field}: '
+                        f'{stored}, фактически {actual}'
+                    )
+                if drift and not options['dry_run']:
+                    counter.model.objects.filter(
+                        pk__in=[pk for pk, _, _ in drift]
+                    ).update(**{counter.field: actual_count(counter)})
+            total += len(drift)
+        if not total:
+            self.stdout.write(self.style.SUCCESS('Расхождений нет.'))
+        elif options['dry_run']:
+            self.stdout.write(f'Расхождений: {total}.')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Исправлено: {total}.'))
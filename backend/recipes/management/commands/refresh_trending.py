@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.cache import RANKING, bump
+from recipes.ranking import refresh_trending
+
+
+class Command(BaseCommand):
+    help = (
+        'Обновление рейтинга trending по добавлениям в избранное и списки '
+        'покупок с прошлого запуска. Запускается периодически, например '
+        'из cron.'
+    )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        with transaction.atomic():
+            updated = refresh_trending()
+            transaction.on_commit(lambda: bump(RANKING))
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено рейтингов: {updated}, '
+            f'за {time.perf_counter() - started:.1f} с'
+        ))
@@ -0,0 +1,55 @@
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    """Слияние одинаковых ингредиентов перед уникальным ограничением."""
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    IngredientInRecipe = apps.get_model('recipes', 'IngredientInRecipe')
+    ShoppingCartIngredient = apps.get_model(
+        'recipes', 'ShoppingCartIngredient'
+    )
+    groups = (
+        Ingredient.objects.values('name', 'measurement_unit')
+        .annotate(count=Count('id'), keep=Min('id'))
+        .filter(count__gt=1)
+        .order_by()
+    )
+    for group in groups:
+        duplicates = list(
+            Ingredient.objects.filter(
+                name=group['name'],
+                measurement_unit=group['measurement_unit'],
+            ).exclude(id=group['keep']).values_list('id', flat=True)
+        )
+        for model, owner, field in (
+            (IngredientInRecipe, 'recipe_id', 'amount'),
+            (ShoppingCartIngredient, 'user_id', 'total_amount'),
+        ):
+            for row in model.objects.filter(ingredient_id__in=duplicates):
+                kept, created = model.objects.get_or_create(
+                    ingredient_id=group['keep'],
+                    defaults={field: getattr(row, field)},
+                    **{owner: getattr(row, owner)},
+                )
+                if not created:
+                    setattr(
+                        kept, field,
+                        getattr(kept, field) + getattr(row, field),
+                    )
+                    kept.save(update_fields=[field])
+                row.delete()
+        Ingredient.objects.filter(id__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_ingredient_name_trgm'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 3.2 on 2026-10-17 06:12
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+COUNTERS = (
+    ('recipes', 'Recipe', 'favorites_count', 'recipes', 'Favorite', 'recipe'),
+    ('recipes', 'Recipe', 'in_carts_count',
+     'recipes', 'ShoppingBasket', 'recipe'),
+    ('users', 'User', 'followers_count', 'users', 'Follow', 'author'),
+    ('users', 'User', 'recipes_count', 'recipes', 'Recipe', 'author'),
+)
+
+
+def fill_counters(apps, schema_editor):
+    for app, model, field, related_app, related_model, related in COUNTERS:
+        model = apps.get_model(app, model)
+        related_model = apps.get_model(related_app, related_model)
+        model.objects.update(**{field: Coalesce(
+            Subquery(
+                related_model.objects
+                .filter(**{related: OuterRef('pk')})
+                .order_by()
+                .values(related)
+                .annotate(total=Count('pk'))
+                .values('total')
+            ),
+            Value(0),
+        )})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_ingredient_unique'),
+        ('users', '0002_user_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False, verbose_name='В избранном'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В списках покупок'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
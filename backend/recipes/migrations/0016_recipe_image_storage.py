@@ -0,0 +1,20 @@
+# Generated by Django 3.2 on 2026-10-17 06:19
+
+from django.db import migrations, models
+
+import recipes.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0015_recipe_image_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(blank=True, storage=recipes.storage.recipe_image_storage, upload_to='recipes/', verbose_name='Фотография'),
+        ),
+    ]
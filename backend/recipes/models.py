@@ -1,6 +1,14 @@
+from collections import defaultdict
+from itertools import islice
+
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator, RegexValidator
 from django.db import models
+from django.db.models import (BooleanField, Case, Exists, F, IntegerField,
+                              OuterRef, Prefetch, Sum, Value, When, Window)
+from django.db.models.functions import RowNumber
+
+from .storage import recipe_image_storage
 
 User = get_user_model()
 
@@ -16,6 +24,12 @@ class Ingredient(models.Model):
         verbose_name = "Ингредиент"
         verbose_name_plural = "Ингредиенты"
         ordering = ("name",)
+        constraints = (
+            models.UniqueConstraint(
+                fields=("name", "measurement_unit"),
+                name="unique_ingredient",
+            ),
+        )
 
     def __str__(self):
         return f"{self.name}, {self.measurement_unit}."
@@ -55,19 +69,89 @@ class Tag(models.Model):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+    """Планирование запросов для чтения рецептов."""
+
+    def with_user_flags(self, user):
+        """Аннотация избранного, списка покупок и подписки на автора."""
+        if user.is_anonymous:
+            return self.annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(False, output_field=BooleanField()),
+                is_subscribed=Value(False, output_field=BooleanField()),
+            )
+        return self.annotate(
+            is_favorited=Exists(
+                Favorite.objects.filter(user=user, recipe=OuterRef('pk'))
+            ),
+            is_in_shopping_cart=Exists(
+                ShoppingBasket.objects.filter(user=user, recipe=OuterRef('pk'))
+            ),
+            is_subscribed=Exists(
+                user.follower.filter(author=OuterRef('author'))
+            ),
+        )
+
+    def for_read(self, user):
+        """
+        Рецепты для чтения за постоянное число запросов:
+        автор через join, теги и ингредиенты одним запросом на страницу.
+        """
+        return (
+            self.select_related('author')
+            .prefetch_related('tags', ingredients_prefetch())
+            .with_user_flags(user)
+        )
+
+    def previews_by_author(self, author_ids, limit):
+        """
+        До `limit` последних рецептов каждого автора одним запросом
+        с ROW_NUMBER() OVER (PARTITION BY author_id).
+        """
+        if not author_ids:
+            return {}
+        ranked = self.filter(author_id__in=author_ids).annotate(
+            author_position=Window(
+                RowNumber(),
+                partition_by=F('author_id'),
+                order_by=(F('created').desc(), F('id').desc()),
+            )
+        ).values('id', 'author_id', 'name', 'image', 'image_variants',
+                 'cooking_time', 'author_position')
+        sql, params = ranked.query.sql_with_params()
+        previews = defaultdict(list)
+        for recipe in self.raw(
+            f'SELECT * FROM ({sql}) ranked WHERE author_position <= %s '
+            f'ORDER BY author_id, author_position',
+            (*params, limit),
+        ):
+            previews[recipe.author_id].append(recipe)
+        return previews
+
+
 class Recipe(models.Model):
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
         verbose_name="Автор",
         related_name="recipes",
+        db_index=False,
     )
     name = models.CharField(
         verbose_name="Название",
         max_length=200,
     )
     image = models.ImageField(
-        verbose_name="Фотография", upload_to="recipes/", blank=True
+        verbose_name="Фотография",
+        upload_to="recipes/",
+        storage=recipe_image_storage,
+        blank=True,
+    )
+    image_variants = models.JSONField(
+        verbose_name="Уменьшенные копии фотографии",
+        default=dict,
+        blank=True,
+        editable=False,
     )
     text = models.TextField(verbose_name="Описание")
     ingredients = models.ManyToManyField(
@@ -93,11 +177,30 @@ class Recipe(models.Model):
         auto_now_add=True,
         db_index=True,
     )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name="В избранном",
+        default=0,
+        editable=False,
+        db_index=True,
+    )
+    in_carts_count = models.PositiveIntegerField(
+        verbose_name="В списках покупок",
+        default=0,
+        editable=False,
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Рецепт"
         verbose_name_plural = "Рецепты"
         ordering = ("-created",)
+        indexes = (
+            models.Index(
+                fields=("author", "-created", "-id"),
+                name="recipe_author_created_idx",
+            ),
+        )
 
     def __str__(self):
         return self.name
@@ -115,12 +218,23 @@ class ShoppingBasket(models.Model):
         on_delete=models.CASCADE,
         verbose_name="Рецепт",
         related_name="list",
+        db_index=False,
+    )
+    created = models.DateTimeField(
+        verbose_name="Дата добавления",
+        auto_now_add=True,
+        db_index=True,
     )
 
     class Meta:
         verbose_name = "Список покупок"
         verbose_name_plural = "Списки покупок"
         ordering = ("-id",)
+        indexes = (
+            models.Index(
+                fields=("recipe", "user"), name="basket_recipe_user_idx"
+            ),
+        )
         constraints = [
             models.UniqueConstraint(fields=(
                 "user", "recipe"), name="unique_list_user")
@@ -142,11 +256,22 @@ class Favorite(models.Model):
         on_delete=models.CASCADE,
         verbose_name="Рецепт",
         related_name="favorites",
+        db_index=False,
+    )
+    created = models.DateTimeField(
+        verbose_name="Дата добавления",
+        auto_now_add=True,
+        db_index=True,
     )
 
     class Meta:
         verbose_name = "Избранное"
         verbose_name_plural = "Избранное"
+        indexes = (
+            models.Index(
+                fields=("recipe", "user"), name="favorite_recipe_user_idx"
+            ),
+        )
         constraints = [
             models.UniqueConstraint(fields=["user", "recipe"],
                                     name="unique_favorite")
@@ -188,3 +313,174 @@ class IngredientInRecipe(models.Model):
 
     def __str__(self):
         return f"{self.ingredient} {self.recipe}"
+
+
+class ShoppingCartIngredientQuerySet(models.QuerySet):
+    """Инкрементальное обновление агрегата списков покупок."""
+
+    def apply(self, user_ids, amounts):
+        """
+        Изменение сумм ингредиентов в списках покупок пользователей.
+        amounts - словарь {id ингредиента: изменение количества}.
+        """
+        amounts = {pk: amount for pk, amount in amounts.items() if amount}
+        user_ids = list(user_ids)
+        if not user_ids or not amounts:
+            return
+        self.bulk_create(
+            [
+                self.model(user_id=user_id, ingredient_id=ingredient_id)
+                for user_id in user_ids
+                for ingredient_id, amount in amounts.items()
+                if amount > 0
+            ],
+            ignore_conflicts=True,
+        )
+        rows = self.filter(user_id__in=user_ids, ingredient_id__in=amounts)
+        rows.update(
+            total_amount=F('total_amount') + Case(
+                *(
+                    When(ingredient_id=ingredient_id, then=Value(amount))
+                    for ingredient_id, amount in amounts.items()
+                ),
+                default=Value(0),
+                output_field=IntegerField(),
+            )
+        )
+        rows.filter(total_amount__lte=0).delete()
+
+    def add_recipe(self, user_ids, recipe):
+        """Добавление ингредиентов рецепта в списки покупок."""
+        self.apply(user_ids, recipe_amounts(recipe))
+
+    def remove_recipe(self, user_ids, recipe):
+        """Удаление ингредиентов рецепта из списков покупок."""
+        self.apply(
+            user_ids,
+            {pk: -amount for pk, amount in recipe_amounts(recipe).items()},
+        )
+
+    def expected(self, user_ids=None):
+        """Суммы ингредиентов, посчитанные заново по спискам покупок."""
+        rows = IngredientInRecipe.objects.filter(recipe__list__isnull=False)
+        if user_ids is not None:
+            rows = rows.filter(recipe__list__user__in=user_ids)
+        return (
+            rows.values('ingredient', user=F('recipe__list__user'))
+            .annotate(total=Sum('amount'))
+            .order_by()
+        )
+
+    def rebuild(self, user_ids=None, batch_size=1000):
+        """Пересборка агрегата с нуля."""
+        stale = self.all()
+        if user_ids is not None:
+            stale = stale.filter(user__in=user_ids)
+        stale.delete()
+        rows = self.expected(user_ids).iterator(chunk_size=batch_size)
+        while True:
+            batch = [
+                self.model(
+                    user_id=row['user'],
+                    ingredient_id=row['ingredient'],
+                    total_amount=row['total'],
+                )
+                for row in islice(rows, batch_size)
+            ]
+            if not batch:
+                break
+            self.bulk_create(batch)
+
+
+class ShoppingCartIngredient(models.Model):
+    """Сумма ингредиента по всем рецептам из списка покупок пользователя."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name="Пользователь",
+        related_name="shopping_cart_ingredients",
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        verbose_name="Ингредиент",
+        related_name="shopping_cart_totals",
+    )
+    total_amount = models.IntegerField(
+        verbose_name="Общее количество", default=0
+    )
+
+    objects = ShoppingCartIngredientQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Ингредиент в списке покупок"
+        verbose_name_plural = "Ингредиенты в списках покупок"
+        constraints = [
+            models.UniqueConstraint(
+                fields=("user", "ingredient"),
+                name="unique_shopping_cart_ingredient",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.user} {self.ingredient} {self.total_amount}"
+
+
+def recipe_amounts(recipe):
+    """Количество каждого ингредиента в рецепте."""
+    return dict(
+        IngredientInRecipe.objects.filter(recipe=recipe)
+        .values_list('ingredient_id', 'amount')
+    )
+
+
+def ingredients_prefetch():
+    """Prefetch ингредиентов рецепта вместе с количеством."""
+    return Prefetch(
+        'ingredients_amount',
+        queryset=IngredientInRecipe.objects.select_related(
+            'ingredient'
+        ).order_by('ingredient__name'),
+    )
+
+
+class RecipeRank(models.Model):
+    """
+    Рейтинг рецепта для сортировки trending: сумма весов добавлений
+    в избранное и списки покупок, затухающих со временем. Хранится
+    в масштабе момента RankingState.epoch, поэтому обновление затрагивает
+    только рецепты с новыми событиями.
+    """
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="rank",
+        verbose_name="Рецепт",
+    )
+    score = models.FloatField(verbose_name="Рейтинг", default=0, db_index=True)
+    last_activity = models.DateTimeField(
+        verbose_name="Последнее событие", db_index=True
+    )
+
+    class Meta:
+        verbose_name = "Рейтинг рецепта"
+        verbose_name_plural = "Рейтинги рецептов"
+
+    def __str__(self):
+        return f"{self.recipe_id} {self.score}"
+
+
+class RankingState(models.Model):
+    """Момент отсчёта рейтинга и последние учтённые события."""
+
+    epoch = models.DateTimeField(verbose_name="Момент отсчёта")
+    favorite_id = models.BigIntegerField(default=0)
+    basket_id = models.BigIntegerField(default=0)
+    refreshed = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Состояние рейтинга"
+        verbose_name_plural = "Состояние рейтинга"
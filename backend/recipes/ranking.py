@@ -0,0 +1,101 @@
+"""
+Рейтинг trending.
+
+Событие (добавление в избранное или список покупок) с весом w в момент t
+даёт рецепту w * exp(λ * (t - epoch)), где λ = ln 2 / период полураспада.
+Порядок по такой сумме совпадает с порядком по затухшему рейтингу на
+любой момент, поэтому при обновлении пересчитываются только рецепты
+с новыми событиями. Когда показатель экспоненты становится большим,
+все рейтинги переводятся к новому моменту отсчёта.
+"""
+import math
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Favorite, RankingState, RecipeRank, ShoppingBasket
+
+MAX_EXPONENT = 600
+
+
+def decay_rate():
+    return math.log(2) / (settings.TRENDING_HALF_LIFE_HOURS * 3600)
+
+
+def get_state():
+    state = RankingState.objects.select_for_update().first()
+    if state is None:
+        state = RankingState.objects.create(epoch=timezone.now())
+    return state
+
+
+def rebase(state, now):
+    """Перенос рейтингов к моменту now, чтобы не переполнить float."""
+    factor = math.exp(-decay_rate() * (now - state.epoch).total_seconds())
+    RecipeRank.objects.update(score=F('score') * factor)
+    state.epoch = now
+
+
+def new_events(model, after_id, since):
+    """События после сохранённого id, не старше окна."""
+    return (
+        model.objects.filter(id__gt=after_id, created__gte=since)
+        .order_by('id')
+        .values_list('id', 'recipe_id', 'created')
+    )
+
+
+@transaction.atomic()
+def refresh_trending(now=None):
+    """
+    Учёт событий с прошлого запуска и удаление рейтингов рецептов без
+    событий за окно TRENDING_WINDOW_DAYS. Возвращает число обновлённых
+    рейтингов.
+    """
+    now = now or timezone.now()
+    state = get_state()
+    rate = decay_rate()
+    if rate * (now - state.epoch).total_seconds() > MAX_EXPONENT:
+        rebase(state, now)
+    since = now - timedelta(days=settings.TRENDING_WINDOW_DAYS)
+    scores = defaultdict(float)
+    last_activity = {}
+    for model, field, weight in (
+        (Favorite, 'favorite_id', settings.TRENDING_FAVORITE_WEIGHT),
+        (ShoppingBasket, 'basket_id', settings.TRENDING_CART_WEIGHT),
+    ):
+        for pk, recipe_id, created in new_events(
+            model, getattr(state, field), since
+        ).iterator():
+            scores[recipe_id] += weight * math.exp(
+                rate * (created - state.epoch).total_seconds()
+            )
+            last_activity[recipe_id] = max(
+                created, last_activity.get(recipe_id, created)
+            )
+            setattr(state, field, pk)
+    ranks = RecipeRank.objects.in_bulk(list(scores))
+    new_ranks = []
+    for recipe_id, score in scores.items():
+        rank = ranks.get(recipe_id)
+        if rank is None:
+            new_ranks.append(RecipeRank(
+                recipe_id=recipe_id, score=score,
+                last_activity=last_activity[recipe_id],
+            ))
+            continue
+        rank.score += score
+        rank.last_activity = max(rank.last_activity,
+                                 last_activity[recipe_id])
+    RecipeRank.objects.bulk_update(
+        ranks.values(), ('score', 'last_activity')
+    )
+    RecipeRank.objects.bulk_create(new_ranks)
+    RecipeRank.objects.filter(last_activity__lt=since).delete()
+    state.refreshed = now
+    state.save()
+    return len(scores)
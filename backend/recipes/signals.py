@@ -0,0 +1,177 @@
+from collections import namedtuple
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+
+from .counters import COUNTERS, adjust
+from .models import (IngredientInRecipe, Recipe, ShoppingBasket,
+                     ShoppingCartIngredient)
+
+# Отправляется после записи рецепта через API с аргументами
+# recipe, changes (RecipeChanges) и created.
+recipe_changed = Signal()
+
+bulk_counters = ContextVar('bulk_counters', default=False)
+reported_writes = ContextVar('reported_writes', default=False)
+
+
+class RecipeChanges(namedtuple(
+    'RecipeChanges',
+    ('fields', 'ingredients', 'tags', 'tags_added', 'tags_removed'),
+)):
+    """
+    Что изменилось в рецепте: имена полей, изменения количества
+    {id ингредиента: разница}, слаги текущих, добавленных и удалённых тегов.
+    """
+
+    def __bool__(self):
+        return bool(
+            self.fields or self.ingredients
+            or self.tags_added or self.tags_removed
+        )
+
+    @property
+    def affected_tags(self):
+        return self.tags | self.tags_removed
+
+
+@receiver(recipe_changed, sender=Recipe)
+def update_shopping_carts(sender, recipe, changes, created=False, **kwargs):
+    """Новые количества ингредиентов в списках покупок с этим рецептом."""
+    if created or not changes.ingredients:
+        return
+    ShoppingCartIngredient.objects.apply(
+        recipe.list.values_list('user_id', flat=True), changes.ingredients
+    )
+
+
+def update_recipe_line(recipe_id, ingredient_id, delta):
+    """Изменение строки рецепта в списках покупок, где он есть."""
+    if delta:
+        ShoppingCartIngredient.objects.apply(
+            ShoppingBasket.objects.filter(recipe_id=recipe_id)
+            .values_list('user_id', flat=True),
+            {ingredient_id: delta},
+        )
+
+
+@receiver(pre_save, sender=ShoppingBasket)
+@receiver(pre_save, sender=IngredientInRecipe)
+def remember_previous(sender, instance, raw=False, **kwargs):
+    """Прежнее состояние изменяемой записи для пересчёта агрегата."""
+    instance._previous = None
+    if instance.pk is not None and not raw and not reported_writes.get():
+        instance._previous = sender.objects.filter(pk=instance.pk).first()
+
+
+@receiver(post_save, sender=ShoppingBasket)
+def save_shopping_basket(sender, instance, raw=False, **kwargs):
+    """Рецепт добавлен в список покупок или запись изменена в админке."""
+    if raw:
+        return
+    previous = getattr(instance, '_previous', None)
+    if previous is not None:
+        if (previous.user_id, previous.recipe_id) == (
+            instance.user_id, instance.recipe_id
+        ):
+            return
+        ShoppingCartIngredient.objects.remove_recipe(
+            [previous.user_id], previous.recipe_id
+        )
+    ShoppingCartIngredient.objects.add_recipe(
+        [instance.user_id], instance.recipe_id
+    )
+
+
+@receiver(post_delete, sender=ShoppingBasket)
+def delete_shopping_basket(sender, instance, **kwargs):
+    """
+    Рецепт убран из списка покупок, в том числе каскадом. Если строки
+    рецепта удалены раньше, их уже вычел delete_recipe_line.
+    """
+    if not bulk_counters.get():
+        ShoppingCartIngredient.objects.remove_recipe(
+            [instance.user_id], instance.recipe_id
+        )
+
+
+@receiver(post_save, sender=IngredientInRecipe)
+def save_recipe_line(sender, instance, raw=False, **kwargs):
+    """Правка ингредиентов рецепта не через API."""
+    if raw or reported_writes.get():
+        return
+    previous = getattr(instance, '_previous', None)
+    amount = instance.amount
+    if previous is not None:
+        if (previous.recipe_id, previous.ingredient_id) == (
+            instance.recipe_id, instance.ingredient_id
+        ):
+            amount -= previous.amount
+        else:
+            update_recipe_line(
+                previous.recipe_id, previous.ingredient_id, -previous.amount
+            )
+    update_recipe_line(instance.recipe_id, instance.ingredient_id, amount)
+
+
+@receiver(post_delete, sender=IngredientInRecipe)
+def delete_recipe_line(sender, instance, **kwargs):
+    if not reported_writes.get():
+        update_recipe_line(
+            instance.recipe_id, instance.ingredient_id, -instance.amount
+        )
+
+
+def update_counters(sender, instance, delta):
+    """Счётчики, зависящие от созданной или удалённой записи."""
+    for counter in COUNTERS:
+        if counter.related_model is sender:
+            adjust(
+                counter.model,
+                [getattr(instance, f'{counter.related_field}_id')],
+                counter.field,
+                delta,
+            )
+
+
+def count_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        update_counters(sender, instance, 1)
+
+
+def count_deleted(sender, instance, **kwargs):
+    if not bulk_counters.get():
+        update_counters(sender, instance, -1)
+
+
+@contextmanager
+def reporting_changes():
+    """
+    Запись рецепта, о которой сообщит recipe_changed: сигналы моделей
+    рецепта её пропускают, чтобы изменения не обрабатывались дважды.
+    """
+    token = reported_writes.set(True)
+    try:
+        yield
+    finally:
+        reported_writes.reset(token)
+
+
+@contextmanager
+def deferred_counters():
+    """
+    Удаление пакетом: счётчики и агрегат списков покупок не меняются
+    на каждую запись, их обновляет вызывающий код одним запросом.
+    """
+    token = bulk_counters.set(True)
+    try:
+        yield
+    finally:
+        bulk_counters.reset(token)
+
+
+for related_model in {counter.related_model for counter in COUNTERS}:
+    post_save.connect(count_created, sender=related_model)
+    post_delete.connect(count_deleted, sender=related_model)
@@ -7,7 +7,7 @@ from .models import Follow, User
 @admin.register(User)
 class MyUserAdmin(UserAdmin):
     list_display = ('pk', 'username', 'email', 'first_name', 'last_name',
-                    'password')
+                    'password', 'followers_count', 'recipes_count')
     list_display_links = ["username", "email"]
     search_fields = ('first_name', 'last_name', 'username', 'email')
 
@@ -16,6 +16,16 @@ class User(AbstractUser):
     )
     first_name = models.CharField(max_length=150, verbose_name="Имя")
     last_name = models.CharField(max_length=150, verbose_name="Фамилия")
+    followers_count = models.PositiveIntegerField(
+        verbose_name="Подписчиков",
+        default=0,
+        editable=False,
+    )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name="Рецептов",
+        default=0,
+        editable=False,
+    )
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ["username", "first_name", "last_name"]
@@ -35,6 +45,7 @@ class Follow(models.Model):
         on_delete=models.CASCADE,
         related_name="follow",
         verbose_name="Автор",
+        db_index=False,
     )
     user = models.ForeignKey(
         User,
@@ -46,6 +57,11 @@ class Follow(models.Model):
     class Meta:
         verbose_name = "Подписка"
         verbose_name_plural = "Подписки"
+        indexes = (
+            models.Index(
+                fields=("author", "user"), name="follow_author_user_idx"
+            ),
+        )
         constraints = [
             models.UniqueConstraint(
                 fields=["user", "author"], name="unique_follow")